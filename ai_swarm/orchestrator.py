@@ -1,6 +1,11 @@
+from contextlib import asynccontextmanager, nullcontext
 from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-import os, json, asyncio, httpx
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+import os, json, asyncio, httpx, time, uuid
+
+# the swarm image ships services/merkle.py next to this module
+from services.merkle import leaf_hash, level_proof, tree_levels
 
 
 class AttestRequest(BaseModel):
@@ -14,24 +19,203 @@ class AgentResult(BaseModel):
     details: dict | None = None
 
 
-app = FastAPI(title="Trustiva AI Swarm")
+# Transports are how agents reach the Ops API resolver and verifiers:
+# ``resolve(cid)`` and ``xrpl_live(tx)`` both return ``(status, body)``.
+async def _close_quietly(client: httpx.AsyncClient):
+    try:
+        await client.aclose()
+    except Exception:
+        pass  # a closed loop's transports cannot be shut down cleanly
+
+
+class HttpTransport:
+    """Standalone swarm: the Ops API at ``OPS_API_URL`` over one pooled client per event loop."""
+
+    def __init__(self, base: str | None = None, timeout: float = 15):
+        self.base = base
+        self.timeout = timeout
+        self._client: httpx.AsyncClient | None = None
+        self._loop = None
+        self._retiring: set[asyncio.Future] = set()
+
+    def _http(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is not None and self._loop is not loop:
+            self._retire(self._client, self._loop)  # its connections belong to the old loop
+            self._client = None
+        if self._client is None:
+            base = self.base or os.getenv("OPS_API_URL", "http://127.0.0.1:9000")
+            self._client = httpx.AsyncClient(base_url=base, timeout=self.timeout,
+                                             limits=httpx.Limits(max_keepalive_connections=20))
+            self._loop = loop
+        return self._client
+
+    def _retire(self, client: httpx.AsyncClient, loop):
+        if loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(_close_quietly(client), loop)
+            return
+        task = asyncio.get_running_loop().create_task(_close_quietly(client))
+        self._retiring.add(task)
+        task.add_done_callback(self._retiring.discard)
+
+    async def _get(self, path: str, params: dict | None = None) -> tuple[int, dict]:
+        r = await self._http().get(path, params=params)
+        return r.status_code, (r.json() if r.status_code == 200 else {})
+
+    async def resolve(self, cid: str | None) -> tuple[int, dict]:
+        return await self._get("/registry/resolve", {"cid": cid} if cid else None)
+
+    async def xrpl_live(self, tx: str) -> tuple[int, dict]:
+        return await self._get(f"/verify/xrpl/live/{tx}")
+
+    async def aclose(self):
+        client, self._client = self._client, None
+        if client is not None:
+            await client.aclose()
+
+
+class LocalTransport:
+    """Embedded in the Ops API: call its resolver and verifier coroutines directly.
+
+    Exceptions carrying a ``status_code`` (``HTTPException``) become that status.
+    """
+
+    def __init__(self, resolve, xrpl_live):
+        self._resolve = resolve
+        self._xrpl_live = xrpl_live
+
+    @staticmethod
+    async def _call(fn, *args) -> tuple[int, dict]:
+        try:
+            return 200, await fn(*args)
+        except Exception as e:
+            if isinstance(getattr(e, "status_code", None), int):
+                return e.status_code, {}
+            raise
+
+    async def resolve(self, cid: str | None) -> tuple[int, dict]:
+        return await self._call(self._resolve, cid)
+
+    async def xrpl_live(self, tx: str) -> tuple[int, dict]:
+        return await self._call(self._xrpl_live, tx)
+
+
+class BatchTransport:
+    """Wraps a transport for one batch: each distinct CID / XRPL tx is fetched once, concurrently shared."""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self._memo: dict[tuple, asyncio.Future] = {}
+
+    def _once(self, key: tuple, make) -> asyncio.Future:
+        fut = self._memo.get(key)
+        if fut is None:
+            fut = self._memo[key] = asyncio.ensure_future(make())
+        return fut
+
+    async def resolve(self, cid: str | None) -> tuple[int, dict]:
+        return await asyncio.shield(self._once(("resolve", cid), lambda: self.inner.resolve(cid)))
+
+    async def xrpl_live(self, tx: str) -> tuple[int, dict]:
+        return await asyncio.shield(self._once(("xrpl", tx), lambda: self.inner.xrpl_live(tx)))
+
+    def cancel(self):
+        for fut in self._memo.values():
+            fut.cancel()
 
 
-async def _fetch(url: str, method: str = "GET", json_body: dict | None = None, timeout: int = 15):
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        r = await (client.post(url, json=json_body) if method == "POST" else client.get(url))
-        return r
+transport = HttpTransport()
 
 
-async def proof_agent(root: str, cid: str | None) -> AgentResult:
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        yield
+    finally:
+        await scheduler.aclose()
+        await transport.aclose()
+
+
+app = FastAPI(title="Trustiva AI Swarm", lifespan=lifespan)
+
+
+# Facts are shared inputs computed at most once per attest round.  A provider
+# is ``async def(ctx) -> value``; agents name the facts they use with ``needs``.
+FACTS: dict = {}
+
+
+def fact(name: str):
+    def register(fn):
+        FACTS[name] = fn
+        return fn
+    return register
+
+
+def agent(name: str, weight: float = 1.0, timeout: float | None = None):
+    """Name an agent and set its quorum ``weight`` and deadline (default ``SWARM_AGENT_TIMEOUT``)."""
+    def mark(fn):
+        fn.agent_name, fn.weight, fn.timeout = name, weight, timeout
+        return fn
+    return mark
+
+
+def needs(*names: str):
+    """Declare the facts an agent reads, so a round can start them up front."""
+    def mark(fn):
+        fn.needs = names
+        return fn
+    return mark
+
+
+class AttestContext:
+    """Per-round memo of facts with single-flight: concurrent ``get``s share one computation.
+
+    A fact that raised raises the same error for every agent in the round.
+    """
+
+    def __init__(self, root: str, cid: str | None, via=None):
+        self.root = root
+        self.cid = cid
+        self.transport = via or transport
+        self._facts: dict[str, asyncio.Future] = {}
+
+    def start(self, name: str) -> asyncio.Future:
+        fut = self._facts.get(name)
+        if fut is None:
+            fut = self._facts[name] = asyncio.ensure_future(FACTS[name](self))
+        return fut
+
+    async def get(self, name: str):
+        # shield: one cancelled agent must not cancel the fact for the others
+        return await asyncio.shield(self.start(name))
+
+    def prefetch(self, agents) -> None:
+        for name in {n for a in agents for n in getattr(a, "needs", ())}:
+            self.start(name)
+
+    def cancel(self) -> None:
+        """Stop facts nobody is waiting for any more (the round ended early)."""
+        for fut in self._facts.values():
+            fut.cancel()
+
+
+@fact("bundle")
+async def resolve_bundle(ctx: AttestContext) -> dict:
+    """``/registry/resolve`` for the round's CID: ``{"status", "body"}`` (body ``{}`` unless 200)."""
+    status, body = await ctx.transport.resolve(ctx.cid)
+    return {"status": status, "body": body}
+
+
+@agent("ProofAgent")
+@needs("bundle")
+async def proof_agent(root: str, cid: str | None, ctx: AttestContext | None = None) -> AgentResult:
     # Recompute hash by resolving bundle and hashing its JSON payload deterministically
     # Use local Ops API registry resolver
-    base = os.getenv("OPS_API_URL", "http://127.0.0.1:9000")
-    q = f"?cid={cid}" if cid else ""
+    ctx = ctx or AttestContext(root, cid)
     try:
-        r = await _fetch(f"{base}/registry/resolve{q}")
-        ok = r.status_code == 200
-        body = r.json() if ok else {}
+        bundle = await ctx.get("bundle")
+        ok = bundle["status"] == 200
+        body = bundle["body"]
         # Trust that /registry/resolve included computed sha256; consider confidence from presence
         sha = body.get("sha256") or body.get("sha")
         conf = 0.9 if (ok and sha) else 0.0
@@ -40,35 +224,37 @@ async def proof_agent(root: str, cid: str | None) -> AgentResult:
         return AgentResult(name="ProofAgent", confidence=0.0, details={"error": str(e)})
 
 
-async def audit_agent(root: str, cid: str | None) -> AgentResult:
+@agent("AuditAgent")
+async def audit_agent(root: str, cid: str | None, ctx: AttestContext | None = None) -> AgentResult:
     # Check for available pubkey; if present assume signature verification handled client-side/UI or CI
     pubkey = os.getenv("AUDIT_PUBKEY", "")
     conf = 0.8 if pubkey else 0.4  # weaker without pubkey
     return AgentResult(name="AuditAgent", confidence=conf, details={"has_pubkey": bool(pubkey)})
 
 
-async def xrpl_agent(root: str, cid: str | None) -> AgentResult:
+@agent("XRPLAgent")
+@needs("bundle")
+async def xrpl_agent(root: str, cid: str | None, ctx: AttestContext | None = None) -> AgentResult:
     # Query XRPL live verification if tx present in registry resolve
-    base = os.getenv("OPS_API_URL", "http://127.0.0.1:9000")
-    q = f"?cid={cid}" if cid else ""
+    ctx = ctx or AttestContext(root, cid)
     try:
-        r = await _fetch(f"{base}/registry/resolve{q}")
-        if r.status_code != 200:
-            return AgentResult(name="XRPLAgent", confidence=0.0, details={"status": r.status_code})
-        body = r.json()
+        bundle = await ctx.get("bundle")
+        if bundle["status"] != 200:
+            return AgentResult(name="XRPLAgent", confidence=0.0, details={"status": bundle["status"]})
+        body = bundle["body"]
         tx = (body.get("xrpl") or {}).get("tx") if isinstance(body.get("xrpl"), dict) else None
         if not tx:
             return AgentResult(name="XRPLAgent", confidence=0.5, details={"note": "no-xrpl-tx"})
-        live = await _fetch(f"{base}/verify/xrpl/live/{tx}")
-        ok = live.status_code == 200
-        lbody = live.json() if ok else {}
+        status, lbody = await ctx.transport.xrpl_live(tx)
+        ok = status == 200
         conf = 0.9 if (ok and lbody.get("validated")) else 0.5
         return AgentResult(name="XRPLAgent", confidence=conf, details=lbody)
     except Exception as e:
         return AgentResult(name="XRPLAgent", confidence=0.0, details={"error": str(e)})
 
 
-async def governance_agent(root: str, cid: str | None) -> AgentResult:
+@agent("GovernanceAgent")
+async def governance_agent(root: str, cid: str | None, ctx: AttestContext | None = None) -> AgentResult:
     # Placeholder: in real life, check policies/limits, origin allowlist, etc.
     return AgentResult(name="GovernanceAgent", confidence=0.8, details={"policy": "default"})
 
@@ -76,28 +262,297 @@ async def governance_agent(root: str, cid: str | None) -> AgentResult:
 AGENTS = [proof_agent, audit_agent, xrpl_agent, governance_agent]
 
 
+async def run_agents(root: str, cid: str | None, agents=None, via=None) -> list[AgentResult]:
+    """One attest round: every agent runs concurrently against a shared ``AttestContext``.
+
+    ``via`` is the transport (default: pooled HTTP to ``OPS_API_URL``).
+    """
+    agents = AGENTS if agents is None else agents
+    ctx = AttestContext(root, cid, via)
+    ctx.prefetch(agents)
+    return await asyncio.gather(*[a(root, cid, ctx) for a in agents])
+
+
+def quorum_threshold() -> float:
+    return float(os.getenv("SWARM_QUORUM", "0.67"))
+
+
+async def _timed(fn, root: str, cid: str | None, ctx: AttestContext, limit: asyncio.Semaphore | None) -> dict:
+    """Run one agent under its deadline; the vote without weight/early-exit bookkeeping."""
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    timeout = getattr(fn, "timeout", None) or float(os.getenv("SWARM_AGENT_TIMEOUT", "10"))
+    vote = {"name": getattr(fn, "agent_name", fn.__name__), "confidence": 0.0, "details": None}
+    try:
+        async with limit or nullcontext():  # the deadline starts once the agent gets a slot
+            start = loop.time()
+            res = await asyncio.wait_for(fn(root, cid, ctx), timeout)
+        vote.update(name=res.name, confidence=min(max(res.confidence, 0.0), 1.0), details=res.details, status="ok")
+    except asyncio.TimeoutError:
+        vote.update(status="timeout", details={"timeout_s": timeout})
+    except Exception as e:
+        vote.update(status="error", details={"error": str(e)})
+    vote["latency_ms"] = round((loop.time() - start) * 1000, 1)
+    return vote
+
+
+async def evaluate(root: str, cid: str | None, agents=None, via=None, threshold: float | None = None,
+                   limit: asyncio.Semaphore | None = None) -> dict:
+    """Weighted quorum over ``agents`` that stops once the outcome is decided.
+
+    The score is ``sum(weight * confidence) / sum(weight)`` with confidences in
+    [0, 1].  As soon as the votes in hand reach ``threshold`` (``SWARM_QUORUM``),
+    or the agents still running could not lift the score to it even at full
+    confidence, the rest are cancelled and reported as ``skipped``.  ``limit``
+    caps how many agents run at once (shared across a batch).  Timed-out,
+    failed and skipped agents count as confidence 0, so ``quorum`` is a lower
+    bound and ``quorum_max`` the best the skipped agents could have made it.
+    """
+    agents = AGENTS if agents is None else agents
+    threshold = quorum_threshold() if threshold is None else threshold
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    ctx = AttestContext(root, cid, via)
+    ctx.prefetch(agents)
+    tasks = {asyncio.create_task(_timed(a, root, cid, ctx, limit)): i for i, a in enumerate(agents)}
+    weights = [float(getattr(a, "weight", 1.0)) for a in agents]
+    total = sum(weights) or 1.0
+    votes: list[dict | None] = [None] * len(agents)
+    score, outstanding = 0.0, sum(weights)
+    running = set(tasks)
+    try:
+        while running:
+            done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                i = tasks[t]
+                votes[i] = t.result() | {"weight": weights[i]}
+                score += weights[i] * votes[i]["confidence"]
+                outstanding -= weights[i]
+            if score / total >= threshold or (score + outstanding) / total < threshold:
+                break
+    finally:
+        # also runs when the round itself is cancelled (e.g. a batch client went away)
+        for t in running:
+            t.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+        ctx.cancel()
+    elapsed = round((loop.time() - start) * 1000, 1)
+    for t in running:
+        i = tasks[t]
+        votes[i] = {"name": getattr(agents[i], "agent_name", agents[i].__name__), "confidence": 0.0,
+                    "details": None, "status": "skipped", "latency_ms": elapsed, "weight": weights[i]}
+    return {
+        "votes": votes,
+        "quorum": score / total,
+        "quorum_max": (score + outstanding) / total,
+        "threshold": threshold,
+        "passed": score / total >= threshold,
+        "early": bool(running),
+        "latency_ms": elapsed,
+    }
+
+
+async def attest_batch(items: list, via=None, concurrency: int | None = None):
+    """Evaluate many ``(root, cid)`` items; yields one result per item as it completes.
+
+    Registry resolves and XRPL checks are shared across the batch, and at most
+    ``concurrency`` (``SWARM_BATCH_CONCURRENCY``, default 16) agents and roots
+    are in flight at once.  Results carry the item's ``index`` in the request.
+    """
+    concurrency = concurrency or int(os.getenv("SWARM_BATCH_CONCURRENCY", "16"))
+    shared = BatchTransport(via or transport)
+    agents_limit, roots_limit = asyncio.Semaphore(concurrency), asyncio.Semaphore(concurrency)
+
+    async def one(i: int, item) -> dict:
+        async with roots_limit:
+            try:
+                res = await evaluate(item.root, item.cid, via=shared, limit=agents_limit)
+            except Exception as e:
+                res = {"error": str(e)}
+        return {"index": i, "root": item.root, "cid": item.cid, **res}
+
+    tasks = [asyncio.ensure_future(one(i, item)) for i, item in enumerate(items)]
+    try:
+        for fut in asyncio.as_completed(tasks):
+            yield await fut
+    finally:
+        for t in tasks:
+            t.cancel()
+        shared.cancel()
+
+
+def _root_bytes(root: str) -> bytes:
+    try:
+        return bytes.fromhex(root[2:] if root.startswith("0x") else root)
+    except ValueError:
+        return root.encode()
+
+
+def roots_merkle(roots: list[str]) -> tuple[str, dict[str, list[dict]]]:
+    """Merkle root over sorted attestation roots and each root's inclusion proof.
+
+    Built with ``services.merkle``: each root is a leaf whose path is the root
+    string and whose digest is its bytes, so a proof checks with
+    ``verify_proof(root, root_bytes.hex(), proof, batch_root[2:])``.
+    """
+    ordered = sorted(set(roots))
+    levels = tree_levels([leaf_hash(r, _root_bytes(r)) for r in ordered])
+    return "0x" + levels[-1][0].hex(), {r: level_proof(levels, i) for i, r in enumerate(ordered)}
+
+
+async def make_proof_submit(root: str, cid: str) -> dict:
+    """Default submitter: ``make proof-submit`` with ``ROOT``/``CID`` set for the batch."""
+    proc = await asyncio.create_subprocess_exec(
+        "make", "proof-submit", env={**os.environ, "ROOT": root, "CID": cid},
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    out, err = await proc.communicate()
+    if proc.returncode != 0:
+        raise RuntimeError(err.decode(errors="replace")[-2000:] or f"make exited {proc.returncode}")
+    return {"output": out.decode(errors="replace")[-2000:]}
+
+
+class SubmitScheduler:
+    """Coalesces roots that reached quorum into one on-chain submission per window.
+
+    The first root queued opens a ``SWARM_SUBMIT_WINDOW`` second window
+    (default 30); everything queued until it closes, or until
+    ``SWARM_SUBMIT_MAX`` roots (default 256), is submitted once as the Merkle
+    root of the roots (a lone root is submitted as itself).  Submissions run
+    one at a time in the background; a root already queued or submitted is
+    not queued again.  Status is kept in memory for the last
+    ``SWARM_SUBMIT_KEEP`` finished batches (default 1000) and their roots;
+    ``aclose()`` submits whatever is still queued and waits for it.
+    """
+
+    def __init__(self, window: float | None = None, max_roots: int | None = None, submit=None,
+                 keep: int | None = None):
+        self.window = window if window is not None else float(os.getenv("SWARM_SUBMIT_WINDOW", "30"))
+        self.max_roots = max_roots or int(os.getenv("SWARM_SUBMIT_MAX", "256"))
+        self.keep = keep or int(os.getenv("SWARM_SUBMIT_KEEP", "1000"))
+        self.submit = submit or make_proof_submit
+        self.roots: dict[str, dict] = {}
+        self.batches: dict[str, dict] = {}
+        self._pending: dict[str, str | None] = {}
+        self._timer: asyncio.Task | None = None
+        self._lock: asyncio.Lock | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    def enqueue(self, root: str, cid: str | None) -> dict:
+        known = self.roots.get(root)
+        if known is not None and known["state"] != "failed":
+            return known
+        self.roots[root] = {"root": root, "cid": cid, "state": "queued", "queued": time.time(), "batch": None}
+        self._pending[root] = cid
+        if len(self._pending) >= self.max_roots:
+            self._flush()
+        elif self._timer is None or self._timer.done():
+            self._timer = asyncio.get_running_loop().create_task(self._flush_later())
+        return self.roots[root]
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.window)
+        self._timer = None
+        self._flush()
+
+    def _flush(self):
+        if self._timer is not None and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+        self._timer = None
+        pending, self._pending = self._pending, {}
+        if pending:
+            task = asyncio.get_running_loop().create_task(self._submit(pending))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _submit(self, pending: dict[str, str | None]):
+        if len(pending) == 1:
+            ((root, cid),) = pending.items()
+            batch_root, proofs, cids = root, {root: []}, cid or ""
+        else:
+            batch_root, proofs = roots_merkle(list(pending))
+            cids = ",".join(dict.fromkeys(c for c in pending.values() if c))
+        batch = {"id": uuid.uuid4().hex[:12], "root": batch_root, "roots": sorted(pending), "cid": cids,
+                 "state": "submitting", "created": time.time()}
+        self.batches[batch["id"]] = batch
+        for r in pending:
+            self.roots[r].update(state="submitting", batch=batch["id"], proof=proofs[r], batch_root=batch_root)
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:  # one chain submission at a time
+            try:
+                batch["result"] = await self.submit(batch_root, cids)
+                state = "submitted"
+            except Exception as e:
+                batch["error"] = str(e)
+                state = "failed"
+        batch.update(state=state, finished=time.time())
+        for r in pending:
+            self.roots[r]["state"] = state
+        self._prune()
+
+    def _prune(self):
+        finished = [b for b in self.batches.values() if "finished" in b]
+        for b in sorted(finished, key=lambda b: b["finished"])[:max(len(finished) - self.keep, 0)]:
+            del self.batches[b["id"]]
+            for r in b["roots"]:
+                if self.roots.get(r, {}).get("batch") == b["id"]:
+                    del self.roots[r]
+
+    async def aclose(self):
+        """Submit what is still queued and wait for in-flight submissions (shutdown)."""
+        self._flush()
+        while self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def status(self, root: str | None = None) -> dict | None:
+        if root is not None:
+            return self.roots.get(root)
+        recent = sorted(self.batches.values(), key=lambda b: b["created"], reverse=True)[:20]
+        return {"pending": len(self._pending), "window_s": self.window, "batches": recent}
+
+
+scheduler = SubmitScheduler()
+
+
+class AttestBatchRequest(BaseModel):
+    items: list[AttestRequest] = Field(..., min_length=1, max_length=1000)
+
+
+@app.post("/swarm/attest/batch")
+async def swarm_attest_batch(req: AttestBatchRequest):
+    """NDJSON: one ``/swarm/attest``-shaped result (plus ``index``) per line, in completion order."""
+    if any(not it.root for it in req.items):
+        raise HTTPException(status_code=400, detail="root is required")
+
+    async def stream():
+        async for res in attest_batch(req.items):
+            yield json.dumps(res) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
 @app.post("/swarm/attest")
 async def swarm_attest(req: AttestRequest):
     if not req.root:
         raise HTTPException(status_code=400, detail="root is required")
-    # run agents concurrently
-    results = await asyncio.gather(*[a(req.root, req.cid) for a in AGENTS])
-    quorum = sum(r.confidence for r in results) / len(results)
-    # optional: auto-submit if quorum reached
+    # agents run concurrently and the round ends as soon as the quorum outcome is decided
+    result = await evaluate(req.root, req.cid)
+    # optional: queue the root for the next coalesced on-chain submission (never waits for it)
     auto_submit = os.getenv("SWARM_AUTOSUBMIT", "false").lower() == "true"
-    submitted = False
-    if auto_submit and quorum >= float(os.getenv("SWARM_QUORUM", "0.67")):
-        # trigger make proof-submit if available
-        try:
-            proc = await asyncio.create_subprocess_exec("make", "proof-submit", stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
-            out, err = await proc.communicate()
-            submitted = (proc.returncode == 0)
-        except Exception:
-            submitted = False
+    submission = scheduler.enqueue(req.root, req.cid) if auto_submit and result["passed"] else None
     return {
         "root": req.root,
         "cid": req.cid,
-        "votes": [r.model_dump() for r in results],
-        "quorum": quorum,
-        "submitted": submitted,
+        **result,
+        "submitted": bool(submission) and submission["state"] == "submitted",
+        "submission": submission,
     }
+
+
+@app.get("/swarm/submit/status")
+async def submit_status(root: str | None = None):
+    """One root's submission (state, batch, Merkle proof into the batch root) or recent batches."""
+    status = scheduler.status(root)
+    if status is None:
+        raise HTTPException(status_code=404, detail="root was never queued for submission or has expired")
+    return status
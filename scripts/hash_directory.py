@@ -1,31 +1,58 @@
 #!/usr/bin/env python3
-import sys, os, hashlib
+import sys, os, argparse
 from pathlib import Path
 
-def sha256_path(p: Path) -> str:
-    h = hashlib.sha256()
-    if p.is_file():
-        with p.open('rb') as f:
-            for chunk in iter(lambda: f.read(8192), b''):
-                h.update(chunk)
-        return h.hexdigest()
-    # directory: walk sorted by path for determinism
-    for fp in sorted([x for x in p.rglob('*') if x.is_file()]):
-        h.update(fp.relative_to(p).as_posix().encode())
-        with fp.open('rb') as f:
-            for chunk in iter(lambda: f.read(8192), b''):
-                h.update(chunk)
-    return h.hexdigest()
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from services.hashing import DigestCache, file_digests, tree_digest  # noqa: E402
+from services.merkle import merkle_dir, merkle_root, write_tree  # noqa: E402
+
+
+def sha256_path(p: Path, cache: DigestCache | None = None, workers: int | None = None) -> str:
+    # directory: running hash over relpath + contents, walked sorted by path
+    return tree_digest(p, cache=cache, workers=workers)
+
+
+def merkle_path(p: Path, out: Path | None = None, cache: DigestCache | None = None,
+                workers: int | None = None) -> str:
+    # Merkle mode: per-file digests -> tree file ($MERKLE_DIR/<root>.tmk by default)
+    digests = file_digests(p, cache=cache, workers=workers)
+    root = merkle_root(digests)
+    write_tree(out or merkle_dir() / f"{root}.tmk", digests)
+    return root
+
 
 def main():
-    if len(sys.argv) < 2:
+    ap = argparse.ArgumentParser(
+        usage='hash_directory.py <path> [--merkle [--tree-out FILE]] [--cache FILE | --no-cache] [--jobs N]')
+    ap.add_argument('path', nargs='?')
+    ap.add_argument('--merkle', action='store_true', help='print the Merkle root and write its tree file')
+    ap.add_argument('--tree-out', help='tree file for --merkle (default $MERKLE_DIR/<root>.tmk)')
+    ap.add_argument('--cache', help='digest cache file (default $HASH_CACHE_PATH or .hash-cache.json)')
+    ap.add_argument('--no-cache', action='store_true')
+    ap.add_argument('--jobs', type=int, default=None)
+    args = ap.parse_args()
+    if not args.path:
         print('usage: hash_directory.py <path>')
         sys.exit(1)
-    p = Path(sys.argv[1])
+    p = Path(args.path)
     if not p.exists():
         print('path not found', file=sys.stderr)
         sys.exit(2)
-    print(sha256_path(p))
+    cache = None if args.no_cache else DigestCache(Path(args.cache) if args.cache else None)
+    if args.merkle:
+        if not p.is_dir():
+            print('--merkle needs a directory', file=sys.stderr)
+            sys.exit(2)
+        out = Path(args.tree_out) if args.tree_out else None
+        try:
+            print(merkle_path(p, out=out, cache=cache, workers=args.jobs))
+        except ValueError as e:
+            print(f'cannot build Merkle tree: {e}', file=sys.stderr)
+            sys.exit(2)
+    else:
+        print(sha256_path(p, cache=cache, workers=args.jobs))
+    if cache:
+        cache.save()
 
 if __name__ == '__main__':
     main()
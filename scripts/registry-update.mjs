@@ -12,11 +12,12 @@ const entry = {
   xrpl: args.xrpl || '',
   polygon: args.polygon || '',
   url: args.url || '',
-  sha: args.sha || args.sha256 || ''
+  sha: args.sha || args.sha256 || '',
+  merkle: args.merkle || ''
 };
 
 if (!entry.cid) {
-  console.error('usage: registry-update.mjs --cid=<CID> [--xrpl=<TX>] [--polygon=<TX>] [--url=<URL>]');
+  console.error('usage: registry-update.mjs --cid=<CID> [--xrpl=<TX>] [--polygon=<TX>] [--url=<URL>] [--sha=<SHA256>] [--merkle=<ROOT>]');
   process.exit(1);
 }
 
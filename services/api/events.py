@@ -0,0 +1,382 @@
+"""Segment log for inbound Zoho webhooks and the consumer that drains it.
+
+``/events/zoho`` appends each body to the current segment and returns; it no
+longer creates a file per event.  Records are framed as
+``<u32 length><u32 crc32><f64 received-at>`` followed by the raw body, and
+segments (``<EVENT_LOG_DIR>/<seq>.seg``, default ``queue/events``) roll over
+at ``EVENT_SEGMENT_BYTES`` (64 MiB) or ``EVENT_SEGMENT_SECONDS`` (1 h).
+
+Appends are plain ``write``s on an ``O_APPEND`` descriptor, so a crashed
+process loses nothing already acknowledged.  ``fsync`` is batched: a
+background thread syncs the active segment every ``EVENT_FSYNC_MS`` (default
+20) while it has unsynced writes, so a burst costs one fsync per interval
+instead of one per event.  A torn frame at the tail (power loss mid-write)
+fails its length/CRC check and is cut off when the log is reopened.
+
+``EventConsumer`` reads the log from its checkpoint (``<name>.checkpoint``),
+hands batches of up to ``EVENT_BATCH_SIZE`` events to its handlers and only
+then advances the checkpoint, so delivery is at-least-once and any range can
+be replayed by rewinding the checkpoint.  Segments that every checkpoint has
+passed are deleted after ``EVENT_LOG_RETENTION`` seconds (default 7 days).
+One Ops API process owns a log directory.
+"""
+from dataclasses import dataclass
+from pathlib import Path
+from urllib.parse import parse_qsl
+import asyncio, json, os, struct, threading, time, uuid, zlib
+
+from loguru import logger
+
+HEADER = struct.Struct("<IId")
+MAX_EVENT = 16 * 1024 * 1024
+
+
+@dataclass(frozen=True, order=True)
+class Position:
+    segment: int
+    offset: int
+
+    def __str__(self):
+        return f"{self.segment}:{self.offset}"
+
+    @classmethod
+    def parse(cls, text: str) -> "Position":
+        seg, off = text.split(":")
+        return cls(int(seg), int(off))
+
+
+@dataclass(frozen=True)
+class Event:
+    pos: Position
+    received: float
+    body: bytes
+
+    @property
+    def end(self) -> Position:
+        return Position(self.pos.segment, self.pos.offset + HEADER.size + len(self.body))
+
+    def data(self):
+        """The body as JSON, or as a dict for form-encoded bodies; ``None`` if neither."""
+        try:
+            return json.loads(self.body)
+        except ValueError:
+            pass
+        try:
+            form = dict(parse_qsl(self.body.decode(), strict_parsing=True))
+        except ValueError:
+            return None
+        return form or None
+
+
+def _scan(f, segment: int, offset: int):
+    """``Event``s read from ``f`` (positioned at ``offset``), stopping at the first incomplete or bad frame."""
+    while True:
+        head = f.read(HEADER.size)
+        if len(head) < HEADER.size:
+            return
+        size, crc, received = HEADER.unpack(head)
+        body = f.read(size) if size <= MAX_EVENT else b""
+        if len(body) < size or zlib.crc32(body) != crc:
+            return
+        yield Event(Position(segment, offset), received, body)
+        offset += HEADER.size + size
+
+
+class SegmentLog:
+    def __init__(self, directory: str | Path | None = None, segment_bytes: int | None = None,
+                 segment_seconds: float | None = None, fsync_interval: float | None = None):
+        self.dir = Path(directory or os.getenv("EVENT_LOG_DIR", "queue/events"))
+        self.segment_bytes = segment_bytes or int(os.getenv("EVENT_SEGMENT_BYTES", str(64 * 1024 * 1024)))
+        self.segment_seconds = segment_seconds or float(os.getenv("EVENT_SEGMENT_SECONDS", "3600"))
+        self.fsync_interval = (fsync_interval if fsync_interval is not None
+                               else float(os.getenv("EVENT_FSYNC_MS", "20")) / 1000)
+        self._lock = threading.Lock()
+        self._fd: int | None = None
+        self._seq = 0
+        self._size = 0
+        self._opened = 0.0
+        self._dirty = False
+        self._closing = threading.Event()
+        self._syncer: threading.Thread | None = None
+        self._listeners: list = []
+
+    def _path(self, seq: int) -> Path:
+        return self.dir / f"{seq:012d}.seg"
+
+    def segments(self) -> list[int]:
+        try:
+            return sorted(int(p.stem) for p in self.dir.glob("*.seg") if p.stem.isdigit())
+        except FileNotFoundError:
+            return []
+
+    # ----------------------- writes -----------------------
+    def open(self):
+        with self._lock:
+            if self._fd is not None:
+                return
+            self.dir.mkdir(parents=True, exist_ok=True)
+            segs = self.segments()
+            self._seq = segs[-1] if segs else 1
+            path = self._path(self._seq)
+            if path.exists():
+                with path.open("rb") as f:
+                    good = 0
+                    for event in _scan(f, self._seq, 0):
+                        good = event.end.offset
+                size = path.stat().st_size
+                if good < size:
+                    logger.warning(f"event log: dropping {size - good} torn bytes at the end of {path.name}")
+                    os.truncate(path, good)
+                self._size = good
+            self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            self._opened = time.time()
+            self._closing.clear()
+        if self.fsync_interval > 0:
+            self._syncer = threading.Thread(target=self._sync_forever, name="event-log-fsync", daemon=True)
+            self._syncer.start()
+
+    def append(self, body: bytes) -> Position:
+        """Write one event; returns where it landed.  Durable on disk within ``EVENT_FSYNC_MS``."""
+        if self._fd is None:
+            self.open()
+        now = time.time()
+        frame = HEADER.pack(len(body), zlib.crc32(body), now) + body
+        with self._lock:
+            if self._size and (self._size + len(frame) > self.segment_bytes
+                               or now - self._opened >= self.segment_seconds):
+                self._rotate()
+            pos = Position(self._seq, self._size)
+            os.write(self._fd, frame)
+            self._size += len(frame)
+            self._dirty = True
+            if self.fsync_interval <= 0:
+                os.fsync(self._fd)
+                self._dirty = False
+        for notify in list(self._listeners):
+            try:
+                notify()
+            except Exception as e:  # the event is already written; a wake-up is best effort
+                logger.warning(f"event log listener failed: {e}")
+        return pos
+
+    def _rotate(self):
+        os.fsync(self._fd)
+        os.close(self._fd)
+        self._seq += 1
+        self._size = 0
+        self._fd = os.open(self._path(self._seq), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._opened = time.time()
+        self._dirty = False
+
+    def sync(self):
+        with self._lock:
+            if self._fd is None or not self._dirty:
+                return
+            fd, self._dirty = os.dup(self._fd), False  # survives a concurrent rotation
+        try:
+            os.fsync(fd)  # outside the lock so appends keep flowing
+        finally:
+            os.close(fd)
+
+    def _sync_forever(self):
+        while not self._closing.wait(self.fsync_interval):
+            try:
+                self.sync()
+            except OSError as e:
+                logger.warning(f"event log fsync failed: {e}")
+
+    def subscribe(self, notify):
+        """Call ``notify()`` after every append (from the appending thread); returns an unsubscribe callable."""
+        self._listeners.append(notify)
+
+        def unsubscribe():
+            try:
+                self._listeners.remove(notify)
+            except ValueError:
+                pass
+        return unsubscribe
+
+    # ----------------------- reads -----------------------
+    def head(self) -> Position:
+        if self._fd is not None:
+            return Position(self._seq, self._size)
+        segs = self.segments()
+        return Position(segs[-1], self._path(segs[-1]).stat().st_size) if segs else Position(1, 0)
+
+    def read(self, start: Position, limit: int) -> list[Event]:
+        """Up to ``limit`` events from ``start`` on, crossing into later segments."""
+        out: list[Event] = []
+        for seq in self.segments():
+            if seq < start.segment:
+                continue
+            offset = start.offset if seq == start.segment else 0
+            try:
+                f = self._path(seq).open("rb")
+            except FileNotFoundError:
+                continue
+            with f:
+                f.seek(offset)
+                for event in _scan(f, seq, offset):
+                    out.append(event)
+                    if len(out) == limit:
+                        return out
+        return out
+
+    def prune(self, keep_from: Position, older_than: float) -> int:
+        """Delete closed segments before ``keep_from`` last written more than ``older_than`` seconds ago."""
+        cutoff = time.time() - older_than
+        removed = 0
+        for seq in self.segments():
+            if seq >= min(keep_from.segment, self._seq or keep_from.segment):
+                break
+            path = self._path(seq)
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        return removed
+
+    def close(self):
+        self._closing.set()
+        if self._syncer is not None:
+            self._syncer.join()
+            self._syncer = None
+        with self._lock:
+            if self._fd is not None:
+                os.fsync(self._fd)
+                os.close(self._fd)
+                self._fd = None
+
+
+class EventConsumer:
+    """Delivers log events in batches to ``async handler(events)`` callables.
+
+    A batch is cut at ``EVENT_BATCH_SIZE`` events (default 500) or once the
+    oldest waiting event is ``EVENT_BATCH_WAIT`` seconds old (default 0.2).
+    If a handler raises, the batch is retried with backoff and the checkpoint
+    stays put.
+    """
+
+    def __init__(self, log: SegmentLog, name: str = "zoho", handlers: list | None = None,
+                 batch_size: int | None = None, max_wait: float | None = None):
+        self.log = log
+        self.name = name
+        self.handlers = list(handlers or [])
+        self.batch_size = batch_size or int(os.getenv("EVENT_BATCH_SIZE", "500"))
+        self.max_wait = max_wait if max_wait is not None else float(os.getenv("EVENT_BATCH_WAIT", "0.2"))
+        self.retention = float(os.getenv("EVENT_LOG_RETENTION", str(7 * 86400)))
+        self.stats = {"events": 0, "batches": 0, "errors": 0}
+
+    @property
+    def checkpoint_path(self) -> Path:
+        return self.log.dir / f"{self.name}.checkpoint"
+
+    def checkpoint(self) -> Position:
+        try:
+            return Position.parse(self.checkpoint_path.read_text().strip())
+        except (FileNotFoundError, ValueError):
+            segs = self.log.segments()
+            return Position(segs[0] if segs else 1, 0)
+
+    def commit(self, pos: Position):
+        tmp = self.checkpoint_path.with_suffix(".tmp")
+        tmp.write_text(str(pos))
+        os.replace(tmp, self.checkpoint_path)
+
+    def subscribe(self, handler):
+        self.handlers.append(handler)
+
+    async def run_once(self, pos: Position) -> Position:
+        """Deliver one batch starting at ``pos``; returns the position after it."""
+        events = await asyncio.to_thread(self.log.read, pos, self.batch_size)
+        if not events:
+            return pos
+        for handler in self.handlers:
+            await handler(events)
+        end = events[-1].end
+        await asyncio.to_thread(self.commit, end)
+        self.stats["events"] += len(events)
+        self.stats["batches"] += 1
+        if end.segment != pos.segment:
+            await asyncio.to_thread(self.log.prune, end, self.retention)
+        return end
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        wake = asyncio.Event()
+        unsubscribe = self.log.subscribe(lambda: loop.call_soon_threadsafe(wake.set))
+        try:
+            pos = self.checkpoint()
+            failures = 0
+            while True:
+                wake.clear()
+                try:
+                    nxt = await self.run_once(pos)
+                except Exception as e:
+                    failures += 1
+                    self.stats["errors"] += 1
+                    logger.warning(f"event consumer {self.name}: batch at {pos} failed: {e}")
+                    await asyncio.sleep(min(2 ** failures, 60))
+                    continue
+                failures = 0
+                if nxt != pos:
+                    pos = nxt
+                    continue
+                try:
+                    # not wait_for: on 3.11 it can swallow a cancel that races with the wake-up
+                    async with asyncio.timeout(5):
+                        await wake.wait()
+                except TimeoutError:
+                    continue
+                await asyncio.sleep(self.max_wait)  # let a burst fill the batch
+        finally:
+            unsubscribe()
+
+CONTACT_FIELDS = {"first_name": "First_Name", "last_name": "Last_Name", "phone": "Phone", "company": "Company"}
+
+
+def _contacts(data) -> list[dict]:
+    """Contact records in a Zoho webhook body (a record, ``{"data": [...]}`` or a list)."""
+    if isinstance(data, dict) and isinstance(data.get("data"), list):
+        data = data["data"]
+    records = data if isinstance(data, list) else [data]
+    out = []
+    for rec in records:
+        if not isinstance(rec, dict):
+            continue
+        email = rec.get("Email") or rec.get("email")
+        if not isinstance(email, str) or "@" not in email:
+            continue
+        contact = {"email": email}
+        for key, zoho in CONTACT_FIELDS.items():
+            value = rec.get(zoho) or rec.get(key)
+            if isinstance(value, str) and value:
+                contact[key] = value
+        out.append(contact)
+    return out
+
+
+async def contact_sync(events: list[Event]):
+    """Queue one bulk Bigin upsert for the contacts carried by a batch of webhooks."""
+    from services.jobs import get_queue
+
+    contacts = [c for e in events for c in _contacts(e.data())]
+    if not contacts:
+        return
+    first, last = events[0].pos, events[-1].pos
+    payload = {
+        "type": "bulk_upsert_contacts",
+        "job_id": f"bigin-events-{int(time.time())}-{uuid.uuid4().hex[:8]}",
+        "data": {"contacts": contacts},
+        # Only a redelivery cut at the same boundaries reuses this job; batches are cut by
+        # timing and size, so a replay may also queue the contacts again.  That is harmless:
+        # the bulk upsert is keyed on email and re-applies the same fields.
+        "key": f"events:{first}-{last}",
+    }
+    await asyncio.to_thread(get_queue().enqueue, payload)
+
+
+event_log = SegmentLog()
+event_consumer = EventConsumer(event_log, handlers=[contact_sync])
@@ -1,15 +1,21 @@
-from fastapi import FastAPI, Request, HTTPException
-from pydantic import BaseModel, EmailStr
+from fastapi import FastAPI, Header, Query, Request, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, EmailStr, Field
+from contextlib import asynccontextmanager, suppress
+from functools import lru_cache
 from pathlib import Path
-import json, time, uuid, os
-import httpx
+import hashlib, json, re, time, uuid, os
 import asyncio, subprocess, sys
 
-QUEUE_DIR = Path("queue/pending")
-DONE_DIR = Path("queue/done")
-FAIL_DIR = Path("queue/failed")
-for d in (QUEUE_DIR, DONE_DIR, FAIL_DIR):
-    d.mkdir(parents=True, exist_ok=True)
+import httpx
+
+from services.api.events import event_consumer, event_log
+from services.api.pool import http_pool
+from services.api.registry import registry_cache
+from services.api.verify_cache import PERMANENT, verify_cache
+from services.api.xrpl_client import xrpl_client
+from services.jobs import STATES, get_queue
+from services.merkle import MerkleTree, merkle_dir
 
 
 class EmailJob(BaseModel):
@@ -30,7 +36,27 @@ class BiginUpsertJob(BaseModel):
     tags: list[str] | None = None
 
 
-app = FastAPI(title="Trustiva Ops API")
+class BiginBulkUpsertJob(BaseModel):
+    contacts: list[BiginUpsertJob] = Field(..., min_length=1, max_length=5000)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await http_pool.start()
+    event_log.open()
+    consumer = asyncio.create_task(event_consumer.run())
+    try:
+        yield
+    finally:
+        consumer.cancel()
+        with suppress(asyncio.CancelledError):
+            await consumer
+        await http_pool.aclose()
+        await xrpl_client.aclose()
+        event_log.close()
+
+
+app = FastAPI(title="Trustiva Ops API", lifespan=lifespan)
 
 
 @app.get("/healthz")
@@ -38,28 +64,69 @@ def healthz():
     return {"ok": True, "time": time.time()}
 
 
+def _enqueue(typ: str, prefix: str, data: dict, idempotency_key: str | None, merge: str | None = None) -> dict:
+    """Queue a Zoho job; a repeat within ``JOB_DEDUPE_WINDOW`` gets the original ``job_id`` back.
+
+    The idempotency key is the client's ``Idempotency-Key`` header, or else a
+    hash of the job content, so retried n8n calls and double submits coincide.
+    """
+    job_id = f"{prefix}-{int(time.time())}-{uuid.uuid4().hex[:8]}"
+    key = idempotency_key or hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+    payload = {"type": typ, "job_id": job_id, "data": data, "key": f"{typ}:{key}"}
+    if merge:
+        payload["merge"] = merge
+    queued = get_queue().enqueue(payload)
+    return {"queued": True, "job_id": queued, "duplicate": queued != job_id}
+
+
 @app.post("/ops/zoho/send_mail")
-def send_mail(job: EmailJob):
-    job_id = f"mail-{int(time.time())}-{uuid.uuid4().hex[:8]}"
-    payload = {"type": "send_mail", "job_id": job_id, "data": job.dict()}
-    (QUEUE_DIR / f"{job_id}.json").write_text(json.dumps(payload))
-    return {"queued": True, "job_id": job_id}
+def send_mail(job: EmailJob, idempotency_key: str | None = Header(None)):
+    return _enqueue("send_mail", "mail", job.dict(), idempotency_key)
 
 
 @app.post("/ops/zoho/upsert_contact")
-def upsert_contact(job: BiginUpsertJob):
-    job_id = f"bigin-{int(time.time())}-{uuid.uuid4().hex[:8]}"
-    payload = {"type": "upsert_contact", "job_id": job_id, "data": job.dict()}
-    (QUEUE_DIR / f"{job_id}.json").write_text(json.dumps(payload))
-    return {"queued": True, "job_id": job_id}
+def upsert_contact(job: BiginUpsertJob, idempotency_key: str | None = Header(None)):
+    # pending upserts for one email are merged into a single Bigin call by the worker
+    merge = f"upsert_contact:{job.email.lower()}"
+    return _enqueue("upsert_contact", "bigin", job.dict(), idempotency_key, merge=merge)
+
+
+@app.post("/ops/zoho/upsert_contacts")
+def upsert_contacts(job: BiginBulkUpsertJob, idempotency_key: str | None = Header(None)):
+    return _enqueue("bulk_upsert_contacts", "bigin-bulk", job.dict(), idempotency_key) | {"contacts": len(job.contacts)}
+
+
+@app.get("/ops/jobs")
+def list_jobs(state: str | None = None, limit: int = Query(50, ge=1, le=500), cursor: str | None = None):
+    """Queued Zoho jobs, newest first; pass ``next`` back as ``cursor`` for the following page."""
+    if state is not None and state not in STATES:
+        raise HTTPException(status_code=400, detail=f"state must be one of {', '.join(STATES)}")
+    jobs, nxt = get_queue().list_jobs(state, limit, cursor)
+    return {"jobs": jobs, "next": nxt}
+
+
+@app.get("/ops/jobs/{job_id}")
+def job_status(job_id: str):
+    rec = get_queue().get(job_id)
+    if rec is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return rec
 
 
 @app.post("/events/zoho")
 async def zoho_events(req: Request):
-    body = await req.body()
-    job_id = f"webhook-{int(time.time())}-{uuid.uuid4().hex[:8]}"
-    (DONE_DIR / f"{job_id}.http").write_bytes(body)
-    return {"ok": True}
+    # one buffered append; contact sync etc. run in batches off the event log
+    pos = event_log.append(await req.body())
+    return {"ok": True, "event": str(pos)}
+
+
+@app.get("/events/zoho/status")
+def zoho_events_status():
+    head, checkpoint = event_log.head(), event_consumer.checkpoint()
+    return {
+        "head": str(head), "checkpoint": str(checkpoint), "caught_up": checkpoint >= head,
+        "segments": len(event_log.segments()), **event_consumer.stats,
+    }
 
 
 def _registry_path() -> Path:
@@ -76,16 +143,10 @@ class AttestIn(BaseModel):
 async def swarm_attest(body: AttestIn):
     # Route to local ai_swarm if imported; otherwise return basic quorum calc using xrpl + audit checks
     try:
-        from ai_swarm.orchestrator import AGENTS  # type: ignore
-        import asyncio as _asyncio
-        results = await _asyncio.gather(*[a(body.root, body.cid) for a in AGENTS])
-        quorum = sum(getattr(r, 'confidence', 0.0) for r in results) / len(results)
-        return {
-            "root": body.root,
-            "cid": body.cid,
-            "votes": [getattr(r, 'model_dump', lambda: dict(r))() if hasattr(r, 'model_dump') else dict(r.__dict__) for r in results],
-            "quorum": quorum,
-        }
+        from ai_swarm.orchestrator import LocalTransport, evaluate  # type: ignore
+        # embedded: agents call the resolver/verifier below directly, not back over HTTP
+        result = await evaluate(body.root, body.cid, via=LocalTransport(registry_resolve, verify_xrpl_live))
+        return {"root": body.root, "cid": body.cid, **result}
     except Exception:
         # Minimal fallback: XRPL live weight + audit pubkey presence
         xr = await verify_xrpl_live_post({"tx": "", "wait": False})
@@ -98,41 +159,148 @@ async def swarm_attest(body: AttestIn):
         return {"root": body.root, "cid": body.cid, "votes": votes, "quorum": quorum}
 
 
+class AttestBatchIn(BaseModel):
+    items: list[AttestIn] = Field(..., min_length=1, max_length=1000)
+
+
+@app.post("/swarm/attest/batch")
+async def swarm_attest_batch(body: AttestBatchIn):
+    """Attest many roots in-process; streams one result per line (with ``index``) as each completes.
+
+    Without ``ai_swarm`` (the Ops API image ships only ``services/``) the
+    request is relayed to the swarm service at ``SWARM_API_URL``.
+    """
+    try:
+        from ai_swarm.orchestrator import LocalTransport, attest_batch  # type: ignore
+    except ImportError:
+        return await _relay_attest_batch(body)
+
+    via = LocalTransport(registry_resolve, verify_xrpl_live)
+
+    async def stream():
+        async for res in attest_batch(body.items, via=via):
+            yield json.dumps(res) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+async def _relay_attest_batch(body: AttestBatchIn) -> StreamingResponse:
+    base = os.getenv("SWARM_API_URL", "http://127.0.0.1:9100").rstrip("/")
+    client = http_pool.client()
+    # results stream as roots finish, so only connecting is bounded
+    req = client.build_request("POST", f"{base}/swarm/attest/batch", json=body.dict(),
+                               timeout=httpx.Timeout(15, read=None))
+    try:
+        upstream = await client.send(req, stream=True)
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"swarm unavailable: {e}")
+    if upstream.status_code != 200:
+        await upstream.aclose()
+        raise HTTPException(status_code=upstream.status_code if upstream.status_code < 500 else 502,
+                            detail="swarm rejected the batch")
+
+    async def relay():
+        try:
+            async for chunk in upstream.aiter_bytes():
+                yield chunk
+        finally:
+            await upstream.aclose()
+
+    return StreamingResponse(relay(), media_type="application/x-ndjson")
+
+
 @app.get("/registry")
 def get_registry(limit: int = 100):
-    path = _registry_path()
-    if not path.exists():
-        return {"entries": []}
-    lines = path.read_text().strip().splitlines()
-    entries = []
-    for line in lines[-limit:]:
-        try:
-            entries.append(json.loads(line))
-        except Exception:
-            continue
-    return {"entries": entries}
+    return {"entries": registry_cache(_registry_path()).tail(limit)}
+
+
+@app.get("/registry/cache")
+def registry_cache_stats():
+    return registry_cache(_registry_path()).stats()
+
+
+@app.get("/verify/cache")
+def verify_cache_stats():
+    return verify_cache.stats()
+
+
+@lru_cache(maxsize=16)
+def _merkle_tree(path: str, mtime_ns: int) -> MerkleTree:
+    return MerkleTree(Path(path))
+
+
+@app.get("/registry/proof")
+def registry_proof(path: str, cid: str | None = None):
+    """Merkle inclusion proof for one file under the root recorded for ``cid`` (latest if omitted)."""
+    reg = registry_cache(_registry_path())
+    entry = reg.lookup(cid) if cid else reg.latest()
+    if not entry:
+        raise HTTPException(status_code=404, detail="CID not found in registry")
+    root = entry.get("merkle")
+    if isinstance(root, str) and root.startswith("0x"):
+        root = root[2:]
+    # the root becomes a file name: only a 32-byte hex digest is accepted
+    if not isinstance(root, str) or not re.fullmatch(r"[0-9a-f]{64}", root):
+        raise HTTPException(status_code=404, detail="no Merkle root recorded for this CID")
+    tree_file = merkle_dir() / f"{root}.tmk"
+    try:
+        tree = _merkle_tree(str(tree_file), tree_file.stat().st_mtime_ns)
+    except (OSError, ValueError):
+        raise HTTPException(status_code=404, detail="Merkle tree file not available")
+    if tree.root != root:
+        raise HTTPException(status_code=409, detail="Merkle tree file does not match recorded root")
+    try:
+        proof = tree.proof(path.lstrip("/"))
+    except KeyError:
+        raise HTTPException(status_code=404, detail="path not in tree")
+    return {"cid": entry.get("cid"), **proof}
+
+
+async def _gateway_head(url: str, timeout: float = 10) -> dict:
+    """Cached gateway HEAD; failures are negative-cached rather than raised."""
+    key = f"gateway:{url}"
+    hit, res = verify_cache.get(key)
+    if hit:
+        return res
+    try:
+        r = await http_pool.head(url, timeout=timeout)
+        res = {"url": url, "status": r.status_code, "ok": r.status_code == 200}
+    except Exception as e:
+        res = {"url": url, "status": None, "ok": False, "error": str(e) or type(e).__name__}
+    verify_cache.put(key, res, verify_cache.gateway_ttl if res["ok"] else verify_cache.negative_ttl)
+    return res
 
 
 @app.get("/verify/cid/{cid}")
 async def verify_cid(cid: str):
     gateway = os.getenv("IPFS_GATEWAY", "http://127.0.0.1:8082")
     url = f"{gateway}/ipfs/{cid}/"
-    async with httpx.AsyncClient(timeout=10) as client:
-        r = await client.head(url)
-        return {"cid": cid, "status": r.status_code, "ok": r.status_code == 200, "url": url}
+    return {"cid": cid, **await _gateway_head(url)}
 
 
 @app.get("/verify/polygon/{tx_hash}")
 async def verify_polygon(tx_hash: str):
     rpc = os.getenv("POLYGON_RPC", "https://polygon-rpc.com")
-    async with httpx.AsyncClient(timeout=15) as client:
-        r = await client.post(rpc, json={
+    key = f"polygon:{rpc}:{tx_hash}"
+    hit, res = verify_cache.get(key)
+    if hit:
+        if "error" in res:
+            raise HTTPException(status_code=502, detail=res["error"])
+        return res
+    try:
+        r = await http_pool.post(rpc, json={
             "jsonrpc": "2.0", "id": 1, "method": "eth_getTransactionReceipt", "params": [tx_hash]
-        })
-        if r.status_code != 200:
-            raise HTTPException(status_code=502, detail="RPC error")
-        data = r.json()
-        return {"tx": tx_hash, "result": data.get("result")}
+        }, timeout=15)
+        data = r.json() if r.status_code == 200 else None
+    except Exception:
+        data = None
+    if not isinstance(data, dict):
+        verify_cache.put(key, {"error": "RPC error"}, verify_cache.negative_ttl)
+        raise HTTPException(status_code=502, detail="RPC error")
+    res = {"tx": tx_hash, "result": data.get("result")}
+    # A receipt means the tx is mined; a null result is still pending.
+    verify_cache.put(key, res, PERMANENT if res["result"] else verify_cache.pending_ttl)
+    return res
 
 
 @app.get("/verify/xrpl/{tx_hash}")
@@ -147,18 +315,17 @@ async def verify_xrpl(tx_hash: str):
 
 @app.get("/verify/xrpl/live/{tx_hash}")
 async def verify_xrpl_live(tx_hash: str, wait: bool = False):
-    """Calls the Node script to check XRPL tx validation, optionally waiting."""
-    try:
-        proc = await asyncio.create_subprocess_exec(
-            "node", "scripts/xrpl-verify-live.mjs", tx_hash, *( ["--wait"] if wait else [] ),
-            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
-        )
-        out, err = await proc.communicate()
-        if proc.returncode == 0:
-            return json.loads(out.decode("utf-8") or "{}")
-        return {"error": (err or out).decode("utf-8"), "tx": tx_hash}
-    except Exception as e:
-        return {"error": str(e), "tx": tx_hash}
+    """Checks XRPL tx validation over the shared rippled connection, optionally waiting."""
+    key = f"xrpl:{os.getenv('XRPL_NET', 'testnet')}:{tx_hash}"
+    hit, res = verify_cache.get(key)
+    if hit and (res.get("validated") or not wait):
+        return res
+    res = await xrpl_client.verify(tx_hash, wait=wait)
+    if res.get("validated"):
+        verify_cache.put(key, res, PERMANENT)
+    else:
+        verify_cache.put(key, res, verify_cache.negative_ttl if "error" in res else verify_cache.pending_ttl)
+    return res
 
 
 @app.get("/audit/pubkey")
@@ -167,64 +334,129 @@ def audit_pubkey():
     return {"pubkey": key}
 
 
-@app.get("/registry/resolve")
-async def registry_resolve(cid: str | None = None):
-    # Pick latest entry if cid not provided
-    reg = get_registry(limit=1000)["entries"]
-    entry = None
-    if cid:
-        for e in reversed(reg):
-            if e.get("cid") == cid:
-                entry = e
-                break
-    else:
-        entry = (reg or [None])[-1]
-    if not entry:
-        raise HTTPException(status_code=404, detail="CID not found in registry")
+# Per-check deadlines (seconds) for the remote checks behind /registry/resolve
+RESOLVE_TIMEOUTS = {"gateway": "RESOLVE_GATEWAY_TIMEOUT", "polygon": "RESOLVE_POLYGON_TIMEOUT", "xrpl": "RESOLVE_XRPL_TIMEOUT"}
+RESOLVE_TIMEOUT_DEFAULTS = {"gateway": "10", "polygon": "15", "xrpl": "10"}
 
-    # Gateway check
-    gw_url = entry.get("url") or f"{os.getenv('IPFS_GATEWAY','http://127.0.0.1:8082')}/ipfs/{entry.get('cid')}/"
-    async with httpx.AsyncClient(timeout=10) as client:
-        try:
-            head = await client.head(gw_url)
-            gw = {"url": gw_url, "status": head.status_code, "ok": head.status_code == 200}
-        except Exception:
-            gw = {"url": gw_url, "status": None, "ok": False}
 
-    # Polygon receipt (best-effort)
-    poly = None
-    txp = entry.get("polygon")
-    if isinstance(txp, dict):
-        txh = txp.get("tx") or txp.get("hash")
-    else:
-        txh = txp
-    if txh:
-        try:
-            poly = await verify_polygon(txh)
-        except Exception:
-            poly = {"tx": txh}
+def _resolve_timeout(check: str) -> float:
+    return float(os.getenv(RESOLVE_TIMEOUTS[check], RESOLVE_TIMEOUT_DEFAULTS[check]))
+
 
-    # XRPL link
-    xr = None
+def _entry_refs(entry: dict) -> tuple[str, str | None, str | None]:
+    """Gateway URL, Polygon tx and XRPL tx referenced by a registry entry."""
+    gw_url = entry.get("url") or f"{os.getenv('IPFS_GATEWAY','http://127.0.0.1:8082')}/ipfs/{entry.get('cid')}/"
+    txp = entry.get("polygon")
+    txh = (txp.get("tx") or txp.get("hash")) if isinstance(txp, dict) else txp
     xv = entry.get("xrpl")
-    if isinstance(xv, dict):
-        xtx = xv.get("tx") or xv.get("tx_hash")
-    else:
-        xtx = xv
-    if xtx:
-        xr = await verify_xrpl(xtx)
+    xtx = (xv.get("tx") or xv.get("tx_hash")) if isinstance(xv, dict) else xv
+    return gw_url, txh or None, xtx or None
+
+
+async def _gateway_check(url: str) -> dict:
+    res = await _gateway_head(url, timeout=_resolve_timeout("gateway"))
+    if "error" in res:
+        raise RuntimeError(res["error"])
+    return res
+
+
+async def _run_check(check: str, coro) -> tuple[object, dict]:
+    """Run one remote check under its own deadline; never raises."""
+    t0 = time.perf_counter()
+    try:
+        res = await asyncio.wait_for(coro, _resolve_timeout(check))
+        status = {"status": "ok"}
+    except asyncio.TimeoutError:
+        res, status = None, {"status": "timeout"}
+    except Exception as e:
+        res, status = None, {"status": "error", "error": str(e) or type(e).__name__}
+    status["ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    return res, status
+
 
-    bundle = {
+def _bundle(entry: dict, results: dict[str, tuple[object, dict]]) -> dict:
+    gw_url, txh, xtx = _entry_refs(entry)
+    gw, poly, xr = (results.get(k, (None, None))[0] for k in ("gateway", "polygon", "xrpl"))
+    return {
         "cid": entry.get("cid"),
         "time": entry.get("time"),
         "url": gw_url,
         "sha256": entry.get("sha") or entry.get("sha256"),
-        "gateway": gw,
-        "polygon": poly,
-        "xrpl": xr,
+        "gateway": gw or {"url": gw_url, "status": None, "ok": False},
+        "polygon": poly or ({"tx": txh} if txh else None),
+        "xrpl": xr or ({"tx": xtx} if xtx else None),
+        "checks": {k: results[k][1] if k in results else {"status": "skipped"} for k in ("gateway", "polygon", "xrpl")},
         "entry": entry,
     }
-    return bundle
+
+
+def _entry_checks(entry: dict) -> dict[str, tuple[str, object]]:
+    """check name -> (dedupe key, coroutine factory) for one registry entry."""
+    gw_url, txh, xtx = _entry_refs(entry)
+    checks = {"gateway": (gw_url, lambda: _gateway_check(gw_url))}
+    if txh:
+        checks["polygon"] = (txh, lambda: verify_polygon(txh))
+    if xtx:
+        checks["xrpl"] = (xtx, lambda: verify_xrpl(xtx))
+    return checks
+
+
+@app.get("/registry/resolve")
+async def registry_resolve(cid: str | None = None):
+    # Pick latest entry if cid not provided
+    reg = registry_cache(_registry_path())
+    entry = reg.lookup(cid) if cid else reg.latest()
+    if not entry:
+        raise HTTPException(status_code=404, detail="CID not found in registry")
+
+    # Gateway, Polygon and XRPL checks run concurrently, each under its own
+    # deadline; a slow or failed check degrades to a partial result.
+    checks = _entry_checks(entry)
+    done = await asyncio.gather(*(_run_check(k, make()) for k, (_, make) in checks.items()))
+    return _bundle(entry, dict(zip(checks, done)))
+
+
+class ResolveBatchIn(BaseModel):
+    cids: list[str]
+
+
+@app.post("/registry/resolve/batch")
+async def registry_resolve_batch(body: ResolveBatchIn):
+    """Resolve many CIDs; streams one ``registry_resolve``-shaped bundle per line as each completes."""
+    cids = list(dict.fromkeys(c for c in body.cids if c))
+    entries = registry_cache(_registry_path()).lookup_many(cids)
+    sem = asyncio.Semaphore(int(os.getenv("RESOLVE_BATCH_CONCURRENCY", "16")))
+    shared: dict[tuple[str, str], asyncio.Future] = {}
+
+    async def bounded(check, make):
+        async with sem:
+            return await _run_check(check, make())
+
+    def run(check, key, make):
+        # Entries pointing at the same gateway URL / tx share one remote check
+        fut = shared.get((check, key))
+        if fut is None:
+            fut = shared[(check, key)] = asyncio.ensure_future(bounded(check, make))
+        return fut
+
+    async def resolve_one(cid):
+        entry = entries.get(cid)
+        if entry is None:
+            return {"cid": cid, "error": "CID not found in registry"}
+        checks = _entry_checks(entry)
+        done = await asyncio.gather(*(run(k, key, make) for k, (key, make) in checks.items()))
+        return _bundle(entry, dict(zip(checks, done)))
+
+    async def stream():
+        tasks = [asyncio.ensure_future(resolve_one(c)) for c in cids]
+        try:
+            for fut in asyncio.as_completed(tasks):
+                yield json.dumps(await fut) + "\n"
+        finally:
+            for t in [*tasks, *shared.values()]:
+                t.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
 
 
 # Kernel POST aliases for universal call shapes
@@ -0,0 +1,121 @@
+"""Application-scoped outbound HTTP pool for the Ops API.
+
+One ``httpx.AsyncClient`` is shared by every verify/resolve call so gateway
+HEADs and chain RPCs reuse warm keep-alive connections (and HTTP/2 when the
+``h2`` package is installed) instead of paying a TCP + TLS handshake per
+request.  ``main.py`` opens it in the app lifespan and closes it on shutdown.
+
+Tunables (env):
+  OPS_HTTP_MAX_CONNECTIONS   total pooled connections (default 100)
+  OPS_HTTP_MAX_KEEPALIVE     idle keep-alive connections kept (default 20)
+  OPS_HTTP_KEEPALIVE_EXPIRY  seconds an idle connection is kept (default 30)
+  OPS_HTTP_PER_HOST          concurrent requests per upstream host (default 10)
+  OPS_HTTP2                  "auto" (default: HTTP/2 if ``h2`` is installed), "true"
+                             (always; fails at startup without ``h2``) or "false"
+"""
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+import asyncio, importlib.util, os
+
+import httpx
+
+
+def _http2_enabled() -> bool:
+    mode = os.getenv("OPS_HTTP2", "auto").lower()
+    if mode in ("0", "false", "no", "off"):
+        return False
+    if mode in ("1", "true", "yes", "on"):
+        return True  # httpx raises on client creation if h2 is missing
+    # httpx only negotiates HTTP/2 when the optional h2 package is present
+    return importlib.util.find_spec("h2") is not None
+
+
+class HttpPool:
+    def __init__(self):
+        self.max_connections = int(os.getenv("OPS_HTTP_MAX_CONNECTIONS", "100"))
+        self.max_keepalive = int(os.getenv("OPS_HTTP_MAX_KEEPALIVE", "20"))
+        self.keepalive_expiry = float(os.getenv("OPS_HTTP_KEEPALIVE_EXPIRY", "30"))
+        self.per_host = int(os.getenv("OPS_HTTP_PER_HOST", "10"))
+        self.http2 = _http2_enabled()
+        self._client: httpx.AsyncClient | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._hosts: dict[str, asyncio.Semaphore] = {}
+        self._retiring: set[asyncio.Future] = set()
+
+    def client(self) -> httpx.AsyncClient:
+        """The shared client; created on first use if the lifespan hook did not run."""
+        loop = asyncio.get_running_loop()
+        if self._client is not None and self._loop is not loop:
+            # Connections are bound to the loop that opened them: close them, then start over.
+            retire_client(self._client, self._loop, self._retiring)
+            self._client = None
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=15,
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive,
+                    keepalive_expiry=self.keepalive_expiry,
+                ),
+            )
+            self._loop = loop
+            self._hosts = {}
+        return self._client
+
+    async def start(self):
+        self.client()
+
+    async def aclose(self):
+        client, self._client, self._loop = self._client, None, None
+        self._hosts = {}
+        if client is not None:
+            await client.aclose()
+
+    @asynccontextmanager
+    async def _slot(self, url: str):
+        host = urlsplit(url).netloc
+        sem = self._hosts.get(host)
+        if sem is None:
+            sem = self._hosts[host] = asyncio.Semaphore(self.per_host)
+        async with sem:
+            yield
+
+    async def head(self, url: str, **kw) -> httpx.Response:
+        client = self.client()
+        async with self._slot(url):
+            return await client.head(url, **kw)
+
+    async def get(self, url: str, **kw) -> httpx.Response:
+        client = self.client()
+        async with self._slot(url):
+            return await client.get(url, **kw)
+
+    async def post(self, url: str, **kw) -> httpx.Response:
+        client = self.client()
+        async with self._slot(url):
+            return await client.post(url, **kw)
+
+
+def retire_client(client: httpx.AsyncClient, loop: asyncio.AbstractEventLoop | None, pending: set):
+    """Close a client bound to ``loop`` once callers moved to another loop.
+
+    The close runs on ``loop`` while it is still running; otherwise it is
+    attempted from the current loop, with the task held in ``pending``.
+    """
+    if loop is not None and loop.is_running():
+        asyncio.run_coroutine_threadsafe(_close_quietly(client), loop)
+        return
+    task = asyncio.get_running_loop().create_task(_close_quietly(client))
+    pending.add(task)
+    task.add_done_callback(pending.discard)
+
+
+async def _close_quietly(client: httpx.AsyncClient):
+    try:
+        await client.aclose()
+    except Exception:
+        pass  # transports of a closed loop cannot be shut down cleanly; they are dropped
+
+
+http_pool = HttpPool()
@@ -0,0 +1,505 @@
+"""Registry engine for the append-only ``trustiva-registry.ndjson`` file.
+
+``tail()`` seeks backwards from the end of the file so ``/registry?limit=N``
+only touches the last N lines, and ``lookup()`` resolves a CID through a
+persistent CID -> byte-offset index kept in a sidecar file next to the
+registry (``<registry>.idx``).  The index is extended incrementally as lines
+are appended and rebuilt when the registry is rotated or rewritten.
+
+``RegistryCache`` sits in front of the index and keeps recently used entries
+parsed in memory, keyed on the file's (inode, size, mtime) so unchanged files
+are served without touching the disk.
+"""
+from pathlib import Path
+from collections import OrderedDict, deque
+import hashlib, json, mmap, os, threading
+
+BLOCK = 64 * 1024
+HEAD_BYTES = 4096
+INDEX_VERSION = 2
+CACHE_ENTRIES = int(os.getenv("REGISTRY_CACHE_ENTRIES", "2048"))
+
+
+def _parse(line: bytes) -> dict | None:
+    try:
+        obj = json.loads(line)
+    except Exception:
+        return None
+    return obj if isinstance(obj, dict) else None
+
+
+class RegistryIndex:
+    """CID -> byte-offset index over an NDJSON registry.
+
+    The sidecar starts with a JSON header identifying the registry file
+    (inode, and a fingerprint of its first ``head_len`` bytes) followed by one
+    ``<offset> <end> <cid>`` record per complete registry line, so appends
+    to the registry only ever append to the index.
+    """
+
+    def __init__(self, path: Path, index_path: Path | None = None):
+        self.path = Path(path)
+        self.index_path = Path(index_path) if index_path else self.path.with_name(self.path.name + ".idx")
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._reset()
+
+    def _reset(self):
+        self._ino = None
+        self._head = ""
+        self._head_len = 0
+        self._pos = 0
+        self._offsets: dict[str, int] = {}
+
+    # ----------------------- reads -----------------------
+    def tail(self, limit: int) -> list[dict]:
+        """Return the last ``limit`` parseable entries (all when ``limit <= 0``)."""
+        try:
+            f = self.path.open("rb")
+        except FileNotFoundError:
+            return []
+        with f:
+            if limit <= 0:
+                return [e for e in map(_parse, f.read().splitlines()) if e is not None]
+            return self._tail_entries(f, os.fstat(f.fileno()).st_size, limit)
+
+    @staticmethod
+    def _tail_entries(f, size: int, limit: int) -> list[dict]:
+        # Read fixed blocks backwards until `limit` complete lines parse; the
+        # first line of the buffer may be cut mid-way unless we reached BOF.
+        buf = b""
+        end = size
+        while end > 0:
+            start = max(0, end - BLOCK)
+            f.seek(start)
+            buf = f.read(end - start) + buf
+            end = start
+            if buf.count(b"\n") <= limit and end > 0:
+                continue
+            lines = buf.splitlines()
+            if end > 0:
+                lines = lines[1:]
+            entries = [e for e in map(_parse, lines) if e is not None]
+            if len(entries) >= limit or end == 0:
+                return entries[-limit:]
+        return []
+
+    def latest(self) -> dict | None:
+        entries = self.tail(1)
+        return entries[-1] if entries else None
+
+    def lookup(self, cid: str) -> dict | None:
+        """Latest registry entry for ``cid``: one seek + one line read."""
+        return self.find(cid)[1]
+
+    def find(self, cid: str) -> tuple[int | None, dict | None]:
+        """Like ``lookup`` but also returns the entry's byte offset."""
+        with self._lock:
+            self._refresh()
+            off = self._offsets.get(cid)
+            if off is None:
+                return None, None
+            entry = self._read_at(off)
+            if entry is None or entry.get("cid") != cid:
+                # Index no longer matches the file contents; rebuild once.
+                self._rebuild()
+                off = self._offsets.get(cid)
+                entry = self._read_at(off) if off is not None else None
+            return (off, entry) if entry is not None else (None, None)
+
+    def find_many(self, cids) -> dict[str, tuple[int, dict]]:
+        """Resolve many CIDs with one refresh and one pass over the file in offset order."""
+        with self._lock:
+            self._refresh()
+            wanted = sorted((off, cid) for cid in set(cids) if (off := self._offsets.get(cid)) is not None)
+            found: dict[str, tuple[int, dict]] = {}
+            if not wanted:
+                return found
+            try:
+                with self.path.open("rb") as f:
+                    for off, cid in wanted:
+                        f.seek(off)
+                        entry = _parse(f.readline())
+                        if entry is not None and entry.get("cid") == cid:
+                            found[cid] = (off, entry)
+            except FileNotFoundError:
+                return {}
+            if len(found) != len(wanted):
+                # stale offsets: rebuild and fall back to single lookups
+                self._rebuild()
+                for _, cid in wanted:
+                    if cid not in found:
+                        off = self._offsets.get(cid)
+                        entry = self._read_at(off) if off is not None else None
+                        if entry is not None:
+                            found[cid] = (off, entry)
+            return found
+
+    def _read_at(self, off: int) -> dict | None:
+        try:
+            with self.path.open("rb") as f:
+                f.seek(off)
+                return _parse(f.readline())
+        except FileNotFoundError:
+            return None
+
+    # ----------------------- maintenance -----------------------
+    def _fingerprint(self, f, length: int) -> str:
+        f.seek(0)
+        return hashlib.sha256(f.read(length)).hexdigest()
+
+    def _refresh(self):
+        if not self._loaded:
+            self._load()
+            self._loaded = True
+        try:
+            f = self.path.open("rb")
+        except FileNotFoundError:
+            if self._offsets or self._pos:
+                self._reset()
+                self.index_path.unlink(missing_ok=True)
+            return
+        with f:
+            st = os.fstat(f.fileno())
+            rotated = (
+                self._ino is not None and (
+                    st.st_ino != self._ino
+                    or st.st_size < self._pos
+                    # same prefix length as at scan time, or every append would look like a rewrite
+                    or (self._pos and self._fingerprint(f, self._head_len) != self._head)
+                )
+            )
+            if rotated:
+                self._reset()
+            if self._ino is None:
+                self._ino = st.st_ino
+                self._write([], truncate=True)
+            if st.st_size > self._pos:
+                self._scan(f, st.st_size)
+
+    def _rebuild(self):
+        self._reset()
+        self._refresh()
+
+    def _scan(self, f, size: int):
+        f.seek(self._pos)
+        chunk = f.read(size - self._pos)
+        records = []
+        pos = self._pos
+        for line in chunk.splitlines(keepends=True):
+            if not line.endswith(b"\n"):
+                break  # partial append in progress; pick it up next time
+            obj = _parse(line)
+            cid = obj.get("cid") if obj else None
+            end = pos + len(line)
+            if isinstance(cid, str) and cid and " " not in cid:
+                self._offsets[cid] = pos
+                records.append(f"{pos} {end} {cid}\n")
+            else:
+                records.append(f"{pos} {end} -\n")
+            pos = end
+        if pos == self._pos:
+            return
+        first = self._pos == 0
+        self._pos = pos
+        if first:
+            self._head_len = min(pos, HEAD_BYTES)
+            self._head = self._fingerprint(f, self._head_len)
+            self._write(records, truncate=True)
+        else:
+            self._write(records)
+
+    def _write(self, records: list[str], truncate: bool = False):
+        try:
+            if truncate:
+                header = {"v": INDEX_VERSION, "ino": self._ino, "head": self._head, "head_len": self._head_len}
+                tmp = self.index_path.with_name(self.index_path.name + ".tmp")
+                tmp.write_text(json.dumps(header) + "\n" + "".join(records))
+                os.replace(tmp, self.index_path)
+            else:
+                with self.index_path.open("a") as out:
+                    out.writelines(records)
+        except OSError:
+            pass  # the index is an optimisation; a read-only dir just costs a rescan
+
+    def _load(self):
+        try:
+            f = self.index_path.open()
+        except OSError:
+            return
+        with f:
+            try:
+                header = json.loads(f.readline())
+            except Exception:
+                return
+            if header.get("v") != INDEX_VERSION:
+                return
+            offsets, pos = {}, 0
+            for ln in f:
+                parts = ln.split()
+                if not ln.endswith("\n") or len(parts) != 3:
+                    return  # torn or corrupt index: rebuild from scratch
+                try:
+                    off, end = int(parts[0]), int(parts[1])
+                except ValueError:
+                    return
+                if off != pos:
+                    return
+                if parts[2] != "-":
+                    offsets[parts[2]] = off
+                pos = end
+        self._ino = header.get("ino")
+        self._head = header.get("head") or ""
+        self._head_len = int(header.get("head_len") or 0)
+        self._offsets = offsets
+        self._pos = pos
+
+
+_indexes: dict[str, RegistryIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def registry_index(path: Path) -> RegistryIndex:
+    """Process-wide ``RegistryIndex`` for ``path``."""
+    key = str(Path(path).resolve())
+    with _indexes_lock:
+        idx = _indexes.get(key)
+        if idx is None:
+            idx = _indexes[key] = RegistryIndex(Path(path))
+        return idx
+
+
+class RegistryCache:
+    """In-process cache of parsed registry entries.
+
+    The cache is validated against the registry's ``(st_ino, st_size,
+    st_mtime_ns)`` on every call.  An unchanged signature is served from
+    memory; a file that only grew has just its new tail mmap'd and parsed;
+    anything else (rotation, rewrite) drops the cache.  Parsed entries live
+    in an LRU bounded by ``max_entries``; CIDs outside the recent window are
+    resolved through the ``RegistryIndex`` and then cached.
+    """
+
+    def __init__(self, path: Path, max_entries: int = CACHE_ENTRIES, index: RegistryIndex | None = None):
+        self.path = Path(path)
+        self.index = index or RegistryIndex(self.path)
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.RLock()
+        self.hits = self.misses = self.evictions = self.reloads = self.appends = 0
+        self._clear()
+
+    def _clear(self):
+        self._sig = None
+        self._pos = 0  # end of the last complete line parsed into the window
+        self._head = b""
+        self._entries: OrderedDict[int, dict] = OrderedDict()
+        self._by_cid: dict[str, int] = {}
+        self._absent: OrderedDict[str, None] = OrderedDict()  # negative lookups, LRU like _entries
+        self._window: deque[int] = deque(maxlen=self.max_entries)
+        self._from_start = False
+        self._partial = False  # file ends in an unterminated line the window lacks
+
+    # ----------------------- public API -----------------------
+    def tail(self, limit: int) -> list[dict]:
+        with self._lock:
+            self._sync()
+            window = list(self._window)
+            if limit > 0 and len(window) > limit:
+                window = window[-limit:]
+            servable = not self._partial and ((limit > 0 and len(window) >= limit) or self._from_start)
+            if servable and all(off in self._entries for off in window):
+                self.hits += 1
+                for off in window:
+                    self._entries.move_to_end(off)
+                return [self._entries[off] for off in window]
+            self.misses += 1
+        return self.index.tail(limit)
+
+    def latest(self) -> dict | None:
+        entries = self.tail(1)
+        return entries[-1] if entries else None
+
+    def lookup(self, cid: str) -> dict | None:
+        with self._lock:
+            self._sync()
+            off = self._by_cid.get(cid)
+            if off is not None and off in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(off)
+                return self._entries[off]
+            if cid in self._absent:
+                self.hits += 1
+                self._absent.move_to_end(cid)
+                return None
+            self.misses += 1
+            off, entry = self.index.find(cid)
+            if entry is None:
+                self._put_absent(cid)
+                return None
+            self._put(off, entry)
+            return entry
+
+    def lookup_many(self, cids) -> dict[str, dict]:
+        """Resolve many CIDs at once; cache misses share one index pass."""
+        out: dict[str, dict] = {}
+        with self._lock:
+            self._sync()
+            cold = []
+            for cid in dict.fromkeys(cids):
+                off = self._by_cid.get(cid)
+                if off is not None and off in self._entries:
+                    self.hits += 1
+                    self._entries.move_to_end(off)
+                    out[cid] = self._entries[off]
+                elif cid in self._absent:
+                    self.hits += 1
+                    self._absent.move_to_end(cid)
+                else:
+                    self.misses += 1
+                    cold.append(cid)
+            if cold:
+                found = self.index.find_many(cold)
+                for cid in cold:
+                    if cid in found:
+                        off, entry = found[cid]
+                        self._put(off, entry)
+                        out[cid] = entry
+                    else:
+                        self._put_absent(cid)
+        return out
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / total) if total else None,
+                "evictions": self.evictions,
+                "reloads": self.reloads,
+                "appends": self.appends,
+            }
+
+    # ----------------------- internals -----------------------
+    def _put(self, off: int, entry: dict):
+        self._entries[off] = entry
+        self._entries.move_to_end(off)
+        cid = entry.get("cid")
+        if isinstance(cid, str) and cid and self._by_cid.get(cid, -1) <= off:
+            self._by_cid[cid] = off
+        while len(self._entries) > self.max_entries:
+            old, ev = self._entries.popitem(last=False)
+            self.evictions += 1
+            c = ev.get("cid")
+            if self._by_cid.get(c) == old:
+                del self._by_cid[c]
+
+    def _put_absent(self, cid: str):
+        self._absent[cid] = None
+        while len(self._absent) > self.max_entries:
+            self._absent.popitem(last=False)
+
+    def _sync(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            if self._sig is not None:
+                self._clear()
+            self._from_start = True
+            return
+        sig = (st.st_ino, st.st_size, st.st_mtime_ns)
+        if sig == self._sig:
+            return
+        grew = (
+            self._sig is not None
+            and st.st_ino == self._sig[0]
+            and st.st_size >= self._pos
+        )
+        try:
+            with self.path.open("rb") as f:
+                if grew and self._head_matches(f):
+                    self._append(f, st.st_size)
+                else:
+                    self._reload(f, st.st_size)
+        except FileNotFoundError:
+            self._clear()
+            return
+        self._sig = sig
+        self._partial = st.st_size > self._pos
+
+    def _head_matches(self, f) -> bool:
+        if not self._head:
+            return self._pos == 0
+        f.seek(0)
+        return f.read(len(self._head)) == self._head
+
+    def _map(self, f, start: int, size: int):
+        # mmap offsets must be multiples of the allocation granularity
+        base = start - (start % mmap.ALLOCATIONGRANULARITY)
+        return base, mmap.mmap(f.fileno(), size - base, offset=base, access=mmap.ACCESS_READ)
+
+    def _reload(self, f, size: int):
+        """Cold start: fill the window with the last ``max_entries`` lines."""
+        self._clear()
+        self.reloads += 1
+        if size == 0:
+            self._from_start = True
+            return
+        base, mm = self._map(f, 0, size)
+        with mm:
+            end = mm.rfind(b"\n") + 1  # ignore a trailing partial line
+            lines = []
+            stop = end - 1
+            while stop > 0 and len(lines) < self.max_entries:
+                start = mm.rfind(b"\n", 0, stop) + 1
+                lines.append((start, mm[start:stop]))
+                stop = start - 1
+            self._from_start = stop <= 0
+            self._head = mm[:min(end, HEAD_BYTES)]
+        for off, line in reversed(lines):
+            entry = _parse(line)
+            if entry is not None:
+                self._window.append(off)
+                self._put(off, entry)
+        self._pos = end
+
+    def _append(self, f, size: int):
+        """Parse only the bytes appended since the last sync."""
+        if size == self._pos:
+            return
+        base, mm = self._map(f, self._pos, size)
+        with mm:
+            pos = self._pos
+            while True:
+                nl = mm.find(b"\n", pos - base)
+                if nl < 0:
+                    break
+                line = mm[pos - base:nl]
+                entry = _parse(line)
+                if entry is not None:
+                    if len(self._window) == self._window.maxlen:
+                        self._from_start = False
+                    self._window.append(pos)
+                    self._put(pos, entry)
+                    self._absent.pop(entry.get("cid"), None)
+                    self.appends += 1
+                pos = base + nl + 1
+            if not self._head:
+                self._head = mm[:min(pos - base, HEAD_BYTES)] if base == 0 else b""
+        self._pos = pos
+
+
+_caches: dict[str, RegistryCache] = {}
+_caches_lock = threading.Lock()
+
+
+def registry_cache(path: Path) -> RegistryCache:
+    """Process-wide ``RegistryCache`` for ``path`` sharing its ``RegistryIndex``."""
+    key = str(Path(path).resolve())
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = RegistryCache(Path(path), index=registry_index(path))
+        return cache
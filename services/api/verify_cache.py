@@ -0,0 +1,117 @@
+"""Cache of remote verification results (Polygon receipts, XRPL txs, gateway HEADs).
+
+Results are cached according to how final they are:
+
+* finalized (a mined Polygon receipt, a validated XRPL tx) — kept until evicted
+* pending / not yet validated — ``VERIFY_CACHE_PENDING_TTL`` seconds (default 15)
+* gateway availability — ``VERIFY_CACHE_GATEWAY_TTL`` seconds (default 300)
+* failures — negative-cached for ``VERIFY_CACHE_NEGATIVE_TTL`` seconds (default 30)
+
+The in-memory LRU holds at most ``VERIFY_CACHE_ENTRIES`` results (default 4096).
+Setting ``VERIFY_CACHE_PATH`` adds a SQLite backend so results survive restarts;
+it is bounded to ``VERIFY_CACHE_DISK_ENTRIES`` rows (default 100000).
+"""
+from collections import OrderedDict
+from pathlib import Path
+import json, os, sqlite3, threading, time
+
+PERMANENT = None
+
+
+class VerifyCache:
+    def __init__(self, max_entries: int | None = None, path: str | None = None):
+        self.max_entries = max_entries or int(os.getenv("VERIFY_CACHE_ENTRIES", "4096"))
+        self.pending_ttl = float(os.getenv("VERIFY_CACHE_PENDING_TTL", "15"))
+        self.gateway_ttl = float(os.getenv("VERIFY_CACHE_GATEWAY_TTL", "300"))
+        self.negative_ttl = float(os.getenv("VERIFY_CACHE_NEGATIVE_TTL", "30"))
+        self.disk_entries = int(os.getenv("VERIFY_CACHE_DISK_ENTRIES", "100000"))
+        self._mem: OrderedDict[str, tuple[object, float | None]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+        self._puts = 0
+        self.hits = self.misses = self.evictions = 0
+        path = path if path is not None else os.getenv("VERIFY_CACHE_PATH")
+        if path:
+            self._open(Path(path))
+
+    def _open(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS verify_cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL, stored REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS verify_cache_stored ON verify_cache(stored)")
+
+    def get(self, key: str) -> tuple[bool, object]:
+        now = time.time()
+        with self._lock:
+            item = self._mem.get(key)
+            if item is None and self._db is not None:
+                row = self._db.execute("SELECT value, expires FROM verify_cache WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    item = (json.loads(row[0]), row[1])
+                    self._remember(key, item)
+            if item is not None:
+                value, expires = item
+                if expires is None or expires > now:
+                    self.hits += 1
+                    self._mem.move_to_end(key)
+                    return True, value
+                self._forget(key)
+            self.misses += 1
+            return False, None
+
+    def put(self, key: str, value, ttl: float | None = PERMANENT):
+        expires = None if ttl is None else time.time() + ttl
+        with self._lock:
+            self._remember(key, (value, expires))
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO verify_cache(key, value, expires, stored) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value), expires, time.time()),
+                )
+                self._puts += 1
+                if self._puts % 1000 == 0:
+                    self._prune()
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM verify_cache")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._mem),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "persistent": self._db is not None,
+            }
+
+    def _remember(self, key: str, item):
+        self._mem[key] = item
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+            self.evictions += 1
+
+    def _forget(self, key: str):
+        self._mem.pop(key, None)
+        if self._db is not None:
+            self._db.execute("DELETE FROM verify_cache WHERE key = ?", (key,))
+
+    def _prune(self):
+        self._db.execute("DELETE FROM verify_cache WHERE expires IS NOT NULL AND expires <= ?", (time.time(),))
+        self._db.execute(
+            "DELETE FROM verify_cache WHERE key IN ("
+            " SELECT key FROM verify_cache ORDER BY stored DESC LIMIT -1 OFFSET ?)",
+            (self.disk_entries,),
+        )
+
+
+verify_cache = VerifyCache()
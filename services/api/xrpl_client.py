@@ -0,0 +1,213 @@
+"""Native async XRPL verification client for the Ops API.
+
+Replaces spawning ``node scripts/xrpl-verify-live.mjs`` per call: one
+persistent WebSocket connection to rippled is shared by every lookup, with
+concurrent ``tx`` requests multiplexed over it by request id.  ``verify(...,
+wait=True)`` subscribes to the ``ledger`` stream and re-checks the tx on each
+ledger close instead of polling on a timer.  Dropped connections are
+re-established on the next request (and the ledger subscription restored).
+
+Env:
+  XRPL_WS_URL             explicit endpoint (default depends on XRPL_NET)
+  XRPL_NET                "mainnet" or testnet (default)
+  XRPL_REQUEST_TIMEOUT    seconds per request (default 10)
+  XRPL_WAIT_TIMEOUT_MS    max wait for validation (default 20000, as the Node script)
+"""
+import asyncio, itertools, json, os, time
+
+from websockets.asyncio.client import connect
+from websockets.exceptions import ConnectionClosed
+
+RECONNECT_ATTEMPTS = 3
+
+
+def _default_url() -> str:
+    if os.getenv("XRPL_WS_URL"):
+        return os.environ["XRPL_WS_URL"]
+    return "wss://xrplcluster.com" if os.getenv("XRPL_NET") == "mainnet" else "wss://s.altnet.rippletest.net:51233"
+
+
+class XRPLError(Exception):
+    def __init__(self, error: str, response: dict | None = None):
+        super().__init__(error)
+        self.error = error
+        self.response = response or {}
+
+
+class XRPLClient:
+    def __init__(self, url: str | None = None, request_timeout: float | None = None):
+        self.url = url
+        self.request_timeout = request_timeout or float(os.getenv("XRPL_REQUEST_TIMEOUT", "10"))
+        self._ws = None
+        self._loop = None
+        self._reader: asyncio.Task | None = None
+        self._connect_lock: asyncio.Lock | None = None
+        self._pending: dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+        self._subscribers = 0
+        self._ledger_closed: asyncio.Event | None = None
+        self.ledger_index: int | None = None
+
+    # ----------------------- connection -----------------------
+    async def _ensure(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # state from another event loop cannot be reused
+            self._ws, self._reader, self._pending = None, None, {}
+            self._connect_lock, self._ledger_closed = asyncio.Lock(), asyncio.Event()
+            self._loop = loop
+        if self._ws is not None:
+            return self._ws
+        async with self._connect_lock:
+            if self._ws is not None:
+                return self._ws
+            delay, last = 0.2, None
+            for attempt in range(RECONNECT_ATTEMPTS):
+                try:
+                    ws = await asyncio.wait_for(connect(self.url or _default_url(), max_size=None),
+                                                self.request_timeout)
+                    break
+                except Exception as e:
+                    last = e
+                    if attempt + 1 < RECONNECT_ATTEMPTS:
+                        await asyncio.sleep(delay)
+                        delay *= 2
+            else:
+                raise ConnectionError(f"XRPL connect failed: {last}")
+            self._ws = ws
+            self._reader = asyncio.create_task(self._read(ws))
+            if self._subscribers:
+                await self._send(ws, {"command": "subscribe", "streams": ["ledger"]})
+            return ws
+
+    async def _send(self, ws, payload: dict) -> dict:
+        rid = next(self._ids)
+        fut = asyncio.get_running_loop().create_future()
+        self._pending[rid] = fut
+        try:
+            await ws.send(json.dumps({**payload, "id": rid}))
+            return await asyncio.wait_for(fut, self.request_timeout)
+        finally:
+            self._pending.pop(rid, None)
+
+    async def _read(self, ws):
+        try:
+            async for raw in ws:
+                try:
+                    msg = json.loads(raw)
+                except ValueError:
+                    continue
+                if msg.get("type") == "ledgerClosed":
+                    self.ledger_index = msg.get("ledger_index")
+                    ev, self._ledger_closed = self._ledger_closed, asyncio.Event()
+                    ev.set()
+                    continue
+                fut = self._pending.get(msg.get("id"))
+                if fut is not None and not fut.done():
+                    fut.set_result(msg)
+        except ConnectionClosed:
+            pass
+        finally:
+            if self._ws is ws:
+                self._ws = None
+            for fut in list(self._pending.values()):
+                if not fut.done():
+                    fut.set_exception(ConnectionError("XRPL connection closed"))
+            # wake waiters so they re-check over a fresh connection
+            ev, self._ledger_closed = self._ledger_closed, asyncio.Event()
+            ev.set()
+
+    async def request(self, payload: dict) -> dict:
+        """Send one rippled command; returns ``result`` or raises ``XRPLError``."""
+        for attempt in range(2):
+            ws = await self._ensure()
+            try:
+                msg = await self._send(ws, payload)
+                break
+            except (ConnectionError, ConnectionClosed):
+                if attempt:
+                    raise
+                self._ws = None
+        if msg.get("status") == "error" or "error" in msg:
+            raise XRPLError(msg.get("error") or "error", msg)
+        return msg.get("result") or {}
+
+    async def aclose(self):
+        ws, self._ws = self._ws, None
+        if ws is not None:
+            await ws.close()
+        if self._reader is not None:
+            await asyncio.gather(self._reader, return_exceptions=True)
+            self._reader = None
+
+    # ----------------------- verification -----------------------
+    async def tx(self, tx_hash: str) -> dict:
+        r = await self.request({"command": "tx", "transaction": tx_hash, "binary": False})
+        meta = r.get("meta") or {}
+        return {
+            "validated": bool(r.get("validated")),
+            "ledger_index": r.get("ledger_index"),
+            "result": meta.get("TransactionResult") if isinstance(meta, dict) else None,
+            "tx": tx_hash,
+        }
+
+    async def verify(self, tx_hash: str, wait: bool = False, timeout: float | None = None) -> dict:
+        """Same shape as the Node script: ``{validated, ledger_index, result, tx}``."""
+        try:
+            out = await self.tx(tx_hash)
+        except XRPLError as e:
+            if not wait or e.error != "txnNotFound":
+                return {"validated": False, "error": e.error, "tx": tx_hash}
+            out = {"validated": False, "error": e.error, "tx": tx_hash}
+        except Exception as e:
+            return {"validated": False, "error": str(e) or type(e).__name__, "tx": tx_hash}
+        if out["validated"] or not wait:
+            return out
+        timeout = timeout if timeout is not None else float(os.getenv("XRPL_WAIT_TIMEOUT_MS", "20000")) / 1000
+        deadline = time.monotonic() + timeout
+        try:
+            await self._subscribe()
+            while (left := deadline - time.monotonic()) > 0:
+                ev = self._ledger_closed
+                try:
+                    await asyncio.wait_for(ev.wait(), left)
+                except asyncio.TimeoutError:
+                    break
+                try:
+                    out = await self.tx(tx_hash)
+                except XRPLError as e:
+                    if e.error != "txnNotFound":
+                        return {"validated": False, "error": e.error, "tx": tx_hash}
+                    continue
+                except (ConnectionError, ConnectionClosed):
+                    await self._subscribe(again=True)
+                    continue
+                if out["validated"]:
+                    break
+        except Exception as e:
+            # a timed-out re-check or a failed reconnect ends the wait, not the request
+            return {"validated": False, "error": str(e) or type(e).__name__, "tx": tx_hash}
+        finally:
+            await self._unsubscribe()
+        return out
+
+    async def _subscribe(self, again: bool = False):
+        if not again:
+            self._subscribers += 1
+        # (re)connecting restores the subscription while there are waiters
+        ws = self._ws
+        if ws is None:
+            await self._ensure()
+        elif not again and self._subscribers == 1:
+            await self.request({"command": "subscribe", "streams": ["ledger"]})
+
+    async def _unsubscribe(self):
+        self._subscribers -= 1
+        if self._subscribers == 0 and self._ws is not None:
+            try:
+                await self.request({"command": "unsubscribe", "streams": ["ledger"]})
+            except Exception:
+                pass
+
+
+xrpl_client = XRPLClient()
@@ -0,0 +1,234 @@
+"""Directory hashing engine behind ``scripts/hash_directory.py``.
+
+``tree_digest`` produces exactly the digest the original single-threaded
+``sha256_path`` did — one running SHA-256 over ``relpath || contents`` for
+every file in sorted path order — but reads files through a thread pool with
+large/mmap'd reads so I/O and per-file hashing overlap across cores, and
+keeps a manifest cache keyed on ``(path, size, mtime_ns, inode)``:
+
+* if no file in the tree changed, the cached tree digest is returned without
+  reading any file contents;
+* per-file SHA-256 digests (``file_digests``) are only recomputed for files
+  whose stat key changed.
+
+The flat digest is a single running hash, so when anything changed every file
+still has to be streamed into it in order; only the per-file digests (used by
+Merkle trees and delta publishing) are incremental.
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import hashlib, json, mmap, os, threading, time
+
+CACHE_VERSION = 1
+READ_BYTES = 1 << 20          # read size for streamed files
+LARGE_FILE = 64 << 20         # files above this are streamed, not prefetched whole
+PREFETCH_BYTES = 256 << 20    # cap on file bytes held in memory ahead of the hasher
+RACY_NS = 2_000_000_000       # don't trust stat keys this close to "now"
+
+
+def default_cache_path() -> Path:
+    return Path(os.getenv("HASH_CACHE_PATH", ".hash-cache.json"))
+
+
+def default_workers() -> int:
+    return int(os.getenv("HASH_WORKERS", "0")) or min(32, (os.cpu_count() or 1) + 4)
+
+
+def list_files(root: Path) -> list[Path]:
+    # Path ordering (by parts) is part of the digest definition; keep it.
+    return sorted([x for x in root.rglob("*") if x.is_file()])
+
+
+def _stat_key(st: os.stat_result) -> list[int]:
+    return [st.st_size, st.st_mtime_ns, st.st_ino]
+
+
+def _read(fp: Path, size: int) -> bytes:
+    if size == 0:
+        return b""
+    with fp.open("rb") as f:
+        try:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return mm[:]
+        except (ValueError, OSError):
+            return f.read()
+
+
+def _iter_chunks(fp: Path):
+    with fp.open("rb") as f:
+        for chunk in iter(lambda: f.read(READ_BYTES), b""):
+            yield chunk
+
+
+def sha256_file(fp: Path) -> str:
+    h = hashlib.sha256()
+    with fp.open("rb") as f:
+        try:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                h.update(mm)
+                return h.hexdigest()
+        except (ValueError, OSError):
+            pass  # empty file or not mappable
+    for chunk in _iter_chunks(fp):
+        h.update(chunk)
+    return h.hexdigest()
+
+
+class DigestCache:
+    """Persistent ``{path: (size, mtime_ns, inode, sha256)}`` manifest plus tree digests."""
+
+    def __init__(self, path: Path | None = None):
+        self.path = Path(path) if path else default_cache_path()
+        self.files: dict[str, list] = {}
+        self.trees: dict[str, list] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        try:
+            data = json.loads(self.path.read_text())
+            if data.get("v") == CACHE_VERSION:
+                self.files = data.get("files") or {}
+                self.trees = data.get("trees") or {}
+        except (OSError, ValueError):
+            pass
+
+    def file_digest(self, fp: Path, st: os.stat_result) -> str | None:
+        rec = self.files.get(str(fp))
+        if rec and rec[:3] == _stat_key(st):
+            return rec[3]
+        return None
+
+    def put_file(self, fp: Path, st: os.stat_result, digest: str):
+        if time.time_ns() - st.st_mtime_ns < RACY_NS:
+            return  # could still change within the same mtime tick
+        with self._lock:
+            self.files[str(fp)] = _stat_key(st) + [digest]
+            self._dirty = True
+
+    def put_tree(self, root: Path, sig: str, digest: str, racy: bool):
+        if racy:
+            return
+        self.trees[str(root)] = [sig, digest]
+        self._dirty = True
+
+    def save(self):
+        if not self._dirty:
+            return
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        try:
+            tmp.write_text(json.dumps({"v": CACHE_VERSION, "files": self.files, "trees": self.trees}))
+            os.replace(tmp, self.path)
+            self._dirty = False
+        except OSError:
+            pass
+
+
+def _manifest(root: Path) -> list[tuple[Path, str, os.stat_result]]:
+    out = []
+    for fp in list_files(root):
+        out.append((fp, fp.relative_to(root).as_posix(), fp.stat()))
+    return out
+
+
+def _signature(manifest) -> tuple[str, bool]:
+    h = hashlib.sha256()
+    now = time.time_ns()
+    racy = False
+    for fp, rel, st in manifest:
+        h.update(json.dumps([rel] + _stat_key(st)).encode())
+        racy = racy or now - st.st_mtime_ns < RACY_NS
+    return h.hexdigest(), racy
+
+
+def file_digests(root: Path, cache: DigestCache | None = None, workers: int | None = None) -> dict[str, str]:
+    """``{relpath: sha256}`` for every file under ``root``; only changed files are read."""
+    root = Path(root).resolve()
+    manifest = _manifest(root)
+    out: dict[str, str] = {}
+    todo = []
+    for fp, rel, st in manifest:
+        d = cache.file_digest(fp, st) if cache else None
+        if d is None:
+            todo.append((fp, rel, st))
+        else:
+            out[rel] = d
+    if todo:
+        with ThreadPoolExecutor(workers or default_workers()) as ex:
+            for (fp, rel, st), d in zip(todo, ex.map(lambda t: sha256_file(t[0]), todo)):
+                out[rel] = d
+                if cache:
+                    cache.put_file(fp, st, d)
+    return dict(sorted(out.items()))
+
+
+def tree_digest(p: Path, cache: DigestCache | None = None, workers: int | None = None) -> str:
+    """Digest of a file or directory, identical to the original ``sha256_path``."""
+    p = Path(p)
+    if p.is_file():
+        return sha256_file(p)
+    root = p.resolve()
+    manifest = _manifest(root)
+    sig, racy = _signature(manifest)
+    if cache:
+        rec = cache.trees.get(str(root))
+        if rec and rec[0] == sig:
+            return rec[1]
+
+    h = hashlib.sha256()
+    with ThreadPoolExecutor(workers or default_workers()) as ex:
+        for fp, rel, st, data in _prefetch(ex, manifest):
+            h.update(rel.encode())
+            if data is None:
+                fh = hashlib.sha256()
+                for chunk in _iter_chunks(fp):
+                    h.update(chunk)
+                    fh.update(chunk)
+                digest = fh.hexdigest()
+            else:
+                data, digest = data
+                h.update(data)
+            if cache:
+                cache.put_file(fp, st, digest)
+    digest = h.hexdigest()
+    if cache:
+        cache.put_tree(root, sig, digest, racy)
+    return digest
+
+
+def _load(fp: Path, size: int) -> tuple[bytes, str]:
+    data = _read(fp, size)
+    return data, hashlib.sha256(data).hexdigest()
+
+
+def _prefetch(ex: ThreadPoolExecutor, manifest):
+    """Yield ``(fp, rel, stat, (bytes, sha256) | None)`` in order, reading ahead in the pool.
+
+    At most ``PREFETCH_BYTES`` of file contents are in flight; files larger than
+    ``LARGE_FILE`` yield ``None`` and are streamed by the caller.
+    """
+    pending = deque()  # (fp, rel, st, future | None)
+    in_flight = 0
+    it = iter(manifest)
+    exhausted = False
+    while pending or not exhausted:
+        while not exhausted and (not pending or in_flight < PREFETCH_BYTES):
+            try:
+                fp, rel, st = next(it)
+            except StopIteration:
+                exhausted = True
+                break
+            if st.st_size > LARGE_FILE:
+                pending.append((fp, rel, st, None))
+                if in_flight:
+                    break  # stream it once earlier prefetches drain
+            else:
+                pending.append((fp, rel, st, ex.submit(_load, fp, st.st_size)))
+                in_flight += st.st_size
+        if not pending:
+            break
+        fp, rel, st, fut = pending.popleft()
+        if fut is None:
+            yield fp, rel, st, None
+        else:
+            in_flight -= st.st_size
+            yield fp, rel, st, fut.result()
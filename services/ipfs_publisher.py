@@ -0,0 +1,503 @@
+"""Async IPFS publishing library behind ``scripts/publish_to_ipfs.py``.
+
+The orchestrator awaits :func:`publish` in-process instead of spawning the
+script per ``webmaster`` task; the script is a thin ``asyncio.run`` wrapper.
+Uploads go through one pooled ``httpx.AsyncClient`` (or the ``ipfs`` CLI
+when it is installed), at most ``IPFS_PUBLISH_CONCURRENCY`` publishes run at
+once (default 2), and progress is reported as structured events::
+
+    {"id", "path", "phase": queued|hashing|uploading|building|done|error,
+     "files", "done_files", "bytes", "total_bytes", "bytes_per_s"}
+
+plus ``"error"`` once a publish failed and ``"note"`` for recovered problems
+(e.g. a delta publish that fell back to a full add).
+
+Directories are published incrementally: a manifest from the previous publish
+(``.ipfs-manifest.json`` or ``IPFS_MANIFEST``) maps every file's sha256 to its
+CID, only files whose content is new are uploaded, and the root directory is
+rebuilt in MFS from the previous root plus the changed entries.  For standard
+UnixFS directories that is the same root ``ipfs add -r`` produces.
+
+Env:
+  IPFS_API                  Kubo API (multiaddr or http URL, default http://127.0.0.1:5201)
+  IPFS_AUTH                 optional Authorization header
+  IPFS_GATEWAY              gateway base written to the output
+  IPFS_UPLOAD_CHUNK         upload read size in bytes (default 256 KiB)
+  IPFS_PUBLISH_CONCURRENCY  concurrent publishes (default 2)
+  IPFS_DELTA                "false" always re-adds the whole tree
+"""
+from pathlib import Path
+from shutil import which
+from typing import Callable
+from urllib.parse import quote
+import asyncio, json, os, socket, subprocess, time, uuid
+
+import httpx
+
+from services.api.pool import retire_client
+from services.hashing import DigestCache, file_digests
+
+CHUNK_BYTES = int(os.getenv("IPFS_UPLOAD_CHUNK", str(256 * 1024)))
+MANIFEST_VERSION = 1
+REQUEST_TIMEOUT = 120
+
+ProgressCallback = Callable[[dict], None]
+
+
+def api_url() -> str:
+    # IPFS_API can be like /ip4/127.0.0.1/tcp/5201 or a full http URL
+    api = os.getenv("IPFS_API")
+    if api and api.startswith("/ip4/") and "/tcp/" in api:
+        host = api.split("/ip4/")[-1].split("/tcp/")[0]
+        port = api.split("/tcp/")[-1].split("/")[0]
+        return f"http://{host}:{port}"
+    if api and api.startswith("http"):
+        return api.rstrip("/")
+    # default to dockerized mapping from scripts/run-ipfs-daemon.sh
+    return "http://127.0.0.1:5201"
+
+
+def _auth_headers() -> dict:
+    auth = os.getenv("IPFS_AUTH")
+    return {"Authorization": auth} if auth else {}
+
+
+def cli_available() -> bool:
+    return which("ipfs") is not None
+
+
+class Progress:
+    """Progress of one publish; emits events to ``callback`` (uploads at most every ``interval`` s)."""
+
+    def __init__(self, path: str, callback: ProgressCallback | None = None, interval: float = 1.0):
+        self.id = uuid.uuid4().hex[:12]
+        self.path = path
+        self.callback = callback
+        self.interval = interval
+        self.phase = "queued"
+        self.files = self.done_files = 0
+        self.total = self.sent = 0
+        self.error: str | None = None
+        self.note: str | None = None
+        self.start = time.monotonic()
+        self._last = 0.0
+
+    def set_phase(self, phase: str, **fields):
+        self.phase = phase
+        self.__dict__.update(fields)
+        self._emit()
+
+    def begin_upload(self, files: list[tuple[str, Path]]):
+        self.files += len(files)
+        self.total += sum(fp.stat().st_size for _, fp in files)
+        self.start = time.monotonic()
+        self.set_phase("uploading")
+
+    def add(self, n: int):
+        self.sent += n
+        now = time.monotonic()
+        if now - self._last >= self.interval:
+            self._last = now
+            self._emit()
+
+    def rate(self) -> float:
+        return self.sent / max(time.monotonic() - self.start, 1e-9)
+
+    def event(self) -> dict:
+        ev = {
+            "id": self.id,
+            "path": self.path,
+            "phase": self.phase,
+            "files": self.files,
+            "done_files": self.done_files,
+            "bytes": self.sent,
+            "total_bytes": self.total,
+            "bytes_per_s": round(self.rate()),
+        }
+        if self.error:
+            ev["error"] = self.error
+        if self.note:
+            ev["note"] = self.note
+        return ev
+
+    def stats(self) -> dict:
+        return {
+            "files": self.files,
+            "bytes": self.sent,
+            "seconds": round(time.monotonic() - self.start, 3),
+            "bytes_per_s": round(self.rate()),
+        }
+
+    def _emit(self):
+        if self.callback is not None:
+            try:
+                self.callback(self.event())
+            except Exception:
+                pass  # a broken reporter must not fail the publish
+
+
+def collect(path: str) -> list[tuple[str, Path]]:
+    p = Path(path)
+    if not p.exists():
+        raise FileNotFoundError(path)
+    if p.is_file():
+        return [(p.name, p)]
+    root = p.resolve()
+    return [(fp.relative_to(root).as_posix(), fp) for fp in sorted(root.rglob("*")) if fp.is_file()]
+
+
+async def _multipart(files: list[tuple[str, Path]], boundary: str, progress: Progress):
+    """Yield the multipart body lazily: one file open at a time, CHUNK_BYTES per read."""
+    for rel, fp in files:
+        yield (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="file"; filename="{quote(rel, safe="/")}"\r\n'
+            "Content-Type: application/octet-stream\r\n\r\n"
+        ).encode()
+        with fp.open("rb") as f:
+            while chunk := await asyncio.to_thread(f.read, CHUNK_BYTES):
+                progress.add(len(chunk))
+                yield chunk
+        progress.done_files += 1
+        yield b"\r\n"
+    yield f"--{boundary}--\r\n".encode()
+
+
+def root_of(objs: list[dict]) -> str:
+    # The IPFS API returns one JSON object per line; the final line is the root (when wrap-with-directory=true)
+    root_cid = None
+    for obj in objs:
+        # Root has empty Name when wrapped, but some versions set Name to ""
+        if obj.get("Name", None) in ("", None):
+            root_cid = obj.get("Hash")
+    if not root_cid and objs:
+        root_cid = objs[-1].get("Hash")
+    if not root_cid:
+        raise RuntimeError("Failed to parse root CID from IPFS API response")
+    return root_cid
+
+
+class HttpIpfs:
+    """Kubo HTTP API backend on a shared client."""
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+
+    async def add(self, files: list[tuple[str, Path]], params: dict, progress: Progress) -> list[dict]:
+        """POST ``files`` to /api/v0/add and return the response objects."""
+        progress.begin_upload(files)
+        boundary = uuid.uuid4().hex
+        headers = {"Content-Type": f"multipart/form-data; boundary={boundary}", **_auth_headers()}
+        # An async generator body is sent with chunked transfer encoding as it
+        # is read, so memory stays at ~CHUNK_BYTES regardless of site size.
+        objs = []
+        async with self.client.stream(
+            "POST", f"{api_url()}/api/v0/add", params=params, headers=headers,
+            content=_multipart(files, boundary, progress), timeout=REQUEST_TIMEOUT,
+        ) as resp:
+            resp.raise_for_status()
+            async for line in resp.aiter_lines():
+                if not line.strip():
+                    continue
+                try:
+                    objs.append(json.loads(line))
+                except ValueError:
+                    continue
+        return objs
+
+    async def add_path(self, path: str, progress: Progress) -> str:
+        params = {"recursive": "true", "wrap-with-directory": "true", "pin": "true", "quieter": "true"}
+        return root_of(await self.add(collect(path), params, progress))
+
+    async def add_blobs(self, files: list[tuple[str, Path]], progress: Progress) -> dict[str, str]:
+        # Part names are indexes: a file's CID does not depend on its name.
+        parts = [(str(i), fp) for i, (_, fp) in enumerate(files)]
+        objs = await self.add(parts, {"pin": "false", "quiet": "true", "wrap-with-directory": "false"}, progress)
+        by_name = {o.get("Name"): o.get("Hash") for o in objs}
+        return {rel: by_name[str(i)] for i, (rel, _) in enumerate(files)}
+
+    async def add_tree(self, root: Path, progress: Progress) -> tuple[str, dict[str, str]]:
+        files = collect(str(root))
+        params = {"recursive": "true", "wrap-with-directory": "true", "pin": "true", "quiet": "true"}
+        objs = await self.add(files, params, progress)
+        rels = {rel for rel, _ in files}
+        return root_of(objs), {o["Name"]: o["Hash"] for o in objs if o.get("Name") in rels}
+
+    async def _call(self, cmd: str, args: list[str], **params):
+        query = [("arg", a) for a in args] + list(params.items())
+        r = await self.client.post(f"{api_url()}/api/v0/{cmd}", params=query, headers=_auth_headers(),
+                                   timeout=REQUEST_TIMEOUT)
+        r.raise_for_status()
+        return r.json() if r.content.strip() else {}
+
+    async def files_cp(self, src: str, dst: str):
+        await self._call("files/cp", [src, dst], parents="true")
+
+    async def files_rm(self, path: str):
+        await self._call("files/rm", [path], recursive="true", force="true")
+
+    async def files_stat_hash(self, path: str) -> str:
+        return (await self._call("files/stat", [path], hash="true"))["Hash"]
+
+    async def pin(self, cid: str):
+        await self._call("pin/add", [cid], recursive="true")
+
+
+class CliIpfs:
+    """``ipfs`` CLI backend, used when the binary is on PATH."""
+
+    async def _run(self, *args: str) -> str:
+        proc = await asyncio.create_subprocess_exec(
+            "ipfs", *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+        out, err = await proc.communicate()
+        if proc.returncode != 0:
+            raise subprocess.CalledProcessError(proc.returncode, ["ipfs", *args], out, err)
+        return out.decode().strip()
+
+    async def add_path(self, path: str, progress: Progress) -> str:
+        progress.set_phase("uploading")
+        # --hidden: dotfiles (.nojekyll, .well-known/) are published like any other file
+        return await self._run("add", "-Qr", "--hidden", path)
+
+    async def add_blobs(self, files: list[tuple[str, Path]], progress: Progress) -> dict[str, str]:
+        progress.begin_upload(files)
+        out = {}
+        for rel, fp in files:
+            out[rel] = await self._run("add", "-Q", "--pin=false", str(fp))
+            progress.done_files += 1
+            progress.add(fp.stat().st_size)
+        return out
+
+    async def add_tree(self, root: Path, progress: Progress) -> tuple[str, dict[str, str]]:
+        progress.begin_upload(collect(str(root)))
+        cids, root_cid = {}, None
+        for line in (await self._run("add", "-r", "--hidden", "--pin=true", str(root))).splitlines():
+            parts = line.split(" ", 2)
+            if len(parts) != 3 or parts[0] != "added":
+                continue
+            name = parts[2]
+            if name == root.name:
+                root_cid = parts[1]
+            elif name.startswith(root.name + "/"):
+                cids[name[len(root.name) + 1:]] = parts[1]
+        if not root_cid:
+            raise RuntimeError("Failed to parse root CID from ipfs add output")
+        progress.done_files, progress.sent = progress.files, progress.total
+        return root_cid, cids
+
+    async def files_cp(self, src: str, dst: str):
+        await self._run("files", "cp", "-p", src, dst)
+
+    async def files_rm(self, path: str):
+        await self._run("files", "rm", "-r", "--force", path)
+
+    async def files_stat_hash(self, path: str) -> str:
+        return await self._run("files", "stat", "--hash", path)
+
+    async def pin(self, cid: str):
+        await self._run("pin", "add", "-r", cid)
+
+
+# ----------------------- delta manifest -----------------------
+def manifest_path() -> Path:
+    return Path(os.getenv("IPFS_MANIFEST", ".ipfs-manifest.json"))
+
+
+def load_manifest() -> dict:
+    try:
+        data = json.loads(manifest_path().read_text())
+        if data.get("v") == MANIFEST_VERSION:
+            return data
+    except (OSError, ValueError):
+        pass
+    return {"v": MANIFEST_VERSION, "blobs": {}, "trees": {}}
+
+
+def _record(root: Path, root_cid: str, digests: dict[str, str], cids: dict[str, str]):
+    # Re-read before writing so concurrent publishes of other roots are kept;
+    # there is no await between the load and the replace.
+    missing = sorted(set(digests) - set(cids))
+    if missing:
+        raise RuntimeError(f"ipfs add returned no CID for {len(missing)} file(s), e.g. {missing[0]!r}")
+    manifest = load_manifest()
+    for rel, sha in digests.items():
+        manifest["blobs"][sha] = cids[rel]
+    manifest["trees"][str(root)] = {"root": root_cid, "files": {rel: [sha, cids[rel]] for rel, sha in digests.items()}}
+    p = manifest_path()
+    tmp = p.with_name(f"{p.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(manifest))
+    os.replace(tmp, p)
+
+
+def _dirs(rels) -> set[str]:
+    out = set()
+    for rel in rels:
+        parts = rel.split("/")[:-1]
+        for i in range(1, len(parts) + 1):
+            out.add("/".join(parts[:i]))
+    return out
+
+
+def _digests(root: Path) -> dict[str, str]:
+    cache = DigestCache()
+    digests = file_digests(root, cache=cache)
+    cache.save()
+    return digests
+
+
+async def publish_delta(path: str, ipfs, progress: Progress) -> tuple[str, dict]:
+    """Publish a directory, uploading only files whose content is not already known.
+
+    Returns ``(root_cid, summary)``. The first publish of a tree (or one with no
+    usable manifest) falls back to a full add and records every file's CID.
+    """
+    root = Path(path).resolve()
+    progress.set_phase("hashing")
+    digests = await asyncio.to_thread(_digests, root)
+    manifest = load_manifest()
+    prev = manifest["trees"].get(str(root))
+
+    result = None
+    if prev:
+        try:
+            result = await _apply_delta(ipfs, root, digests, manifest["blobs"], prev, progress)
+        except Exception as e:
+            # the full add counts every file again
+            progress.files = progress.done_files = progress.total = progress.sent = 0
+            progress.set_phase("uploading", note=f"delta publish failed ({e}); fell back to a full add")
+    if result is None:
+        root_cid, cids = await ipfs.add_tree(root, progress)
+        summary = {"mode": "full", "uploaded": len(cids), "reused": 0, "removed": 0}
+    else:
+        root_cid, cids, summary = result
+    _record(root, root_cid, digests, cids)
+    return root_cid, summary
+
+
+async def _apply_delta(ipfs, root: Path, digests: dict, blobs: dict, prev: dict, progress: Progress):
+    prev_files = prev["files"]
+    changed = [rel for rel, sha in digests.items() if prev_files.get(rel, [None])[0] != sha]
+    removed = [rel for rel in prev_files if rel not in digests]
+    new_blobs = [(rel, root / rel) for rel in changed if digests[rel] not in blobs]
+    uploaded = await ipfs.add_blobs(new_blobs, progress) if new_blobs else {}
+    cids = {rel: uploaded.get(rel) or blobs[digests[rel]] for rel in changed}
+    cids.update({rel: prev_files[rel][1] for rel in digests if rel not in cids})
+
+    progress.set_phase("building")
+    work = f"/.trustiva-publish/{uuid.uuid4().hex}"
+    await ipfs.files_cp(f"/ipfs/{prev['root']}", work)
+    try:
+        for rel in removed + changed:
+            if rel in prev_files:
+                await ipfs.files_rm(f"{work}/{rel}")
+        # directories that only held removed files disappear, as in a full add
+        for d in sorted(_dirs(prev_files) - _dirs(digests), key=len, reverse=True):
+            await ipfs.files_rm(f"{work}/{d}")
+        for rel in changed:
+            await ipfs.files_cp(f"/ipfs/{cids[rel]}", f"{work}/{rel}")
+        root_cid = await ipfs.files_stat_hash(work)
+        await ipfs.pin(root_cid)
+    finally:
+        try:
+            await ipfs.files_rm(work)
+        except Exception:
+            pass
+    summary = {"mode": "delta", "uploaded": len(new_blobs), "reused": len(changed) - len(new_blobs),
+               "removed": len(removed)}
+    return root_cid, cids, summary
+
+
+# ----------------------- publisher -----------------------
+class IpfsPublisher:
+    """Shared client + bounded parallelism for in-process publishes."""
+
+    def __init__(self, max_concurrency: int | None = None):
+        self.max_concurrency = max_concurrency or int(os.getenv("IPFS_PUBLISH_CONCURRENCY", "2"))
+        self._client: httpx.AsyncClient | None = None
+        self._sem: asyncio.Semaphore | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._active: dict[str, Progress] = {}
+        self._retiring: set[asyncio.Future] = set()
+
+    def _bind(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # the client's connections and the semaphore belong to one loop
+            if self._client is not None:
+                retire_client(self._client, self._loop, self._retiring)
+            self._client = None
+            self._sem = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+
+    def client(self) -> httpx.AsyncClient:
+        self._bind()
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=REQUEST_TIMEOUT,
+                limits=httpx.Limits(max_connections=4 * self.max_concurrency, max_keepalive_connections=self.max_concurrency),
+            )
+        return self._client
+
+    def backend(self):
+        return CliIpfs() if cli_available() else HttpIpfs(self.client())
+
+    def active(self) -> list[dict]:
+        """Progress snapshots of publishes that are queued or running."""
+        return [p.event() for p in self._active.values()]
+
+    async def publish(self, path: str, full: bool | None = None, on_progress: ProgressCallback | None = None,
+                      ipfs=None) -> dict:
+        """Publish ``path`` and return the ``publish.json`` document (also written into directories)."""
+        if full is None:
+            full = os.getenv("IPFS_DELTA", "true").lower() == "false"
+        self._bind()
+        progress = Progress(path, on_progress)
+        self._active[progress.id] = progress
+        progress.set_phase("queued")
+        try:
+            async with self._sem:
+                ipfs = ipfs or self.backend()
+                delta = None
+                if not full and Path(path).is_dir():
+                    cid, delta = await publish_delta(path, ipfs, progress)
+                else:
+                    cid = await ipfs.add_path(path, progress)
+        except Exception as e:
+            progress.set_phase("error", error=str(e))
+            raise
+        finally:
+            self._active.pop(progress.id, None)
+
+        out = {
+            "cid": cid,
+            "gateway": os.getenv("IPFS_GATEWAY", "http://127.0.0.1:8082"),
+            "path": path,
+            "time": int(time.time()),
+            "host": socket.gethostname(),
+        }
+        if progress.files:
+            out["upload"] = progress.stats()
+        if delta:
+            out["delta"] = delta
+        # Optionally write to <path>/publish.json when path is a directory
+        try:
+            p = Path(path)
+            if p.exists() and p.is_dir():
+                (p / "publish.json").write_text(json.dumps(out))
+        except Exception:
+            pass
+        progress.set_phase("done")
+        return out
+
+    async def aclose(self):
+        client, self._client = self._client, None
+        if client is not None:
+            await client.aclose()
+
+
+publisher = IpfsPublisher()
+
+
+async def publish(path: str, **kw) -> dict:
+    return await publisher.publish(path, **kw)
@@ -0,0 +1,51 @@
+"""Durable job queue shared by the Ops API (producer) and the Zoho worker.
+
+``get_queue()`` picks the backend from ``JOB_QUEUE_URL``:
+
+  sqlite:///queue/jobs.db   SQLite/WAL file (default; four slashes for an absolute path)
+  spool:///queue            the original directory spool (pending/leased/done/failed)
+  redis://host:6379/0       Redis lists + Lua (``rediss://`` too)
+
+Leases last ``JOB_LEASE_SECONDS`` (default 60); a job is failed after
+``JOB_MAX_ATTEMPTS`` expired leases (default 5, not tracked by the spool).
+"""
+import os, threading
+
+from services.jobs.base import DONE, FAILED, LEASED, PENDING, STATES, Job, JobQueue
+
+DEFAULT_URL = "sqlite:///queue/jobs.db"
+
+_queues: dict[str, JobQueue] = {}
+_lock = threading.Lock()
+
+
+def _path(url: str) -> str:
+    rest = url.split("://", 1)[1]
+    return rest[1:] if rest.startswith("/") else rest
+
+
+def open_queue(url: str) -> JobQueue:
+    scheme = url.split("://", 1)[0]
+    if scheme == "sqlite":
+        from services.jobs.sqlite_backend import SqliteQueue
+        return SqliteQueue(_path(url))
+    if scheme == "spool":
+        from services.jobs.spool_backend import SpoolQueue
+        return SpoolQueue(_path(url))
+    if scheme in ("redis", "rediss", "unix"):
+        from services.jobs.redis_backend import RedisQueue
+        return RedisQueue(url)
+    raise ValueError(f"unsupported JOB_QUEUE_URL: {url}")
+
+
+def get_queue(url: str | None = None) -> JobQueue:
+    """Process-wide queue for ``url`` (default ``JOB_QUEUE_URL``)."""
+    url = url or os.getenv("JOB_QUEUE_URL", DEFAULT_URL)
+    with _lock:
+        q = _queues.get(url)
+        if q is None:
+            q = _queues[url] = open_queue(url)
+        return q
+
+
+__all__ = ["DONE", "FAILED", "LEASED", "PENDING", "STATES", "Job", "JobQueue", "get_queue", "open_queue"]
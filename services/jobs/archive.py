@@ -0,0 +1,33 @@
+"""Rolled, gzip-compressed archive of finished jobs.
+
+Compaction moves done/failed jobs older than ``JOB_RETENTION`` seconds
+(default 7 days) out of the live index into ``jobs-<YYYY-MM-DD>.jsonl.gz``
+under the archive directory, one JSON record per line.  Each compaction run
+appends a gzip member to the current day's file, so files roll daily and stay
+readable with plain ``zcat``.
+"""
+from pathlib import Path
+import gzip, json, os, time
+
+
+def retention() -> float:
+    return float(os.getenv("JOB_RETENTION", str(7 * 86400)))
+
+
+def compact_interval() -> float:
+    """Seconds between compactions run by the worker (0 disables)."""
+    return float(os.getenv("JOB_COMPACT_INTERVAL", "3600"))
+
+
+def archive_dir(default: Path) -> Path:
+    return Path(os.getenv("JOB_ARCHIVE_DIR") or default)
+
+
+def append(directory: Path, records: list[dict]) -> str:
+    """Append ``records`` to today's archive file; returns its name."""
+    directory.mkdir(parents=True, exist_ok=True)
+    name = time.strftime("jobs-%Y-%m-%d.jsonl.gz", time.gmtime())
+    with gzip.open(directory / name, "at", encoding="utf-8") as f:
+        for rec in records:
+            f.write(json.dumps(rec, separators=(",", ":")) + "\n")
+    return name
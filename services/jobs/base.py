@@ -0,0 +1,147 @@
+"""Queue interface shared by the job backends.
+
+A job is the same JSON payload the API always wrote to ``queue/pending``
+(``{"type", "job_id", "data"}``).  Dequeue hands out a *lease*: the job stays
+invisible to other workers until ``lease_until`` and is delivered again if it
+is neither acked nor failed by then.  Acks and fails carry the lease token so a
+worker whose lease already expired cannot overwrite the new holder's outcome.
+
+Payloads may carry two optional keys the backends index:
+
+* ``key``: idempotency key.  Enqueueing a payload whose key matches a job
+  enqueued less than ``JOB_DEDUPE_WINDOW`` seconds ago (and not failed)
+  returns that job's id instead of adding a copy.
+* ``merge``: jobs with the same merge key are interchangeable; ``coalesce``
+  leases the other pending ones with it so the worker can make one call.
+
+Idle workers call ``wait()``, which blocks on the backend's notification
+channel (see ``notify``) and only falls back to short sleeps without one.
+"""
+from dataclasses import dataclass
+import os, time
+
+PENDING, LEASED, DONE, FAILED = "pending", "leased", "done", "failed"
+STATES = (PENDING, LEASED, DONE, FAILED)
+FALLBACK_POLL = 1.0  # seconds between dequeues when no notification channel works
+
+
+def lease_seconds() -> float:
+    return float(os.getenv("JOB_LEASE_SECONDS", "60"))
+
+
+def max_attempts() -> int:
+    return int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+
+
+def dedupe_window() -> float:
+    """Seconds an idempotency key keeps pointing at its job (0 disables dedupe)."""
+    return float(os.getenv("JOB_DEDUPE_WINDOW", "600"))
+
+
+def poll_interval() -> float:
+    """Longest an idle worker blocks before re-checking the queue anyway."""
+    return float(os.getenv("JOB_POLL_INTERVAL", "30"))
+
+
+@dataclass
+class Job:
+    id: str
+    payload: dict
+    attempts: int = 0
+    lease: str | None = None
+    lease_until: float | None = None
+
+    @property
+    def type(self) -> str:
+        return self.payload.get("type", "")
+
+
+class JobQueue:
+    """Backend interface; see ``sqlite_backend``, ``spool_backend`` and ``redis_backend``."""
+
+    def enqueue(self, payload: dict) -> str:
+        """Atomically add ``payload`` (which must carry ``job_id``); returns the id.
+
+        If ``payload["key"]`` matches a recent job, nothing is added and that
+        job's id is returned instead.
+        """
+        raise NotImplementedError
+
+    def dequeue(self, lease: float | None = None) -> Job | None:
+        """Lease the oldest visible job for ``lease`` seconds, or ``None`` if there is none."""
+        raise NotImplementedError
+
+    def coalesce(self, job: Job) -> list[Job]:
+        """Lease the other pending jobs sharing ``job``'s merge key, under ``job``'s lease.
+
+        Backends that cannot find them cheaply return ``[]``.
+        """
+        return []
+
+    def ack(self, job: Job, result) -> bool:
+        """Record ``result`` and move the job to done; ``False`` if the lease was lost."""
+        raise NotImplementedError
+
+    def fail(self, job: Job, error: str) -> bool:
+        """Move the job to failed with ``error``; ``False`` if the lease was lost."""
+        raise NotImplementedError
+
+    def retry(self, job: Job, delay: float, error: str | None = None) -> bool:
+        """Give the job back, invisible for ``delay`` seconds; ``False`` if the lease was lost.
+
+        The job is redelivered like an expired lease, so ``JOB_MAX_ATTEMPTS``
+        bounds how often it is retried.
+        """
+        raise NotImplementedError
+
+    def counts(self) -> dict[str, int]:
+        """``{state: number of jobs}`` for every state."""
+        raise NotImplementedError
+
+    def get(self, job_id: str) -> dict | None:
+        """Status record of one job (see ``record``), or ``None`` if unknown.
+
+        Jobs compacted into the archive come back as
+        ``{"id", "state", "archived": <file name>}``.
+        """
+        raise NotImplementedError
+
+    def list_jobs(self, state: str | None = None, limit: int = 50,
+                  cursor: str | None = None) -> tuple[list[dict], str | None]:
+        """One page of status records, newest first, and the cursor of the next page."""
+        raise NotImplementedError
+
+    def compact(self, older_than: float | None = None) -> int:
+        """Archive done/failed jobs finished more than ``older_than`` seconds ago
+        (default ``JOB_RETENTION``); returns how many were moved."""
+        return 0
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Block until a job may be available, at most ``timeout`` seconds.
+
+        ``True`` means "dequeue again"; ``False`` means the timeout passed
+        without a notification.  Without a notification channel this sleeps
+        ``FALLBACK_POLL`` seconds.
+        """
+        timeout = poll_interval() if timeout is None else timeout
+        time.sleep(min(timeout, FALLBACK_POLL))
+        return True
+
+    def close(self):
+        pass
+
+
+def record(job_id: str, type: str, state: str, attempts: int, created: float | None, updated: float | None,
+           lease_until: float | None = None, result=None, error: str | None = None) -> dict:
+    """The status record shape every backend returns from ``get``/``list_jobs``."""
+    return {
+        "id": job_id, "type": type, "state": state, "attempts": attempts, "created": created, "updated": updated,
+        "lease_until": lease_until, "result": result, "error": error,
+    }
+
+
+def until_expiry(deadline: float | None, timeout: float) -> float:
+    """``timeout`` shortened so a wait ends shortly after ``deadline`` (a lease expiry)."""
+    if deadline is None:
+        return timeout
+    return min(timeout, max(deadline - time.time(), 0) + 0.01)
@@ -0,0 +1,119 @@
+"""Wakeup channels so idle workers block instead of polling the queue.
+
+* ``DatagramNotifier`` — every waiting worker binds a unix datagram socket in
+  ``<dir>/``; enqueue sends one byte to each.  Works across processes on one
+  host (the SQLite backend's case).  A full socket buffer already means a
+  wakeup is pending, so sends never block.
+* ``InotifyWatch`` — Linux inotify (via ``ctypes``) on the spool's
+  ``pending/`` directory, which also sees files written by other tools.
+
+Both buffer events in the kernel from the moment they are set up, so a job
+enqueued between an empty dequeue and the next ``wait`` is never missed.  If
+neither is available the caller falls back to sleeping for the timeout.
+"""
+from pathlib import Path
+import ctypes, ctypes.util, os, select, socket, uuid
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+
+
+def _drain(read) -> None:
+    while True:
+        try:
+            if not read():
+                return
+        except (BlockingIOError, InterruptedError):
+            return
+
+
+class DatagramNotifier:
+    def __init__(self, directory: str | Path):
+        self.dir = Path(directory)
+        self._listener: socket.socket | None = None
+        self._path: Path | None = None
+        self._sender: socket.socket | None = None
+
+    def listen(self):
+        """Bind this process's wakeup socket; raises ``OSError`` where unix sockets are unusable."""
+        if self._listener is not None:
+            return
+        self.dir.mkdir(parents=True, exist_ok=True)
+        path = self.dir / f"{os.getpid()}.{uuid.uuid4().hex[:8]}.sock"
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            sock.bind(str(path))
+        except OSError:
+            sock.close()
+            raise
+        sock.setblocking(False)
+        self._listener, self._path = sock, path
+
+    def notify(self):
+        try:
+            entries = [e.path for e in os.scandir(self.dir) if e.name.endswith(".sock")]
+        except FileNotFoundError:
+            return  # nobody has ever waited
+        if self._sender is None:
+            self._sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self._sender.setblocking(False)
+        for path in entries:
+            try:
+                self._sender.sendto(b"1", path)
+            except BlockingIOError:
+                pass  # buffer full: that worker has wakeups queued already
+            except (ConnectionRefusedError, FileNotFoundError):
+                try:
+                    os.unlink(path)  # left behind by a dead worker
+                except OSError:
+                    pass
+            except OSError:
+                pass
+
+    def wait(self, timeout: float) -> bool:
+        """Block until notified (``True``) or ``timeout`` seconds pass (``False``)."""
+        ready, _, _ = select.select([self._listener], [], [], max(timeout, 0))
+        if not ready:
+            return False
+        _drain(lambda: self._listener.recv(64))
+        return True
+
+    def close(self):
+        for s in (self._listener, self._sender):
+            if s is not None:
+                s.close()
+        if self._path is not None:
+            try:
+                self._path.unlink()
+            except OSError:
+                pass
+        self._listener = self._sender = self._path = None
+
+
+class InotifyWatch:
+    """Readable whenever a file is moved into or finished being written in ``directory``."""
+
+    def __init__(self, directory: str | Path):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(fd, os.fsencode(str(directory)), IN_MOVED_TO | IN_CLOSE_WRITE) < 0:
+            err = ctypes.get_errno()
+            os.close(fd)
+            raise OSError(err, f"inotify_add_watch failed for {directory}")
+        self.fd = fd
+
+    def wait(self, timeout: float) -> bool:
+        ready, _, _ = select.select([self.fd], [], [], max(timeout, 0))
+        if not ready:
+            return False
+        _drain(lambda: os.read(self.fd, 65536))
+        return True
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
@@ -0,0 +1,295 @@
+"""Redis job queue, for deployments that already run Redis (``REDIS_URL``).
+
+Keys (under ``JOB_QUEUE_PREFIX``, default ``trustiva:jobs``):
+
+* ``<p>:job:<id>``  hash: payload, state, attempts, lease, result/error
+* ``<p>:pending``   list of ids, LPUSH on enqueue, RPOP on dequeue (FIFO)
+* ``<p>:leases``    sorted set id -> lease deadline
+* ``<p>:done`` / ``<p>:failed``  lists of finished ids, newest first
+* ``<p>:notify``    one token per enqueue; idle workers ``BLPOP`` it
+* ``<p>:key:<key>`` idempotency key -> job id, expiring after ``JOB_DEDUPE_WINDOW``
+* ``<p>:archived``  hash id -> "state file" for jobs compacted into the archive
+* ``<p>:merge:<m>`` set of pending ids enqueued with merge key ``m``; ``DEQUEUE``
+  drops the id it leases, ``COALESCE`` leases the pending ones and drops the rest
+
+Dequeue, expiry and ack/fail run as Lua scripts, so each is atomic on the
+server: expired leases are pushed back to the head of ``pending`` (or failed
+after ``JOB_MAX_ATTEMPTS``) before the next id is popped and leased.
+``compact`` pops archived ids with ``TRIM_TAIL``, which only trims the list if
+its tail still holds exactly the ids that were read, so concurrent compactors
+never drop ids they did not archive.
+"""
+from pathlib import Path
+import json, os, time, uuid
+
+import redis
+
+from services.jobs import archive
+from services.jobs.base import (
+    DONE, FAILED, LEASED, PENDING, STATES, Job, JobQueue, dedupe_window, until_expiry, lease_seconds, max_attempts,
+    poll_interval, record,
+)
+
+NOTIFY_BACKLOG = 1024  # wakeup tokens kept when nobody is waiting
+
+DEQUEUE = """
+local now, lease, token, limit = tonumber(ARGV[1]), tonumber(ARGV[2]), ARGV[3], tonumber(ARGV[4])
+local jobp, mergep = ARGV[5], ARGV[6]
+for _, id in ipairs(redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', now, 'LIMIT', 0, 100)) do
+  redis.call('ZREM', KEYS[2], id)
+  local k = jobp .. id
+  if tonumber(redis.call('HGET', k, 'attempts') or '0') >= limit then
+    local last = redis.call('HGET', k, 'error')
+    redis.call('HSET', k, 'state', 'failed', 'updated', now,
+               'error', 'gave up after ' .. limit .. ' attempts' .. (last and (': ' .. last) or ''))
+    redis.call('HDEL', k, 'lease')
+    redis.call('LPUSH', KEYS[3], id)
+  else
+    redis.call('HSET', k, 'state', 'pending')
+    redis.call('HDEL', k, 'lease')
+    redis.call('RPUSH', KEYS[1], id)
+  end
+end
+local id = redis.call('RPOP', KEYS[1])
+if not id then return nil end
+local k = jobp .. id
+local attempts = redis.call('HINCRBY', k, 'attempts', 1)
+redis.call('HSET', k, 'state', 'leased', 'lease', token, 'updated', now)
+redis.call('ZADD', KEYS[2], now + lease, id)
+local merge = redis.call('HGET', k, 'merge')
+if merge then redis.call('SREM', mergep .. merge, id) end
+return {id, redis.call('HGET', k, 'payload'), attempts}
+"""
+
+FINISH = """
+local k = ARGV[5] .. ARGV[1]
+if redis.call('HGET', k, 'lease') ~= ARGV[2] then return 0 end
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('HSET', k, 'state', ARGV[3], ARGV[6], ARGV[4], 'updated', ARGV[7])
+redis.call('HDEL', k, 'lease')
+redis.call('LPUSH', KEYS[2], ARGV[1])
+return 1
+"""
+
+RETRY = """
+local k = ARGV[3] .. ARGV[1]
+if redis.call('HGET', k, 'lease') ~= ARGV[2] then return 0 end
+redis.call('HDEL', k, 'lease')
+if ARGV[5] ~= '' then redis.call('HSET', k, 'error', ARGV[5]) end
+redis.call('ZADD', KEYS[1], ARGV[4], ARGV[1])
+return 1
+"""
+
+COALESCE = """
+local out = {}
+for _, id in ipairs(redis.call('SMEMBERS', KEYS[1])) do
+  local k = ARGV[1] .. id
+  if redis.call('HGET', k, 'state') == 'pending' and redis.call('LREM', KEYS[2], 1, id) == 1 then
+    local attempts = redis.call('HINCRBY', k, 'attempts', 1)
+    redis.call('HSET', k, 'state', 'leased', 'lease', ARGV[2], 'updated', ARGV[4])
+    redis.call('ZADD', KEYS[3], ARGV[3], id)
+    table.insert(out, {id, redis.call('HGET', k, 'payload'), attempts})
+  end
+  redis.call('SREM', KEYS[1], id)
+end
+return out
+"""
+
+TRIM_TAIL = """
+local n = #ARGV
+local tail = redis.call('LRANGE', KEYS[1], -n, -1)
+if #tail ~= n then return 0 end
+for i = 1, n do
+  if tail[i] ~= ARGV[i] then return 0 end
+end
+redis.call('LTRIM', KEYS[1], 0, -n - 1)
+return 1
+"""
+
+
+class RedisQueue(JobQueue):
+    def __init__(self, url: str, prefix: str | None = None):
+        self.r = redis.Redis.from_url(url)
+        self.prefix = prefix or os.getenv("JOB_QUEUE_PREFIX", "trustiva:jobs")
+        self.keys = {s: f"{self.prefix}:{s}" for s in (PENDING, DONE, FAILED)}
+        self.keys[LEASED] = f"{self.prefix}:leases"
+        self._job = f"{self.prefix}:job:"
+        self._notify = f"{self.prefix}:notify"
+        self._dequeue = self.r.register_script(DEQUEUE)
+        self._finish_script = self.r.register_script(FINISH)
+        self._retry = self.r.register_script(RETRY)
+        self._coalesce = self.r.register_script(COALESCE)
+        self._trim_tail = self.r.register_script(TRIM_TAIL)
+        self._merge = f"{self.prefix}:merge:"
+        self._archived = f"{self.prefix}:archived"
+        self.archive = archive.archive_dir(Path("queue/archive"))
+
+    def _claim_key(self, key: str, job_id: str, window: float) -> str | None:
+        name = f"{self.prefix}:key:{key}"
+        ttl = max(int(window), 1)
+        if self.r.set(name, job_id, nx=True, ex=ttl):
+            return None
+        held = self.r.get(name)
+        if held and self.r.hget(self._job + held.decode(), "state") not in (None, FAILED.encode()):
+            return held.decode()
+        self.r.set(name, job_id, ex=ttl)
+        return None
+
+    def enqueue(self, payload: dict) -> str:
+        job_id = payload["job_id"]
+        key, window = payload.get("key"), dedupe_window()
+        if key and window > 0:
+            existing = self._claim_key(key, job_id, window)
+            if existing is not None:
+                return existing
+        now = time.time()
+        fields = {
+            "payload": json.dumps(payload), "type": payload.get("type", ""), "state": PENDING,
+            "attempts": 0, "created": now, "updated": now,
+        }
+        if payload.get("merge"):
+            fields["merge"] = payload["merge"]
+        pipe = self.r.pipeline(transaction=True)
+        pipe.hset(self._job + job_id, mapping=fields)
+        pipe.lpush(self.keys[PENDING], job_id)
+        if payload.get("merge"):
+            pipe.sadd(self._merge + payload["merge"], job_id)
+        pipe.lpush(self._notify, 1)
+        pipe.ltrim(self._notify, 0, NOTIFY_BACKLOG - 1)
+        pipe.execute()
+        return job_id
+
+    def dequeue(self, lease: float | None = None) -> Job | None:
+        lease = lease if lease is not None else lease_seconds()
+        token = uuid.uuid4().hex
+        now = time.time()
+        res = self._dequeue(
+            keys=[self.keys[PENDING], self.keys[LEASED], self.keys[FAILED]],
+            args=[now, lease, token, max_attempts(), self._job, self._merge],
+        )
+        if not res:
+            return None
+        job_id, payload, attempts = res
+        return Job(job_id.decode(), json.loads(payload), int(attempts), token, now + lease)
+
+    def coalesce(self, job: Job) -> list[Job]:
+        merge = job.payload.get("merge")
+        if not merge:
+            return []
+        rows = self._coalesce(
+            keys=[self._merge + merge, self.keys[PENDING], self.keys[LEASED]],
+            args=[self._job, job.lease, job.lease_until, time.time()],
+        )
+        return [Job(job_id.decode(), json.loads(payload), int(attempts), job.lease, job.lease_until)
+                for job_id, payload, attempts in rows]
+
+    def _finish(self, job: Job, state: str, field: str, value: str) -> bool:
+        return bool(self._finish_script(
+            keys=[self.keys[LEASED], self.keys[state]],
+            args=[job.id, job.lease, state, value, self._job, field, time.time()],
+        ))
+
+    def ack(self, job: Job, result) -> bool:
+        return self._finish(job, DONE, "result", json.dumps(result))
+
+    def fail(self, job: Job, error: str) -> bool:
+        return self._finish(job, FAILED, "error", error)
+
+    def retry(self, job: Job, delay: float, error: str | None = None) -> bool:
+        # the lease zset entry moves to now + delay; DEQUEUE requeues it from there
+        return bool(self._retry(
+            keys=[self.keys[LEASED]],
+            args=[job.id, job.lease, self._job, time.time() + delay, error or ""],
+        ))
+
+    def counts(self) -> dict[str, int]:
+        pipe = self.r.pipeline(transaction=False)
+        pipe.llen(self.keys[PENDING])
+        pipe.zcard(self.keys[LEASED])
+        pipe.llen(self.keys[DONE])
+        pipe.llen(self.keys[FAILED])
+        pending, leased, done, failed = pipe.execute()
+        return {PENDING: pending, LEASED: leased, DONE: done, FAILED: failed}
+
+    def _record(self, job_id: str, h: dict) -> dict:
+        h = {k.decode(): v.decode() for k, v in h.items()}
+        num = lambda k: float(h[k]) if h.get(k) else None
+        lease_until = self.r.zscore(self.keys[LEASED], job_id) if h.get("state") == LEASED else None
+        return record(job_id, h.get("type", ""), h.get("state", ""), int(h.get("attempts") or 0), num("created"),
+                      num("updated"), lease_until, json.loads(h["result"]) if h.get("result") else None, h.get("error"))
+
+    def get(self, job_id: str) -> dict | None:
+        h = self.r.hgetall(self._job + job_id)
+        if h:
+            return self._record(job_id, h)
+        old = self.r.hget(self._archived, job_id)
+        if old is None:
+            return None
+        state, _, name = old.decode().partition(" ")
+        return {"id": job_id, "state": state, "archived": name}
+
+    def _page(self, state: str, start: int, n: int) -> list[bytes]:
+        if state == LEASED:
+            return self.r.zrevrange(self.keys[LEASED], start, start + n - 1)
+        return self.r.lrange(self.keys[state], start, start + n - 1)  # LPUSHed: newest first
+
+    def list_jobs(self, state: str | None = None, limit: int = 50,
+                  cursor: str | None = None) -> tuple[list[dict], str | None]:
+        # cursor "<state index>:<offset>" walks one state's list after another
+        states = [state] if state else list(STATES)
+        si, off = (int(x) for x in cursor.split(":")) if cursor else (0, 0)
+        out = []
+        while si < len(states):
+            need = limit - len(out)
+            ids = self._page(states[si], off, need + 1)
+            for raw in ids[:need]:
+                h = self.r.hgetall(self._job + raw.decode())
+                if h:
+                    out.append(self._record(raw.decode(), h))
+            if len(ids) > need:
+                return out, f"{si}:{off + need}"
+            si, off = si + 1, 0
+        return out, None
+
+    def compact(self, older_than: float | None = None, batch: int = 500) -> int:
+        cutoff = time.time() - (archive.retention() if older_than is None else older_than)
+        moved = 0
+        for state in (DONE, FAILED):
+            while True:
+                ids = self.r.lrange(self.keys[state], -batch, -1)  # oldest at the tail
+                old = []
+                for raw in reversed(ids):
+                    h = self.r.hgetall(self._job + raw.decode())
+                    rec = self._record(raw.decode(), h) if h else None
+                    if rec is not None and (rec["updated"] or 0) >= cutoff:
+                        break
+                    old.append((raw, rec, h))
+                if not old:
+                    break
+                # claim the ids first: if another compactor got there, read the tail again
+                if not self._trim_tail(keys=[self.keys[state]], args=[raw for raw, _, _ in reversed(old)]):
+                    continue
+                recs = [rec | {"payload": json.loads(h[b"payload"])} for _, rec, h in old if rec is not None]
+                name = archive.append(self.archive, recs) if recs else ""
+                pipe = self.r.pipeline(transaction=True)
+                for raw, rec, h in old:
+                    pipe.delete(self._job + raw.decode())
+                    if h.get(b"merge"):
+                        pipe.srem(self._merge + h[b"merge"].decode(), raw)
+                    if rec is not None:
+                        pipe.hset(self._archived, raw.decode(), f"{state} {name}")
+                pipe.execute()
+                moved += len(recs)
+                if len(old) < len(ids):
+                    break
+        return moved
+
+    def wait(self, timeout: float | None = None) -> bool:
+        timeout = poll_interval() if timeout is None else timeout
+        first = self.r.zrange(self.keys[LEASED], 0, 0, withscores=True)
+        timeout = until_expiry(first[0][1] if first else None, timeout)
+        # BLPOP treats 0 as "forever"; stale tokens only cause a spare dequeue
+        return self.r.blpop([self._notify], timeout=max(timeout, 0.01)) is not None
+
+    def close(self):
+        self.r.close()
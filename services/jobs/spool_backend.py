@@ -0,0 +1,255 @@
+"""Directory spool backend, compatible with the original ``queue/`` layout.
+
+``pending/<job_id>.json`` is the same file the API always wrote.  Enqueue
+writes into ``tmp/`` and renames into ``pending/`` so a worker never sees a
+partial file; dequeue claims a job by renaming it into ``leased/`` (the rename
+is the lock) with the file's mtime set to the lease deadline.  Outcomes are
+written as before: ``done/<job_id>.done.json`` and ``failed/<job_id>.err.txt``.
+
+Picking the next job is a single ``scandir`` pass (no sort), but this backend
+still touches the directory per dequeue; prefer the SQLite or Redis backend
+under backlog.  Delivery attempts are not tracked here, and pending jobs are
+not indexed by merge key, so ``coalesce`` never merges.  Idempotency keys are
+files in ``keys/`` holding the job id, their mtime being the enqueue time;
+``compact`` removes those older than the dedupe window.
+``get`` stats the four possible paths of a job; ``list_jobs`` does scan.
+
+Idle workers block on inotify for ``pending/`` (Linux), so files dropped in
+by any writer wake them; elsewhere they fall back to short sleeps.
+"""
+from pathlib import Path
+import hashlib, json, os, time
+
+from services.jobs import archive
+from services.jobs.base import (
+    DONE, FAILED, FALLBACK_POLL, LEASED, PENDING, STATES, Job, JobQueue, dedupe_window, until_expiry, lease_seconds,
+    poll_interval, record,
+)
+from services.jobs.notify import InotifyWatch
+
+
+class SpoolQueue(JobQueue):
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+        self.dirs = {s: self.root / s for s in (PENDING, LEASED, DONE, FAILED)}
+        self.tmp = self.root / "tmp"
+        self.keys = self.root / "keys"
+        self.archive = archive.archive_dir(self.root / "archive")
+        for d in (*self.dirs.values(), self.tmp, self.keys):
+            d.mkdir(parents=True, exist_ok=True)
+        self._next_reclaim = 0.0
+        self._watch: InotifyWatch | None = None
+        self._watching: bool | None = None
+
+    def enqueue(self, payload: dict) -> str:
+        job_id = payload["job_id"]
+        key = payload.get("key")
+        if key and dedupe_window() > 0:
+            existing = self._claim_key(key, job_id)
+            if existing is not None:
+                return existing
+        tmp = self.tmp / f"{job_id}.json"
+        tmp.write_text(json.dumps(payload))
+        os.replace(tmp, self.dirs[PENDING] / f"{job_id}.json")
+        return job_id
+
+    def _claim_key(self, key: str, job_id: str) -> str | None:
+        """Id of a recent, not failed job holding ``key``; otherwise record ``job_id`` under it."""
+        path = self.keys / hashlib.sha256(key.encode()).hexdigest()
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            try:
+                held, stored = path.read_text(), path.stat().st_mtime
+            except FileNotFoundError:
+                held, stored = "", 0.0
+            if held and stored > time.time() - dedupe_window() and not (self.dirs[FAILED] / f"{held}.err.txt").exists():
+                return held
+            tmp = self.tmp / f"{path.name}.key"
+            tmp.write_text(job_id)
+            os.replace(tmp, path)
+            return None
+        with os.fdopen(fd, "w") as f:
+            f.write(job_id)
+        return None
+
+    def dequeue(self, lease: float | None = None) -> Job | None:
+        lease = lease if lease is not None else lease_seconds()
+        self._reclaim()
+        skip = set()
+        while True:
+            names = [e.name for e in os.scandir(self.dirs[PENDING]) if e.name.endswith(".json") and e.name not in skip]
+            if not names:
+                return None
+            name = min(names)
+            src, dst = self.dirs[PENDING] / name, self.dirs[LEASED] / name
+            deadline = time.time() + lease
+            try:
+                os.utime(src, (deadline, deadline))
+                os.rename(src, dst)
+            except FileNotFoundError:
+                skip.add(name)  # another worker claimed it
+                continue
+            try:
+                payload = json.loads(dst.read_text())
+            except ValueError as e:
+                self._finish(name, FAILED, f"unreadable job file: {e}")
+                continue
+            return Job(payload.get("job_id") or name[:-5], payload, 1, f"{name}|{deadline!r}", deadline)
+
+    def _reclaim(self):
+        """Move jobs whose lease deadline (mtime) passed back to pending."""
+        now = time.time()
+        if now < self._next_reclaim:
+            return
+        self._next_reclaim = now + lease_seconds() / 4
+        for e in os.scandir(self.dirs[LEASED]):
+            try:
+                if e.stat().st_mtime < now:
+                    os.rename(e.path, self.dirs[PENDING] / e.name)
+            except FileNotFoundError:
+                continue
+
+    def _finish(self, lease: str, state: str, body: str) -> bool:
+        name, _, deadline = lease.partition("|")
+        leased = self.dirs[LEASED] / name
+        try:
+            if deadline and abs(leased.stat().st_mtime - float(deadline)) > 1e-3:
+                return False  # leased again by another worker
+        except FileNotFoundError:
+            return False  # lease expired and the job was handed back to pending
+        stem = name[:-5]
+        out = self.dirs[DONE] / f"{stem}.done.json" if state == DONE else self.dirs[FAILED] / f"{stem}.err.txt"
+        out.write_text(body)
+        leased.unlink(missing_ok=True)
+        return True
+
+    def ack(self, job: Job, result) -> bool:
+        return self._finish(job.lease, DONE, json.dumps(result))
+
+    def fail(self, job: Job, error: str) -> bool:
+        return self._finish(job.lease, FAILED, error)
+
+    def retry(self, job: Job, delay: float, error: str | None = None) -> bool:
+        name, _, deadline = job.lease.partition("|")
+        leased = self.dirs[LEASED] / name
+        try:
+            if deadline and abs(leased.stat().st_mtime - float(deadline)) > 1e-3:
+                return False
+            at = time.time() + delay
+            os.utime(leased, (at, at))  # reclaimed once the new deadline passes
+        except FileNotFoundError:
+            return False
+        return True
+
+    def counts(self) -> dict[str, int]:
+        return {s: sum(1 for _ in os.scandir(d)) for s, d in self.dirs.items()}
+
+    def _file(self, state: str, job_id: str) -> Path:
+        if state == DONE:
+            return self.dirs[DONE] / f"{job_id}.done.json"
+        if state == FAILED:
+            return self.dirs[FAILED] / f"{job_id}.err.txt"
+        return self.dirs[state] / f"{job_id}.json"
+
+    def _record(self, state: str, job_id: str) -> dict | None:
+        path = self._file(state, job_id)
+        try:
+            mtime, body = path.stat().st_mtime, path.read_text()
+        except FileNotFoundError:
+            return None
+        if state == DONE:
+            try:
+                result = json.loads(body)
+            except ValueError:
+                result = body
+            return record(job_id, "", state, 1, None, mtime, result=result)
+        if state == FAILED:
+            return record(job_id, "", state, 1, None, mtime, error=body)
+        try:
+            typ = json.loads(body).get("type", "")
+        except ValueError:
+            typ = ""
+        if state == LEASED:
+            return record(job_id, typ, state, 1, None, None, lease_until=mtime)
+        return record(job_id, typ, state, 0, None, mtime)
+
+    def get(self, job_id: str) -> dict | None:
+        for state in STATES:
+            rec = self._record(state, job_id)
+            if rec is not None:
+                return rec
+        return None
+
+    def _ids(self, state: str) -> list[str]:
+        suffix = {DONE: ".done.json", FAILED: ".err.txt"}.get(state, ".json")
+        return [e.name[:-len(suffix)] for e in os.scandir(self.dirs[state]) if e.name.endswith(suffix)]
+
+    def list_jobs(self, state: str | None = None, limit: int = 50,
+                  cursor: str | None = None) -> tuple[list[dict], str | None]:
+        # job ids start with a timestamp, so reverse name order is roughly newest first
+        ids = sorted(((i, s) for s in ([state] if state else STATES) for i in self._ids(s)), reverse=True)
+        if cursor:
+            ids = [(i, s) for i, s in ids if i < cursor]
+        out = []
+        for job_id, s in ids:
+            if len(out) == limit:
+                return out, out[-1]["id"]
+            rec = self._record(s, job_id)
+            if rec is not None:
+                out.append(rec)
+        return out, None
+
+    def compact(self, older_than: float | None = None) -> int:
+        self._expire_keys()
+        cutoff = time.time() - (archive.retention() if older_than is None else older_than)
+        old = []
+        for state in (DONE, FAILED):
+            for job_id in self._ids(state):
+                rec = self._record(state, job_id)
+                if rec is not None and rec["updated"] < cutoff:
+                    old.append(rec)
+        if not old:
+            return 0
+        archive.append(self.archive, old)
+        for rec in old:
+            self._file(rec["state"], rec["id"]).unlink(missing_ok=True)
+        return len(old)
+
+    def _expire_keys(self):
+        """Drop idempotency key files older than the dedupe window; they can no longer match."""
+        cutoff = time.time() - dedupe_window()
+        for e in os.scandir(self.keys):
+            try:
+                if e.stat().st_mtime < cutoff:
+                    os.unlink(e.path)
+            except FileNotFoundError:
+                continue
+
+    def wait(self, timeout: float | None = None) -> bool:
+        timeout = poll_interval() if timeout is None else timeout
+        if self._watching is None:
+            try:
+                self._watch = InotifyWatch(self.dirs[PENDING])
+                self._watching = True
+            except OSError:
+                self._watching = False
+            return True  # events are only seen from now on; re-check first
+        deadlines = []
+        for e in os.scandir(self.dirs[LEASED]):
+            try:
+                deadlines.append(e.stat().st_mtime)
+            except FileNotFoundError:
+                continue
+        if deadlines:
+            # leases are reclaimed at most every lease/4 seconds
+            timeout = until_expiry(max(min(deadlines), self._next_reclaim), timeout)
+        if not self._watching:
+            time.sleep(min(timeout, FALLBACK_POLL))
+            return True
+        return self._watch.wait(timeout)
+
+    def close(self):
+        if self._watch is not None:
+            self._watch.close()
+            self._watch = None
@@ -0,0 +1,291 @@
+"""SQLite (WAL) job queue: the default backend.
+
+One row per job; ``(state, seq)`` and ``(state, lease_until)`` indexes make
+dequeue and expiry checks index seeks instead of directory scans.  Dequeue runs
+in a ``BEGIN IMMEDIATE`` transaction so concurrent workers (threads or
+processes) never lease the same job.  Jobs whose lease expired are delivered
+again; after ``JOB_MAX_ATTEMPTS`` deliveries they are failed instead.
+
+Idempotency keys and merge keys are indexed columns, so duplicate checks and
+``coalesce`` are single index lookups.
+
+The table doubles as the job-state index behind ``GET /ops/jobs``: every
+transition is an update of the job's row, lookups go through the ``id``
+index.  ``compact`` moves old finished rows into the gzip archive (see
+``archive``) and leaves ``id -> (state, archive file)`` in ``archived``.
+
+Enqueue wakes idle workers through unix datagram sockets in
+``<db>.notify/``; a waiting worker otherwise sleeps until the next lease
+expiry or ``JOB_POLL_INTERVAL``.
+"""
+from pathlib import Path
+import json, sqlite3, threading, time, uuid
+
+from services.jobs import archive
+from services.jobs.base import (
+    DONE, FAILED, FALLBACK_POLL, LEASED, PENDING, STATES, Job, JobQueue, dedupe_window, until_expiry, lease_seconds,
+    max_attempts, poll_interval, record,
+)
+from services.jobs.notify import DatagramNotifier
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS jobs ("
+    " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+    " id TEXT NOT NULL UNIQUE,"
+    " type TEXT NOT NULL,"
+    " payload TEXT NOT NULL,"
+    " state TEXT NOT NULL,"
+    " attempts INTEGER NOT NULL DEFAULT 0,"
+    " lease TEXT,"
+    " lease_until REAL,"
+    " created REAL NOT NULL,"
+    " updated REAL NOT NULL,"
+    " result TEXT,"
+    " error TEXT,"
+    " key TEXT,"
+    " merge TEXT)",
+    "CREATE INDEX IF NOT EXISTS jobs_state_seq ON jobs(state, seq)",
+    "CREATE INDEX IF NOT EXISTS jobs_state_lease ON jobs(state, lease_until)",
+    "CREATE INDEX IF NOT EXISTS jobs_state_updated ON jobs(state, updated)",
+    "CREATE TABLE IF NOT EXISTS archived (id TEXT PRIMARY KEY, state TEXT NOT NULL, file TEXT NOT NULL) WITHOUT ROWID",
+)
+INDEXES = (
+    "CREATE INDEX IF NOT EXISTS jobs_key ON jobs(key, created) WHERE key IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS jobs_merge ON jobs(merge, state, seq) WHERE merge IS NOT NULL",
+)
+
+
+class SqliteQueue(JobQueue):
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        for stmt in SCHEMA:
+            self._db.execute(stmt)
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        for col in ("key", "merge"):
+            if col not in columns:  # queue files created before these columns existed
+                self._db.execute(f"ALTER TABLE jobs ADD COLUMN {col} TEXT")
+        for stmt in INDEXES:
+            self._db.execute(stmt)
+        self.archive = archive.archive_dir(self.path.parent / "archive")
+        self._notifier = DatagramNotifier(self.path.with_name(self.path.name + ".notify"))
+        self._listening: bool | None = None
+
+    def enqueue(self, payload: dict) -> str:
+        job_id = payload["job_id"]
+        key = payload.get("key")
+        window = dedupe_window()
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                if key and window > 0:
+                    row = self._db.execute(
+                        "SELECT id FROM jobs WHERE key = ? AND created > ? AND state != ?"
+                        " ORDER BY created DESC LIMIT 1",
+                        (key, now - window, FAILED),
+                    ).fetchone()
+                    if row is not None:
+                        self._db.execute("COMMIT")
+                        return row[0]
+                self._db.execute(
+                    "INSERT INTO jobs(id, type, payload, state, created, updated, key, merge)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, payload.get("type", ""), json.dumps(payload), PENDING, now, now, key, payload.get("merge")),
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        self._notifier.notify()
+        return job_id
+
+    def dequeue(self, lease: float | None = None) -> Job | None:
+        lease = lease if lease is not None else lease_seconds()
+        token = uuid.uuid4().hex
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = self._reclaim(now)
+                if row is None:
+                    row = self._db.execute(
+                        "SELECT seq, id, payload, attempts FROM jobs WHERE state = ? ORDER BY seq LIMIT 1", (PENDING,)
+                    ).fetchone()
+                if row is None:
+                    self._db.execute("COMMIT")
+                    return None
+                seq, job_id, payload, attempts = row
+                self._db.execute(
+                    "UPDATE jobs SET state = ?, attempts = ?, lease = ?, lease_until = ?, updated = ? WHERE seq = ?",
+                    (LEASED, attempts + 1, token, now + lease, now, seq),
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return Job(job_id, json.loads(payload), attempts + 1, token, now + lease)
+
+    def coalesce(self, job: Job) -> list[Job]:
+        merge = job.payload.get("merge")
+        if not merge:
+            return []
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._db.execute(
+                    "SELECT seq, id, payload, attempts FROM jobs WHERE merge = ? AND state = ? ORDER BY seq",
+                    (merge, PENDING),
+                ).fetchall()
+                now = time.time()
+                self._db.executemany(
+                    "UPDATE jobs SET state = ?, attempts = attempts + 1, lease = ?, lease_until = ?, updated = ?"
+                    " WHERE seq = ?",
+                    [(LEASED, job.lease, job.lease_until, now, seq) for seq, *_ in rows],
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return [Job(job_id, json.loads(payload), attempts + 1, job.lease, job.lease_until)
+                for _, job_id, payload, attempts in rows]
+
+    def _reclaim(self, now: float):
+        """Oldest expired lease that may be retried; exhausted ones are failed on the way."""
+        limit = max_attempts()
+        while True:
+            row = self._db.execute(
+                "SELECT seq, id, payload, attempts FROM jobs WHERE state = ? AND lease_until < ?"
+                " ORDER BY lease_until LIMIT 1",
+                (LEASED, now),
+            ).fetchone()
+            if row is None or row[3] < limit:
+                return row
+            self._db.execute(
+                "UPDATE jobs SET state = ?, lease = NULL, updated = ?,"
+                " error = ? || COALESCE(': ' || error, '') WHERE seq = ?",
+                (FAILED, now, f"gave up after {row[3]} attempts", row[0]),
+            )
+
+    def _finish(self, job: Job, state: str, result=None, error: str | None = None) -> bool:
+        with self._lock:
+            cur = self._db.execute(
+                "UPDATE jobs SET state = ?, result = ?, error = ?, lease = NULL, lease_until = NULL, updated = ?"
+                " WHERE id = ? AND state = ? AND lease = ?",
+                (state, None if result is None else json.dumps(result), error, time.time(), job.id, LEASED, job.lease),
+            )
+        return cur.rowcount == 1
+
+    def ack(self, job: Job, result) -> bool:
+        return self._finish(job, DONE, result=result)
+
+    def fail(self, job: Job, error: str) -> bool:
+        return self._finish(job, FAILED, error=error)
+
+    def retry(self, job: Job, delay: float, error: str | None = None) -> bool:
+        # stays leased without a token: _reclaim hands it out again after ``delay``
+        with self._lock:
+            cur = self._db.execute(
+                "UPDATE jobs SET lease = NULL, lease_until = ?, error = ?, updated = ?"
+                " WHERE id = ? AND state = ? AND lease = ?",
+                (time.time() + delay, error, time.time(), job.id, LEASED, job.lease),
+            )
+        return cur.rowcount == 1
+
+    def counts(self) -> dict[str, int]:
+        with self._lock:
+            rows = self._db.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        return {s: 0 for s in STATES} | dict(rows)
+
+    @staticmethod
+    def _record(row) -> dict:
+        job_id, typ, state, attempts, created, updated, lease_until, result, error = row
+        return record(job_id, typ, state, attempts, created, updated, lease_until,
+                      None if result is None else json.loads(result), error)
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, type, state, attempts, created, updated, lease_until, result, error FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+            if row is None:
+                old = self._db.execute("SELECT state, file FROM archived WHERE id = ?", (job_id,)).fetchone()
+                return None if old is None else {"id": job_id, "state": old[0], "archived": old[1]}
+        return self._record(row)
+
+    def list_jobs(self, state: str | None = None, limit: int = 50,
+                  cursor: str | None = None) -> tuple[list[dict], str | None]:
+        where, args = [], []
+        if state:
+            where.append("state = ?")
+            args.append(state)
+        if cursor:
+            where.append("seq < ?")
+            args.append(int(cursor))
+        sql = "SELECT seq, id, type, state, attempts, created, updated, lease_until, result, error FROM jobs"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        with self._lock:
+            rows = self._db.execute(sql + " ORDER BY seq DESC LIMIT ?", (*args, limit + 1)).fetchall()
+        page = rows[:limit]
+        nxt = str(page[-1][0]) if len(rows) > limit else None
+        return [self._record(r[1:]) for r in page], nxt
+
+    def compact(self, older_than: float | None = None, batch: int = 1000) -> int:
+        cutoff = time.time() - (archive.retention() if older_than is None else older_than)
+        moved = 0
+        while True:
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT seq, id, type, state, attempts, created, updated, lease_until, result, error, payload"
+                    " FROM jobs WHERE state IN (?, ?) AND updated < ? ORDER BY updated LIMIT ?",
+                    (DONE, FAILED, cutoff, batch),
+                ).fetchall()
+            if not rows:
+                return moved
+            # archive first: a crash before the delete only duplicates records in the archive
+            name = archive.append(self.archive, [
+                self._record(r[1:10]) | {"payload": json.loads(r[10])} for r in rows
+            ])
+            with self._lock:
+                self._db.execute("BEGIN IMMEDIATE")
+                try:
+                    self._db.executemany("DELETE FROM jobs WHERE seq = ?", [(r[0],) for r in rows])
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO archived(id, state, file) VALUES (?, ?, ?)",
+                        [(r[1], r[3], name) for r in rows],
+                    )
+                    self._db.execute("COMMIT")
+                except BaseException:
+                    self._db.execute("ROLLBACK")
+                    raise
+            moved += len(rows)
+
+    def wait(self, timeout: float | None = None) -> bool:
+        timeout = poll_interval() if timeout is None else timeout
+        if self._listening is None:
+            try:
+                self._notifier.listen()
+                self._listening = True
+            except OSError:
+                self._listening = False
+            return True  # notifications start now; re-check what came before
+        with self._lock:
+            (next_expiry,) = self._db.execute(
+                "SELECT MIN(lease_until) FROM jobs WHERE state = ?", (LEASED,)
+            ).fetchone()
+        timeout = until_expiry(next_expiry, timeout)
+        if not self._listening:
+            time.sleep(min(timeout, FALLBACK_POLL))
+            return True
+        return self._notifier.wait(timeout)
+
+    def close(self):
+        self._notifier.close()
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,156 @@
+"""Deterministic Merkle trees over a published directory.
+
+Leaves are the files under the root in sorted relative-path order::
+
+    leaf = sha256(0x00 || relpath || 0x00 || sha256(contents))
+    node = sha256(0x01 || left || right)
+
+An odd node at the end of a level is promoted unchanged to the next level.
+The tree is written to a compact binary ``.tmk`` file so an inclusion proof
+for one file is ``O(log n)`` 32-byte reads and never touches the other files:
+
+    b"TMK1" | u32 leaf count | u32 paths-block length
+    paths block (newline separated, sorted, UTF-8)
+    n x 32-byte file digests
+    level 0 (n leaves), level 1, ... root (32 bytes each)
+"""
+from pathlib import Path
+import hashlib, os, struct
+
+MAGIC = b"TMK1"
+HEADER = struct.Struct(">4sII")
+
+
+def merkle_dir() -> Path:
+    return Path(os.getenv("MERKLE_DIR", "merkle"))
+
+
+def leaf_hash(rel: str, file_sha256: bytes) -> bytes:
+    return hashlib.sha256(b"\x00" + rel.encode() + b"\x00" + file_sha256).digest()
+
+
+def node_hash(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+
+def _level_sizes(n: int) -> list[int]:
+    sizes = [n]
+    while sizes[-1] > 1:
+        sizes.append((sizes[-1] + 1) // 2)
+    return sizes
+
+
+def tree_levels(leaves: list[bytes]) -> list[list[bytes]]:
+    """Every level from ``leaves`` up to the root, odd nodes promoted unchanged."""
+    level = leaves
+    levels = [level]
+    while len(level) > 1:
+        nxt = [node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            nxt.append(level[-1])
+        levels.append(nxt)
+        level = nxt
+    return levels
+
+
+def level_proof(levels: list[list[bytes]], i: int) -> list[dict]:
+    """Inclusion proof steps for leaf ``i`` of in-memory ``levels`` (the ``.tmk`` proof format)."""
+    steps = []
+    for level in levels[:-1]:
+        sib = i ^ 1
+        if sib < len(level):
+            steps.append({"side": "left" if sib < i else "right", "hash": level[sib].hex()})
+        i //= 2
+    return steps
+
+
+def build_levels(digests: dict[str, str]) -> tuple[list[str], list[bytes], list[list[bytes]]]:
+    """``(paths, file digests, levels)`` for ``{relpath: sha256 hex}``."""
+    paths = sorted(digests)
+    files = [bytes.fromhex(digests[p]) for p in paths]
+    return paths, files, tree_levels([leaf_hash(p, d) for p, d in zip(paths, files)])
+
+
+def merkle_root(digests: dict[str, str]) -> str:
+    levels = build_levels(digests)[2]
+    return levels[-1][0].hex() if levels[0] else hashlib.sha256(b"").hexdigest()
+
+
+def write_tree(out: Path, digests: dict[str, str]) -> str:
+    """Write the ``.tmk`` tree file for ``digests`` and return the root (hex)."""
+    paths, files, levels = build_levels(digests)
+    if not paths:
+        raise ValueError("cannot build a Merkle tree over an empty directory")
+    if any("\n" in p for p in paths):
+        raise ValueError("paths containing newlines are not supported")
+    block = "\n".join(paths).encode()
+    out = Path(out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_name(out.name + ".tmp")
+    with tmp.open("wb") as f:
+        f.write(HEADER.pack(MAGIC, len(paths), len(block)))
+        f.write(block)
+        f.writelines(files)
+        for level in levels:
+            f.writelines(level)
+    os.replace(tmp, out)
+    return levels[-1][0].hex()
+
+
+class MerkleTree:
+    """Read-only view of a ``.tmk`` file; proofs seek only the nodes they need."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with self.path.open("rb") as f:
+            magic, n, plen = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"not a Merkle tree file: {path}")
+            self.paths = f.read(plen).decode().split("\n")
+        self.n = n
+        self._files_at = HEADER.size + plen
+        self._levels_at = self._files_at + 32 * n
+        self._level_offsets = []
+        off = self._levels_at
+        for size in _level_sizes(n):
+            self._level_offsets.append(off)
+            off += 32 * size
+        self._index = {p: i for i, p in enumerate(self.paths)}
+        with self.path.open("rb") as f:
+            f.seek(self._level_offsets[-1])
+            self.root = f.read(32).hex()
+
+    def proof(self, rel: str) -> dict:
+        i = self._index.get(rel)
+        if i is None:
+            raise KeyError(rel)
+        steps = []
+        sizes = _level_sizes(self.n)
+        with self.path.open("rb") as f:
+            f.seek(self._files_at + 32 * i)
+            file_sha = f.read(32)
+            f.seek(self._level_offsets[0] + 32 * i)
+            leaf = f.read(32)
+            idx = i
+            for depth, size in enumerate(sizes[:-1]):
+                sib = idx ^ 1
+                if sib < size:
+                    f.seek(self._level_offsets[depth] + 32 * sib)
+                    steps.append({"side": "left" if sib < idx else "right", "hash": f.read(32).hex()})
+                idx //= 2
+        return {
+            "root": self.root,
+            "path": rel,
+            "index": i,
+            "file_sha256": file_sha.hex(),
+            "leaf": leaf.hex(),
+            "proof": steps,
+        }
+
+
+def verify_proof(rel: str, file_sha256: str, proof: list[dict], root: str) -> bool:
+    h = leaf_hash(rel, bytes.fromhex(file_sha256))
+    for step in proof:
+        sib = bytes.fromhex(step["hash"])
+        h = node_hash(sib, h) if step["side"] == "left" else node_hash(h, sib)
+    return h.hex() == root
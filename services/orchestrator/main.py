@@ -1,5 +1,6 @@
 import os
 import json
+from contextlib import asynccontextmanager
 from typing import Dict, Any, Literal
 
 from fastapi import FastAPI
@@ -8,11 +9,23 @@ from loguru import logger
 from dotenv import load_dotenv
 from langgraph.graph import StateGraph, END, START
 
+from services.ipfs_publisher import publisher
+
 
 # Load env (from root .env when running in container)
 load_dotenv(os.getenv("ENV_FILE", ".env"))
 
-app = FastAPI(title="Trustiva Swarm Orchestrator")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        yield
+    finally:
+        await publisher.aclose()
+
+
+app = FastAPI(title="Trustiva Swarm Orchestrator", lifespan=lifespan)
 
 
 # ----------------------- Minimal tool shims -----------------------
@@ -63,24 +76,20 @@ async def hf_generate(prompt: str) -> str:
 
 
 async def publish_ipfs(path: str) -> Dict[str, Any]:
-    """Publish using the helper script, which supports CLI or HTTP API fallback."""
-    import asyncio, sys
+    """Publish in-process through the shared publisher (CLI or HTTP API backend)."""
+
+    def on_progress(ev: Dict[str, Any]) -> None:
+        logger.debug("publish {id} {phase}: {done_files}/{files} files, {bytes}/{total_bytes} bytes", **ev)
 
     try:
-        proc = await asyncio.create_subprocess_exec(
-            sys.executable,
-            "scripts/publish_to_ipfs.py",
-            path,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-        )
-        out, err = await proc.communicate()
-        if proc.returncode == 0:
-            data = json.loads(out.decode("utf-8").strip() or "{}")
-            return {"cid": data.get("cid"), "gateway": data.get("gateway"), "path": data.get("path")}
-        return {"error": (err or out).decode("utf-8")}
+        data = await publisher.publish(path, on_progress=on_progress)
     except Exception as e:
         return {"error": str(e)}
+    out = {"cid": data.get("cid"), "gateway": data.get("gateway"), "path": data.get("path")}
+    for key in ("upload", "delta"):
+        if key in data:
+            out[key] = data[key]
+    return out
 
 
 # ----------------------- Graph state & nodes -----------------------
@@ -154,6 +163,11 @@ async def health():
     return {"status": "ok"}
 
 
+@app.get("/publish/status")
+async def publish_status():
+    return {"max_concurrency": publisher.max_concurrency, "active": publisher.active()}
+
+
 @app.post("/swarm/run")
 async def run_swarm(payload: SwarmRequest):
     state_dict = {"task": payload.task, "params": payload.params, "output": {}}
@@ -0,0 +1,87 @@
+"""Client-side rate limiting and retry timing for the Zoho worker pool.
+
+Each Zoho API (Mail, Bigin) gets its own ``TokenBucket`` so a Mail backlog
+cannot spend Bigin's quota and vice versa.  A 429 pauses the whole bucket for
+the server's ``Retry-After`` so concurrent jobs stop hammering an API that is
+already throttling us.
+
+Env (requests/second and burst size per API):
+  ZOHO_MAIL_RATE   (default 2)   ZOHO_MAIL_BURST   (default 5)
+  ZOHO_BIGIN_RATE  (default 5)   ZOHO_BIGIN_BURST  (default 10)
+A rate of 0 disables limiting for that API.
+"""
+from email.utils import parsedate_to_datetime
+import asyncio, os, random, time
+
+DEFAULTS = {"mail": (2.0, 5), "bigin": (5.0, 10)}
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int | None = None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock: asyncio.Lock | None = None
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, n: int = 1):
+        if self.rate <= 0:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:  # waiters are served in arrival order
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= n:
+                    self.tokens -= n
+                    return
+                await asyncio.sleep((n - self.tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens for ``seconds`` (e.g. after a 429)."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+
+def zoho_buckets() -> dict[str, TokenBucket]:
+    out = {}
+    for api, (rate, burst) in DEFAULTS.items():
+        env = api.upper()
+        out[api] = TokenBucket(float(os.getenv(f"ZOHO_{env}_RATE", rate)), int(os.getenv(f"ZOHO_{env}_BURST", burst)))
+    return out
+
+
+def backoff(attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+    """Full-jitter exponential backoff for the ``attempt``-th try (1-based)."""
+    return random.uniform(base / 2, min(cap, base * 2 ** max(attempt - 1, 0)))
+
+
+def retry_delay(attempt: int, after: float | None, cap: float = 60.0) -> float:
+    """The server's ``Retry-After`` plus a little jitter, else exponential backoff."""
+    if after is not None:
+        return after + random.uniform(0, min(1.0, after * 0.1))
+    return backoff(attempt, cap=cap)
+
+
+def retry_after(headers) -> float | None:
+    """Seconds from a ``Retry-After`` header (delta-seconds or HTTP date)."""
+    value = headers.get("Retry-After") if headers is not None else None
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
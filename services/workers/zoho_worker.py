@@ -1,44 +1,227 @@
-import time, json, traceback
+import asyncio, json, os, traceback
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from services.zoho_client import ZohoClient
 
-PENDING = Path("queue/pending")
-DONE = Path("queue/done")
-FAILED = Path("queue/failed")
-for d in (PENDING, DONE, FAILED):
-    d.mkdir(parents=True, exist_ok=True)
+import httpx
+import requests
+from loguru import logger
 
-zc = ZohoClient()
+from services.jobs import get_queue
+from services.jobs.archive import compact_interval
+from services.jobs.spool_backend import SpoolQueue
+from services.workers.ratelimit import retry_after, retry_delay, zoho_buckets
+from services.zoho_client import AsyncZohoClient
 
+LEGACY_PENDING = Path("queue/pending")
+JOB_API = {"send_mail": "mail", "upsert_contact": "bigin", "bulk_upsert_contacts": "bigin"}
+MAX_BACKOFF = float(os.getenv("WORKER_MAX_BACKOFF", "60"))
 
-def handle(job):
+
+async def ahandle(client: AsyncZohoClient, job):
     typ = job["type"]
     data = job["data"]
     if typ == "send_mail":
-        res = zc.mail_send(
+        res = await client.mail_send(
             to=data["to"], subject=data["subject"],
             text=data.get("text"), html=data.get("html"),
             cc=data.get("cc"), bcc=data.get("bcc")
         )
         return {"status": "sent", "resp": res}
     if typ == "upsert_contact":
-        res = zc.bigin_upsert_contact(**data)
+        res = await client.bigin_upsert_contact(**data)
         return {"status": "ok", "contact": res}
+    if typ == "bulk_upsert_contacts":
+        return _bulk_result(await client.bigin_bulk_upsert(data["contacts"]))
     raise ValueError(f"unknown job type: {typ}")
 
 
-def main():
-    while True:
-        for path in sorted(PENDING.glob("*.json")):
+def merge_upserts(payloads: list[dict]) -> dict:
+    """One ``upsert_contact`` payload from several for the same email, oldest first.
+
+    Later non-empty fields win; tags are unioned in order.
+    """
+    data: dict = {}
+    tags: list[str] = []
+    for p in payloads:
+        for k, v in p["data"].items():
+            if k == "tags":
+                tags += [t for t in v or [] if t not in tags]
+            elif v is not None:
+                data[k] = v
+    if tags:
+        data["tags"] = tags
+    return {**payloads[0], "data": data}
+
+
+def coalesce(queue, job) -> tuple[dict, list]:
+    """``(payload to run, jobs it settles)``: ``job`` plus pending upserts merged into it."""
+    if job.type != "upsert_contact":
+        return job.payload, [job]
+    extra = queue.coalesce(job)
+    if not extra:
+        return job.payload, [job]
+    jobs = [job, *extra]
+    return merge_upserts([j.payload for j in jobs]), jobs
+
+
+def _bulk_result(results: list[dict]) -> dict:
+    counts = {}
+    for r in results:
+        counts[r["status"]] = counts.get(r["status"], 0) + 1
+    return {"status": "ok", "counts": counts, "results": results}
+
+
+def import_legacy_spool(queue, pending: Path = LEGACY_PENDING) -> int:
+    """Move jobs left in the old one-file-per-job spool into ``queue``."""
+    if isinstance(queue, SpoolQueue) or not pending.is_dir():
+        return 0
+    n = 0
+    for path in sorted(pending.glob("*.json")):
+        try:
+            payload = json.loads(path.read_text())
+            payload.setdefault("job_id", path.stem)
+            queue.enqueue(payload)
+        except Exception as e:
+            logger.warning(f"skipping legacy job {path.name}: {e}")
+            continue
+        path.unlink(missing_ok=True)
+        n += 1
+    return n
+
+
+def retry_hint(exc: Exception) -> tuple[bool, float | None]:
+    """``(retryable, Retry-After seconds)`` for a failed Zoho call."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        code = exc.response.status_code
+        if code == 429 or code >= 500:
+            return True, retry_after(exc.response.headers)
+        return False, None
+    if isinstance(exc, httpx.TransportError):
+        return True, None
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        code = exc.response.status_code
+        if code == 429 or code >= 500:
+            return True, retry_after(exc.response.headers)
+        return False, None
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+        return True, None
+    return False, None
+
+
+class WorkerPool:
+    """Runs up to ``WORKER_CONCURRENCY`` jobs at once (default 8).
+
+    Jobs run on one ``AsyncZohoClient``; every Zoho request first takes a
+    token from its API's bucket (Mail or Bigin).  A custom ``handler`` (sync
+    or async) takes one token per job instead.  429s, 5xx and network errors
+    are retried through ``queue.retry`` after the server's ``Retry-After`` or
+    a jittered backoff; a 429 also pauses that API's bucket.  Other errors
+    fail the job.  Pending upserts for the email being upserted are merged
+    into the same call and settled with it.
+    """
+
+    def __init__(self, queue, concurrency: int | None = None, buckets: dict | None = None, handler=None):
+        self.queue = queue
+        self.concurrency = concurrency or int(os.getenv("WORKER_CONCURRENCY", "8"))
+        self.buckets = zoho_buckets() if buckets is None else buckets
+        self.handler = handler
+        self.client: AsyncZohoClient | None = None
+        self.stats = {"done": 0, "failed": 0, "retried": 0, "merged": 0}
+
+    async def _limit(self, api: str):
+        bucket = self.buckets.get(api)
+        if bucket is not None:
+            await bucket.acquire()
+
+    async def _run_job(self, payload: dict):
+        if self.handler is None:
+            if self.client is None:
+                self.client = AsyncZohoClient(rate_limit=self._limit)
+            return await ahandle(self.client, payload)
+        await self._limit(JOB_API.get(payload.get("type")))
+        if asyncio.iscoroutinefunction(self.handler):
+            return await self.handler(payload)
+        return await asyncio.to_thread(self.handler, payload)
+
+    async def _process(self, job):
+        bucket = self.buckets.get(JOB_API.get(job.type))
+        payload, jobs = await asyncio.to_thread(coalesce, self.queue, job)
+        self.stats["merged"] += len(jobs) - 1
+        try:
+            res = await self._run_job(payload)
+        except Exception as e:
+            err = f"{e}\n\n{traceback.format_exc()}"
+            retryable, after = retry_hint(e)
+            if retryable:
+                if after is not None and bucket is not None:
+                    bucket.pause(after)
+                delay = retry_delay(job.attempts, after, cap=MAX_BACKOFF)
+                for j in jobs:
+                    await asyncio.to_thread(self.queue.retry, j, delay, err)
+                self.stats["retried"] += len(jobs)
+            else:
+                for j in jobs:
+                    await asyncio.to_thread(self.queue.fail, j, err)
+                self.stats["failed"] += len(jobs)
+        else:
+            for j in jobs:
+                await asyncio.to_thread(self.queue.ack, j, res)
+            self.stats["done"] += len(jobs)
+
+    async def run(self, until_idle: bool = False) -> dict:
+        """Dispatch jobs forever (or, with ``until_idle``, until nothing is pending or leased)."""
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(ThreadPoolExecutor(self.concurrency + 2, thread_name_prefix="zoho"))
+        slots = asyncio.Semaphore(self.concurrency)
+        running: set[asyncio.Task] = set()
+
+        def finished(task):
+            running.discard(task)
+            slots.release()
+
+        compactor = None if until_idle else asyncio.create_task(self._compact_forever())
+        try:
+            return await self._dispatch(slots, running, finished, until_idle)
+        finally:
+            if compactor is not None:
+                compactor.cancel()
+            if self.client is not None:
+                await self.client.aclose()
+
+    async def _compact_forever(self):
+        """Archive finished jobs past ``JOB_RETENTION`` every ``JOB_COMPACT_INTERVAL`` seconds."""
+        interval = compact_interval()
+        if interval <= 0:
+            return
+        while True:
             try:
-                job = json.loads(path.read_text())
-                res = handle(job)
-                (DONE / f"{path.stem}.done.json").write_text(json.dumps(res))
-                path.unlink(missing_ok=True)
+                moved = await asyncio.to_thread(self.queue.compact)
+                if moved:
+                    logger.info(f"archived {moved} finished jobs")
             except Exception as e:
-                (FAILED / f"{path.stem}.err.txt").write_text(f"{e}\n\n{traceback.format_exc()}")
-                path.unlink(missing_ok=True)
-        time.sleep(1.0)
+                logger.warning(f"job compaction failed: {e}")
+            await asyncio.sleep(interval)
+
+    async def _dispatch(self, slots, running, finished, until_idle: bool) -> dict:
+        while True:
+            await slots.acquire()
+            job = await asyncio.to_thread(self.queue.dequeue)
+            if job is not None:
+                task = asyncio.create_task(self._process(job))
+                running.add(task)
+                task.add_done_callback(finished)
+                continue
+            slots.release()
+            if until_idle and not running and not self.queue.counts()["leased"]:
+                return self.stats
+            # blocks until an enqueue notification, a lease expiry or JOB_POLL_INTERVAL
+            await asyncio.to_thread(self.queue.wait, 0.05 if until_idle else None)
+
+
+def main():
+    queue = get_queue()
+    import_legacy_spool(queue)
+    asyncio.run(WorkerPool(queue).run())
 
 
 if __name__ == "__main__":
@@ -1,67 +1,45 @@
-import os, time, requests
+"""Zoho Mail / Bigin client.
 
-DC = os.getenv("ZOHO_DC", "com")
-ACCOUNTS = f"https://accounts.zoho.{DC}/oauth/v2/token"
-MAIL_API = f"https://mail.zoho.{DC}/api"
-BIGIN_API = f"https://www.zohoapis.{DC}/bigin/v2"
+``AsyncZohoClient`` does the work on one pooled ``httpx.AsyncClient`` per
+event loop.  Its access token is refreshed single-flight: concurrent callers
+that find it expired all await the same refresh, a refresh starts in the
+background ``ZOHO_TOKEN_REFRESH_AHEAD`` seconds (default 300) before expiry,
+and the token is shared with other processes through ``services.zoho_tokens``.
+A 401 forces one refresh and retry.
 
-CLIENT_ID = os.environ.get("ZOHO_CLIENT_ID", "")
-CLIENT_SECRET = os.environ.get("ZOHO_CLIENT_SECRET", "")
-REFRESH = os.environ.get("ZOHO_REFRESH_TOKEN", "")
-MAIL_ACCOUNT = os.environ.get("ZOHO_MAIL_ACCOUNT_ID", "")
+``ZohoClient`` keeps the original synchronous API as a thin wrapper that runs
+the async client on a background event loop; the module-level functions wrap
+a default ``ZohoClient``.
+"""
+import asyncio, hashlib, os, re, threading, time
 
-_cache = {"tok": None, "exp": 0}
+import httpx
 
-def zoho_token():
-    now = time.time()
-    if _cache["tok"] and now < _cache["exp"] - 30:
-        return _cache["tok"]
-    r = requests.post(ACCOUNTS, data={
-        "grant_type": "refresh_token",
-        "refresh_token": REFRESH,
-        "client_id": CLIENT_ID,
-        "client_secret": CLIENT_SECRET
-    }, timeout=20)
-    r.raise_for_status()
-    tok = r.json()["access_token"]
-    _cache.update(tok=tok, exp=now+3300)
-    return tok
+from services.zoho_contacts import ContactCache
+from services.zoho_tokens import token_store
 
-def mail_list(folder_id, limit=25):
-    tok = zoho_token()
-    url = f"{MAIL_API}/accounts/{MAIL_ACCOUNT}/messages"
-    r = requests.get(url, params={"folderId": folder_id, "limit": limit},
-                     headers={"Authorization": f"Zoho-oauthtoken {tok}"}, timeout=20)
-    r.raise_for_status()
-    return r.json()
+SAFETY = 30  # never hand out a token this close to expiry
+SEARCH_BATCH = 10       # Bigin search accepts up to 10 criteria per call
+CREATE_BATCH = 100      # Bigin insert accepts up to 100 records per call
+SEARCH_CONCURRENCY = 4
 
-def mail_send(to_addr, subject, html):
-    tok = zoho_token()
-    url = f"{MAIL_API}/accounts/{MAIL_ACCOUNT}/messages"
-    payload = {"toAddress": to_addr, "subject": subject, "content": html}
-    r = requests.post(url, json=payload, headers={"Authorization": f"Zoho-oauthtoken {tok}"}, timeout=20)
-    r.raise_for_status()
-    return r.json()
-
-def bigin_upsert_contact(email, first_name=None, last_name=None):
-    tok = zoho_token()
-    s = requests.get(f"{BIGIN_API}/Contacts/search", params={"email": email},
-                     headers={"Authorization": f"Zoho-oauthtoken {tok}"}, timeout=20)
-    if s.status_code == 200 and s.json().get("data"):
-        return s.json()["data"][0]
-    body = {"data":[{"Email": email, "First_Name": first_name, "Last_Name": last_name or email.split('@')[0]}]}
-    c = requests.post(f"{BIGIN_API}/Contacts", json=body, headers={"Authorization": f"Zoho-oauthtoken {tok}"}, timeout=20)
-    c.raise_for_status()
-    return c.json()["data"][0]
+DC = os.getenv("ZOHO_DC", "com")
+ACCOUNTS = f"https://accounts.zoho.{DC}/oauth/v2/token"
+MAIL_API = f"https://mail.zoho.{DC}/api"
+BIGIN_API = f"https://www.zohoapis.{DC}/bigin/v2"
 
 
-class ZohoClient:
+class AsyncZohoClient:
     def __init__(self,
                  client_id: str | None = None,
                  client_secret: str | None = None,
                  refresh_token: str | None = None,
                  dc: str | None = None,
-                 mail_account: str | None = None):
+                 mail_account: str | None = None,
+                 store=None,
+                 rate_limit=None,
+                 transport: httpx.AsyncBaseTransport | None = None,
+                 contacts: ContactCache | None = None):
         self.client_id = client_id or os.environ.get("ZOHO_CLIENT_ID", "")
         self.client_secret = client_secret or os.environ.get("ZOHO_CLIENT_SECRET", "")
         self.refresh_token = refresh_token or os.environ.get("ZOHO_REFRESH_TOKEN", "")
@@ -70,27 +48,92 @@ class ZohoClient:
         self.ACCOUNTS = f"https://accounts.zoho.{self.dc}/oauth/v2/token"
         self.MAIL_API = f"https://mail.zoho.{self.dc}/api"
         self.BIGIN_API = f"https://www.zohoapis.{self.dc}/bigin/v2"
-        self._tok = None
-        self._exp = 0
+        self.refresh_ahead = float(os.getenv("ZOHO_TOKEN_REFRESH_AHEAD", "300"))
+        self.store = store or token_store()
+        # optional ``async (api: "mail" | "bigin") -> None`` awaited before each API call
+        self.rate_limit = rate_limit
+        self.refreshes = 0
+        self._transport = transport
+        self._contacts = contacts
+        self._key = hashlib.sha256(f"{self.dc}:{self.client_id}:{self.refresh_token}".encode()).hexdigest()[:16]
+        self._tok: str | None = None
+        self._exp = 0.0
+        self._refreshing: asyncio.Task | None = None
+        self._client: httpx.AsyncClient | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
 
-    def _token(self) -> str:
+    def _http(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            # connections and the refresh task belong to one loop
+            self._client = httpx.AsyncClient(
+                timeout=20,
+                transport=self._transport,
+                limits=httpx.Limits(max_connections=int(os.getenv("ZOHO_HTTP_MAX_CONNECTIONS", "20"))),
+            )
+            self._loop = loop
+            self._refreshing = None
+        return self._client
+
+    # ----------------------- token -----------------------
+    async def token(self) -> str:
+        self._http()
         now = time.time()
-        if self._tok and now < self._exp - 30:
+        if self._tok and now < self._exp - SAFETY:
+            if now >= self._exp - self.refresh_ahead:
+                self._start_refresh()  # proactive; callers keep using the current token
             return self._tok
-        r = requests.post(self.ACCOUNTS, data={
-            "grant_type": "refresh_token",
-            "refresh_token": self.refresh_token,
-            "client_id": self.client_id,
-            "client_secret": self.client_secret,
-        }, timeout=20)
-        r.raise_for_status()
-        self._tok = r.json()["access_token"]
-        self._exp = now + 3300
-        return self._tok
+        return await asyncio.shield(self._start_refresh())
 
-    def mail_send(self, to: str, subject: str, text: str | None = None, html: str | None = None,
-                  cc: list[str] | None = None, bcc: list[str] | None = None):
-        tok = self._token()
+    def _start_refresh(self, stale: str | None = None) -> asyncio.Task:
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.create_task(self._refresh(stale))
+            self._refreshing.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return self._refreshing
+
+    async def _refresh(self, stale: str | None) -> str:
+        async with self.store.lock(self._key):
+            rec = await self.store.load(self._key)
+            if rec and rec[0] != stale and rec[1] - time.time() > self.refresh_ahead:
+                self._tok, self._exp = rec  # another process refreshed it
+                return self._tok
+            r = await self._http().post(self.ACCOUNTS, data={
+                "grant_type": "refresh_token",
+                "refresh_token": self.refresh_token,
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+            })
+            r.raise_for_status()
+            body = r.json()
+            tok = body["access_token"]
+            exp = time.time() + float(body.get("expires_in") or 3600)
+            self.refreshes += 1
+            await self.store.save(self._key, tok, exp)
+            self._tok, self._exp = tok, exp
+            return tok
+
+    async def _request(self, api: str, method: str, url: str, allow: tuple[int, ...] = (), **kw) -> httpx.Response:
+        if self.rate_limit is not None:
+            await self.rate_limit(api)
+        tok = await self.token()
+        http = self._http()
+        r = await http.request(method, url, headers={"Authorization": f"Zoho-oauthtoken {tok}"}, **kw)
+        if r.status_code == 401:
+            # revoked or expired early: refresh once (single-flight) and retry
+            tok = await asyncio.shield(self._start_refresh(stale=tok))
+            r = await http.request(method, url, headers={"Authorization": f"Zoho-oauthtoken {tok}"}, **kw)
+        if r.status_code not in allow:
+            r.raise_for_status()
+        return r
+
+    # ----------------------- API -----------------------
+    async def mail_list(self, folder_id, limit: int = 25):
+        url = f"{self.MAIL_API}/accounts/{self.mail_account}/messages"
+        r = await self._request("mail", "GET", url, params={"folderId": folder_id, "limit": limit})
+        return r.json()
+
+    async def mail_send(self, to: str, subject: str, text: str | None = None, html: str | None = None,
+                        cc: list[str] | None = None, bcc: list[str] | None = None):
         url = f"{self.MAIL_API}/accounts/{self.mail_account}/messages"
         payload = {"toAddress": to, "subject": subject}
         if html:
@@ -102,26 +145,197 @@ class ZohoClient:
             payload["ccAddress"] = ",".join(cc)
         if bcc:
             payload["bccAddress"] = ",".join(bcc)
-        r = requests.post(url, json=payload, headers={"Authorization": f"Zoho-oauthtoken {tok}"}, timeout=20)
-        r.raise_for_status()
+        r = await self._request("mail", "POST", url, json=payload)
         return r.json()
 
-    def bigin_upsert_contact(self, email: str, first_name: str | None = None, last_name: str | None = None,
-                              phone: str | None = None, company: str | None = None, tags: list[str] | None = None):
-        tok = self._token()
-        s = requests.get(f"{self.BIGIN_API}/Contacts/search", params={"email": email},
-                         headers={"Authorization": f"Zoho-oauthtoken {tok}"}, timeout=20)
+    async def bigin_upsert_contact(self, email: str, first_name: str | None = None, last_name: str | None = None,
+                                   phone: str | None = None, company: str | None = None,
+                                   tags: list[str] | None = None):
+        s = await self._request("bigin", "GET", f"{self.BIGIN_API}/Contacts/search", params={"email": email})
         if s.status_code == 200 and s.json().get("data"):
             return s.json()["data"][0]
-        body = {"data": [{
-            "Email": email,
-            "First_Name": first_name,
-            "Last_Name": last_name or (email.split('@')[0] if email else None),
-            "Phone": phone,
-            "Company": company,
-            "Tag": tags or [],
-        }]}
-        c = requests.post(f"{self.BIGIN_API}/Contacts", json=body,
-                          headers={"Authorization": f"Zoho-oauthtoken {tok}"}, timeout=20)
-        c.raise_for_status()
+        body = {"data": [_contact_record(email, first_name, last_name, phone, company, tags)]}
+        c = await self._request("bigin", "POST", f"{self.BIGIN_API}/Contacts", json=body)
         return c.json()["data"][0]
+
+    def contact_cache(self) -> ContactCache:
+        if self._contacts is None:
+            self._contacts = ContactCache()
+        return self._contacts
+
+    async def bigin_bulk_upsert(self, contacts: list[dict]) -> list[dict]:
+        """Upsert many contacts with batched searches and multi-record creates.
+
+        Known emails come from the local contact cache, the rest are searched
+        ``SEARCH_BATCH`` at a time and the missing ones created ``CREATE_BATCH``
+        at a time.  Returns one result per input contact, in order:
+        ``{"email", "status": "existing" | "created" | "error", "id", "cached"?, "error"?}``.
+        """
+        cache = self.contact_cache()
+        emails = [(c.get("email") or "").strip().lower() for c in contacts]
+        first: dict[str, dict] = {}
+        for c, email in zip(contacts, emails):
+            if email:
+                first.setdefault(email, c)
+        cached = await asyncio.to_thread(cache.get_many, self._key, list(first))
+        found: dict[str, str] = {}
+        todo = [e for e in first if e not in cached]
+
+        sem = asyncio.Semaphore(SEARCH_CONCURRENCY)
+
+        async def search(batch: list[str]):
+            crit = "or".join(f"(Email:equals:{_criteria_value(e)})" for e in batch)
+            async with sem:
+                r = await self._request("bigin", "GET", f"{self.BIGIN_API}/Contacts/search",
+                                        params={"criteria": f"({crit})" if len(batch) > 1 else crit})
+            hits = {}
+            if r.status_code == 200 and r.content:
+                for rec in r.json().get("data") or []:
+                    email = (rec.get("Email") or "").lower()
+                    if email in batch and email not in hits:
+                        hits[email] = str(rec["id"])
+            found.update(hits)
+            await asyncio.to_thread(cache.put_many, self._key, hits)
+
+        await asyncio.gather(*(search(todo[i:i + SEARCH_BATCH]) for i in range(0, len(todo), SEARCH_BATCH)))
+
+        created: dict[str, str] = {}
+        errors: dict[str, str] = {}
+        new = [e for e in todo if e not in found]
+        for i in range(0, len(new), CREATE_BATCH):
+            batch = new[i:i + CREATE_BATCH]
+            # an all-invalid batch comes back as 400 with the same per-record data
+            r = await self._request("bigin", "POST", f"{self.BIGIN_API}/Contacts", allow=(400,),
+                                    json={"data": [_contact_record(**first[e]) for e in batch]})
+            items = (r.json().get("data") if r.content else None) or []
+            if r.status_code == 400 and not items:
+                r.raise_for_status()
+            ids = {}
+            for email, item in zip(batch, items):
+                details = item.get("details") or {}
+                if item.get("status") == "success":
+                    created[email] = ids[email] = str(details.get("id"))
+                elif item.get("code") == "DUPLICATE_DATA" and details.get("id"):
+                    found[email] = ids[email] = str(details["id"])  # created since we searched
+                else:
+                    errors[email] = item.get("message") or item.get("code") or "error"
+            await asyncio.to_thread(cache.put_many, self._key, ids)
+
+        out = []
+        for email in emails:
+            if email in cached:
+                out.append({"email": email, "status": "existing", "id": cached[email], "cached": True})
+            elif email in found:
+                out.append({"email": email, "status": "existing", "id": found[email]})
+            elif email in created:
+                out.append({"email": email, "status": "created", "id": created[email]})
+            else:
+                out.append({"email": email, "status": "error", "id": None,
+                            "error": errors.get(email, "missing email")})
+        return out
+
+    async def aclose(self):
+        client, self._client = self._client, None
+        if client is not None:
+            await client.aclose()
+
+
+def _contact_record(email: str, first_name: str | None = None, last_name: str | None = None,
+                    phone: str | None = None, company: str | None = None, tags: list[str] | None = None) -> dict:
+    return {
+        "Email": email,
+        "First_Name": first_name,
+        "Last_Name": last_name or (email.split('@')[0] if email else None),
+        "Phone": phone,
+        "Company": company,
+        "Tag": tags or [],
+    }
+
+
+def _criteria_value(value: str) -> str:
+    # parentheses and commas are criteria syntax and must be escaped in values
+    return re.sub(r"([(),\\])", r"\\\1", value)
+
+
+class _LoopThread:
+    """A daemon thread running an event loop for the synchronous wrapper."""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, name="zoho-client", daemon=True).start()
+
+    def run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+
+_loop_thread: _LoopThread | None = None
+_loop_lock = threading.Lock()
+
+
+def _background() -> _LoopThread:
+    global _loop_thread
+    with _loop_lock:
+        if _loop_thread is None:
+            _loop_thread = _LoopThread()
+        return _loop_thread
+
+
+class ZohoClient:
+    """Synchronous facade over ``AsyncZohoClient`` (same constructor and methods)."""
+
+    def __init__(self,
+                 client_id: str | None = None,
+                 client_secret: str | None = None,
+                 refresh_token: str | None = None,
+                 dc: str | None = None,
+                 mail_account: str | None = None):
+        self.aio = AsyncZohoClient(client_id, client_secret, refresh_token, dc, mail_account)
+
+    def __getattr__(self, name):
+        # configuration (client_id, MAIL_API, ...) lives on the async client
+        return getattr(self.__dict__["aio"], name)
+
+    def _token(self) -> str:
+        return _background().run(self.aio.token())
+
+    def mail_list(self, folder_id, limit: int = 25):
+        return _background().run(self.aio.mail_list(folder_id, limit))
+
+    def mail_send(self, to: str, subject: str, text: str | None = None, html: str | None = None,
+                  cc: list[str] | None = None, bcc: list[str] | None = None):
+        return _background().run(self.aio.mail_send(to, subject, text=text, html=html, cc=cc, bcc=bcc))
+
+    def bigin_upsert_contact(self, email: str, first_name: str | None = None, last_name: str | None = None,
+                             phone: str | None = None, company: str | None = None, tags: list[str] | None = None):
+        return _background().run(self.aio.bigin_upsert_contact(
+            email, first_name=first_name, last_name=last_name, phone=phone, company=company, tags=tags))
+
+    def bigin_bulk_upsert(self, contacts: list[dict]) -> list[dict]:
+        return _background().run(self.aio.bigin_bulk_upsert(contacts))
+
+
+# ----------------------- module-level helpers (original API) -----------------------
+_default: ZohoClient | None = None
+
+
+def _client() -> ZohoClient:
+    global _default
+    if _default is None:
+        _default = ZohoClient()
+    return _default
+
+
+def zoho_token():
+    return _client()._token()
+
+
+def mail_list(folder_id, limit=25):
+    return _client().mail_list(folder_id, limit)
+
+
+def mail_send(to_addr, subject, html):
+    return _client().mail_send(to_addr, subject, html=html)
+
+
+def bigin_upsert_contact(email, first_name=None, last_name=None):
+    return _client().bigin_upsert_contact(email, first_name=first_name, last_name=last_name)
@@ -0,0 +1,51 @@
+"""Local email -> Bigin contact id cache used by bulk upserts.
+
+Contacts already seen (found by search or created by us) skip the Bigin
+search on the next import.  Entries are scoped per Zoho account and expire
+after ``ZOHO_CONTACT_CACHE_TTL`` seconds (default 7 days) so contacts deleted
+in Bigin are eventually searched for again.  Stored in SQLite at
+``ZOHO_CONTACT_CACHE`` (default ``.zoho-contacts.db``).
+"""
+from pathlib import Path
+import os, sqlite3, threading, time
+
+
+class ContactCache:
+    def __init__(self, path: str | Path | None = None, ttl: float | None = None):
+        self.path = Path(path or os.getenv("ZOHO_CONTACT_CACHE", ".zoho-contacts.db"))
+        self.ttl = ttl if ttl is not None else float(os.getenv("ZOHO_CONTACT_CACHE_TTL", str(7 * 86400)))
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS contacts ("
+            " scope TEXT NOT NULL, email TEXT NOT NULL, id TEXT NOT NULL, stored REAL NOT NULL,"
+            " PRIMARY KEY (scope, email))"
+        )
+
+    def get_many(self, scope: str, emails: list[str]) -> dict[str, str]:
+        """``{email: contact id}`` for the (lower-cased) ``emails`` that are cached and fresh."""
+        out = {}
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            for i in range(0, len(emails), 500):
+                chunk = emails[i:i + 500]
+                rows = self._db.execute(
+                    f"SELECT email, id FROM contacts WHERE scope = ? AND stored > ? AND email IN ({','.join('?' * len(chunk))})",
+                    (scope, cutoff, *chunk),
+                ).fetchall()
+                out.update(rows)
+        return out
+
+    def put_many(self, scope: str, ids: dict[str, str]):
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO contacts(scope, email, id, stored) VALUES (?, ?, ?, ?)",
+                [(scope, email, cid, now) for email, cid in ids.items()],
+            )
+
+    def forget(self, scope: str, email: str):
+        with self._lock:
+            self._db.execute("DELETE FROM contacts WHERE scope = ? AND email = ?", (scope, email))
@@ -0,0 +1,107 @@
+"""Zoho access-token cache shared by every worker process.
+
+Refreshing a token is done under a cross-process lock: the process holding it
+re-reads the shared cache first, so when N workers notice expiry together only
+one of them calls ``/oauth/v2/token`` and the rest pick up its result.
+
+``ZOHO_TOKEN_STORE`` selects the backend:
+
+  file    (default) JSON file ``ZOHO_TOKEN_CACHE`` (default ``.zoho-token.json``,
+          mode 0600) guarded by ``flock`` on ``<file>.lock``
+  redis   ``REDIS_URL``; the token is a key with a TTL, the lock a ``SET NX`` key
+  memory  per-process only
+"""
+from contextlib import asynccontextmanager
+from pathlib import Path
+import asyncio, fcntl, json, os, time
+
+
+class MemoryTokenStore:
+    def __init__(self):
+        self._data: dict[str, tuple[str, float]] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    async def load(self, key: str) -> tuple[str, float] | None:
+        return self._data.get(key)
+
+    async def save(self, key: str, token: str, expires: float):
+        self._data[key] = (token, expires)
+
+    @asynccontextmanager
+    async def lock(self, key: str):
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            yield
+
+
+class FileTokenStore:
+    def __init__(self, path: str | Path | None = None):
+        self.path = Path(path or os.getenv("ZOHO_TOKEN_CACHE", ".zoho-token.json"))
+
+    def _read(self) -> dict:
+        try:
+            return json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, key: str, token: str, expires: float):
+        data = self._read()
+        data[key] = [token, expires]
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
+
+    async def load(self, key: str) -> tuple[str, float] | None:
+        rec = (await asyncio.to_thread(self._read)).get(key)
+        return (rec[0], float(rec[1])) if rec else None
+
+    async def save(self, key: str, token: str, expires: float):
+        await asyncio.to_thread(self._write, key, token, expires)
+
+    @asynccontextmanager
+    async def lock(self, key: str):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path.with_name(self.path.name + ".lock"), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            await asyncio.to_thread(fcntl.flock, fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+
+class RedisTokenStore:
+    def __init__(self, url: str | None = None, prefix: str = "trustiva:zoho:token"):
+        import redis.asyncio
+
+        self.r = redis.asyncio.Redis.from_url(url or os.getenv("REDIS_URL", "redis://127.0.0.1:6379/0"))
+        self.prefix = prefix
+
+    async def load(self, key: str) -> tuple[str, float] | None:
+        raw = await self.r.get(f"{self.prefix}:{key}")
+        if not raw:
+            return None
+        token, expires = json.loads(raw)
+        return token, float(expires)
+
+    async def save(self, key: str, token: str, expires: float):
+        ttl = max(int(expires - time.time()), 1)
+        await self.r.set(f"{self.prefix}:{key}", json.dumps([token, expires]), ex=ttl)
+
+    @asynccontextmanager
+    async def lock(self, key: str):
+        async with self.r.lock(f"{self.prefix}:{key}:lock", timeout=30, blocking_timeout=30):
+            yield
+
+
+def token_store():
+    kind = os.getenv("ZOHO_TOKEN_STORE", "file").lower()
+    if kind == "redis":
+        return RedisTokenStore()
+    if kind in ("memory", "none"):
+        return MemoryTokenStore()
+    return FileTokenStore()
@@ -0,0 +1,91 @@
+import hashlib, os, subprocess, sys
+from pathlib import Path
+
+import services.hashing as hashing
+from services.hashing import DigestCache, file_digests, tree_digest
+
+
+def legacy_sha256_path(p: Path) -> str:
+    # The original scripts/hash_directory.py algorithm, kept as the reference
+    h = hashlib.sha256()
+    if p.is_file():
+        with p.open('rb') as f:
+            for chunk in iter(lambda: f.read(8192), b''):
+                h.update(chunk)
+        return h.hexdigest()
+    for fp in sorted([x for x in p.rglob('*') if x.is_file()]):
+        h.update(fp.relative_to(p).as_posix().encode())
+        with fp.open('rb') as f:
+            for chunk in iter(lambda: f.read(8192), b''):
+                h.update(chunk)
+    return h.hexdigest()
+
+
+def _tree(root: Path):
+    (root / "a").mkdir(parents=True)
+    (root / "a" / "b.txt").write_bytes(b"bee")
+    (root / "a-c.txt").write_bytes(b"path-vs-string ordering")
+    (root / "empty").write_bytes(b"")
+    (root / "big.bin").write_bytes(os.urandom(300_000))
+    (root / "z" / "deep").mkdir(parents=True)
+    (root / "z" / "deep" / "index.html").write_text("<html></html>")
+
+
+def _age(root: Path):
+    # push mtimes out of the racy window so the cache may trust them
+    old = 1_600_000_000
+    for fp in root.rglob("*"):
+        os.utime(fp, (old, old))
+
+
+def test_digest_matches_legacy_algorithm(tmp_path, monkeypatch):
+    root = tmp_path / "dist"
+    _tree(root)
+    expected = legacy_sha256_path(root)
+    assert tree_digest(root) == expected
+    # tiny prefetch window and streamed "large" files must not change the result
+    monkeypatch.setattr(hashing, "LARGE_FILE", 1000)
+    monkeypatch.setattr(hashing, "PREFETCH_BYTES", 10)
+    assert tree_digest(root, workers=3) == expected
+    assert tree_digest(root / "big.bin") == legacy_sha256_path(root / "big.bin")
+
+
+def test_cache_skips_unchanged_files(tmp_path, monkeypatch):
+    root = tmp_path / "dist"
+    _tree(root)
+    _age(root)
+    cache_path = tmp_path / "cache.json"
+    cache = DigestCache(cache_path)
+    first = tree_digest(root, cache=cache)
+    digests = file_digests(root, cache=cache)
+    cache.save()
+
+    reads = []
+    monkeypatch.setattr(hashing, "_load", lambda fp, size: reads.append(fp))
+    monkeypatch.setattr(hashing, "sha256_file", lambda fp: reads.append(fp) or "x")
+    cache = DigestCache(cache_path)
+    assert tree_digest(root, cache=cache) == first
+    assert file_digests(root, cache=cache) == digests
+    assert reads == []
+    monkeypatch.undo()
+
+    # one changed file: only it is re-read for per-file digests
+    (root / "a" / "b.txt").write_bytes(b"changed")
+    _age(root)
+    os.utime(root / "a" / "b.txt", ns=(1_700_000_000_000_000_000,) * 2)
+    seen = []
+    real = hashing.sha256_file
+    monkeypatch.setattr(hashing, "sha256_file", lambda fp: seen.append(fp.name) or real(fp))
+    assert file_digests(root, cache=cache)["a/b.txt"] == hashlib.sha256(b"changed").hexdigest()
+    assert seen == ["b.txt"]
+    assert tree_digest(root, cache=cache) == legacy_sha256_path(root)
+
+
+def test_cli_output_unchanged(tmp_path):
+    root = tmp_path / "dist"
+    _tree(root)
+    script = Path(__file__).resolve().parents[1] / "scripts" / "hash_directory.py"
+    out = subprocess.check_output(
+        [sys.executable, str(script), str(root), "--cache", str(tmp_path / "c.json")], text=True
+    )
+    assert out.strip() == legacy_sha256_path(root)
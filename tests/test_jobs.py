@@ -0,0 +1,224 @@
+import asyncio, json, os, threading, time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from services.jobs import get_queue, open_queue
+
+
+@pytest.fixture(params=["sqlite", "spool"])
+def queue(request, tmp_path):
+    url = f"sqlite:///{tmp_path}/jobs.db" if request.param == "sqlite" else f"spool:///{tmp_path}/queue"
+    q = open_queue(url)
+    yield q
+    q.close()
+
+
+def _job(i):
+    return {"type": "send_mail", "job_id": f"mail-{i:04d}", "data": {"to": f"u{i}@example.com"}}
+
+
+def test_fifo_lease_ack_fail(queue):
+    for i in range(3):
+        queue.enqueue(_job(i))
+    a, b = queue.dequeue(), queue.dequeue()
+    assert (a.id, b.id) == ("mail-0000", "mail-0001")
+    assert a.payload == _job(0) and a.type == "send_mail"
+    assert queue.counts()["pending"] == 1 and queue.counts()["leased"] == 2
+    assert queue.ack(a, {"status": "sent"})
+    assert queue.fail(b, "boom")
+    assert queue.counts() == {"pending": 1, "leased": 0, "done": 1, "failed": 1}
+    assert queue.dequeue().id == "mail-0002"
+    assert queue.dequeue() is None
+
+
+def test_expired_lease_is_redelivered_and_stale_ack_rejected(queue, monkeypatch):
+    monkeypatch.setenv("JOB_LEASE_SECONDS", "0")  # spool reclaims on every dequeue
+    queue.enqueue(_job(0))
+    first = queue.dequeue(lease=0.05)
+    assert queue.dequeue(lease=30) is None
+    time.sleep(0.1)
+    second = queue.dequeue(lease=30)
+    assert second.id == first.id and second.lease != first.lease
+    assert not queue.ack(first, {"late": True})
+    assert queue.ack(second, {"ok": True})
+    assert queue.counts()["done"] == 1
+
+
+def test_concurrent_workers_never_share_a_job(queue):
+    for i in range(60):
+        queue.enqueue(_job(i))
+    seen, lock = [], threading.Lock()
+
+    def worker():
+        while (job := queue.dequeue()) is not None:
+            with lock:
+                seen.append(job.id)
+            queue.ack(job, {})
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(seen) == [f"mail-{i:04d}" for i in range(60)]
+
+
+def test_sqlite_fails_job_after_max_attempts(tmp_path, monkeypatch):
+    monkeypatch.setenv("JOB_MAX_ATTEMPTS", "2")
+    q = open_queue(f"sqlite:///{tmp_path}/jobs.db")
+    q.enqueue(_job(0))
+    for _ in range(2):
+        assert q.dequeue(lease=0) is not None
+        time.sleep(0.01)
+    assert q.dequeue(lease=0) is None
+    assert q.counts()["failed"] == 1
+
+
+def test_api_enqueues_and_worker_processes(tmp_path, monkeypatch):
+    from services.api.main import app
+    from services.workers import zoho_worker
+
+    monkeypatch.setenv("JOB_QUEUE_URL", f"sqlite:///{tmp_path}/jobs.db")
+    legacy = tmp_path / "pending"
+    legacy.mkdir()
+    (legacy / "bigin-1.json").write_text(json.dumps({"type": "upsert_contact", "job_id": "bigin-1",
+                                                     "data": {"email": "a@example.com"}}))
+
+    r = TestClient(app).post("/ops/zoho/send_mail", json={"to": "b@example.com", "subject": "hi", "text": "x"})
+    assert r.json()["queued"] is True
+
+    q = get_queue()
+    assert zoho_worker.import_legacy_spool(q, legacy) == 1 and not list(legacy.iterdir())
+    handled = []
+    pool = zoho_worker.WorkerPool(q, concurrency=1, buckets={},
+                                  handler=lambda job: handled.append(job["job_id"]) or {"status": "ok"})
+    asyncio.run(pool.run(until_idle=True))
+    assert handled == [r.json()["job_id"], "bigin-1"]
+    assert q.counts()["done"] == 2
+
+
+def test_idle_worker_wakes_on_enqueue(queue):
+    assert queue.wait(5) is True  # sets up the notification channel
+    assert queue.wait(0.05) is False  # idle: nothing happens until the timeout
+    woke = []
+
+    def worker():
+        t0 = time.monotonic()
+        assert queue.wait(10)
+        woke.append(time.monotonic() - t0)
+
+    t = threading.Thread(target=worker)
+    t.start()
+    time.sleep(0.1)
+    queue.enqueue(_job(0))
+    t.join(5)
+    assert woke and woke[0] < 2
+    assert queue.dequeue().id == "mail-0000"
+
+
+def test_wait_ends_at_next_lease_expiry(queue, monkeypatch):
+    monkeypatch.setenv("JOB_LEASE_SECONDS", "0")
+    queue.enqueue(_job(0))
+    queue.wait()
+    job = queue.dequeue(lease=0.2)
+    t0 = time.monotonic()
+    queue.wait(10)
+    assert time.monotonic() - t0 < 2
+    assert queue.dequeue().id == job.id
+
+
+def test_idempotency_key_returns_existing_job(queue, monkeypatch):
+    first = queue.enqueue(_job(1) | {"key": "k1"})
+    assert queue.enqueue(_job(2) | {"key": "k1"}) == first
+    assert queue.enqueue(_job(3) | {"key": "k2"}) == "mail-0003"
+    job = queue.dequeue()
+    queue.fail(job, "boom")
+    assert queue.enqueue(_job(4) | {"key": "k1"}) == "mail-0004"  # failed jobs may be resubmitted
+    monkeypatch.setenv("JOB_DEDUPE_WINDOW", "0")
+    assert queue.enqueue(_job(5) | {"key": "k2"}) == "mail-0005"
+    assert queue.counts()["pending"] == 3
+    if hasattr(queue, "keys"):  # spool key files outlive their window only until compaction
+        monkeypatch.setenv("JOB_DEDUPE_WINDOW", "600")
+        old = time.time() - 3600
+        for p in queue.keys.iterdir():
+            os.utime(p, (old, old))
+        queue.enqueue(_job(6) | {"key": "k3"})
+        queue.compact()
+        assert [p.read_text() for p in queue.keys.iterdir()] == ["mail-0006"]
+
+
+def test_api_dedupes_retries_and_worker_merges_upserts(tmp_path, monkeypatch):
+    from services.api.main import app
+    from services.workers import zoho_worker
+
+    monkeypatch.setenv("JOB_QUEUE_URL", f"sqlite:///{tmp_path}/jobs.db")
+    client = TestClient(app)
+    mail = {"to": "b@example.com", "subject": "hi", "text": "x"}
+    a = client.post("/ops/zoho/send_mail", json=mail).json()
+    b = client.post("/ops/zoho/send_mail", json=mail).json()
+    c = client.post("/ops/zoho/send_mail", json=mail, headers={"Idempotency-Key": "n8n-42"}).json()
+    d = client.post("/ops/zoho/send_mail", json=mail | {"text": "y"}, headers={"Idempotency-Key": "n8n-42"}).json()
+    assert b == {"queued": True, "job_id": a["job_id"], "duplicate": True}
+    assert c["job_id"] != a["job_id"] and d["job_id"] == c["job_id"]
+
+    ups = [{"email": "A@example.com", "first_name": "Ann", "tags": ["x"]},
+           {"email": "a@example.com", "company": "Acme", "tags": ["y"]},
+           {"email": "z@example.com"}]
+    ids = [client.post("/ops/zoho/upsert_contact", json=u).json()["job_id"] for u in ups]
+
+    q = get_queue()
+    handled = []
+    pool = zoho_worker.WorkerPool(q, concurrency=1, buckets={}, handler=lambda job: handled.append(job) or {"status": "ok"})
+    asyncio.run(pool.run(until_idle=True))
+    upserts = [h for h in handled if h["type"] == "upsert_contact"]
+    assert len(handled) == 4 and len(upserts) == 2
+    assert upserts[0]["job_id"] == ids[0] and upserts[0]["data"] == {
+        "email": "a@example.com", "first_name": "Ann", "company": "Acme", "tags": ["x", "y"]}
+    assert q.counts()["done"] == 5
+
+
+def test_status_lookup_listing_and_compaction(queue):
+    import gzip
+
+    for i in range(5):
+        queue.enqueue(_job(i))
+    done, failed, leased = queue.dequeue(), queue.dequeue(), queue.dequeue()
+    queue.ack(done, {"status": "sent"})
+    queue.fail(failed, "boom")
+
+    assert queue.get("mail-0000")["result"] == {"status": "sent"}
+    assert queue.get("mail-0001")["state"] == "failed" and queue.get("mail-0001")["error"] == "boom"
+    assert queue.get("mail-0002")["lease_until"] == pytest.approx(leased.lease_until, abs=1e-3)
+    assert queue.get("mail-0004")["state"] == "pending" and queue.get("nope") is None
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = queue.list_jobs(limit=2, cursor=cursor)
+        seen += [r["id"] for r in page]
+        if cursor is None:
+            break
+    assert sorted(seen) == [f"mail-{i:04d}" for i in range(5)]
+    assert [r["id"] for r in queue.list_jobs("pending")[0]] == ["mail-0004", "mail-0003"]
+
+    assert queue.compact(older_than=3600) == 0
+    assert queue.compact(older_than=-1) == 2
+    assert queue.counts()["done"] == queue.counts()["failed"] == 0
+    (archived,) = queue.archive.iterdir()
+    with gzip.open(archived, "rt") as f:
+        assert {json.loads(line)["id"] for line in f} == {"mail-0000", "mail-0001"}
+    if hasattr(queue, "_db"):  # the SQLite index remembers where compacted jobs went
+        assert queue.get("mail-0000") == {"id": "mail-0000", "state": "done", "archived": archived.name}
+
+
+def test_job_status_endpoints(tmp_path, monkeypatch):
+    from services.api.main import app
+
+    monkeypatch.setenv("JOB_QUEUE_URL", f"sqlite:///{tmp_path}/jobs.db")
+    client = TestClient(app)
+    job_id = client.post("/ops/zoho/send_mail", json={"to": "b@example.com", "subject": "hi", "text": "x"}).json()["job_id"]
+    assert client.get(f"/ops/jobs/{job_id}").json()["state"] == "pending"
+    assert client.get("/ops/jobs/unknown").status_code == 404
+    assert client.get("/ops/jobs", params={"state": "bogus"}).status_code == 400
+    assert client.get("/ops/jobs", params={"state": "pending"}).json() == {
+        "jobs": [client.get(f"/ops/jobs/{job_id}").json()], "next": None}
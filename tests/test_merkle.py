@@ -0,0 +1,66 @@
+import hashlib, json, subprocess, sys
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from services.api.main import app as ops
+from services.merkle import MerkleTree, merkle_root, verify_proof, write_tree
+
+
+def _digests(n):
+    return {f"assets/f{i:03}.txt": hashlib.sha256(str(i).encode()).hexdigest() for i in range(n)}
+
+
+def test_every_leaf_proves_for_odd_and_even_trees(tmp_path):
+    for n in (1, 2, 5, 8, 13):
+        digests = _digests(n)
+        root = write_tree(tmp_path / f"{n}.tmk", digests)
+        assert root == merkle_root(digests)
+        tree = MerkleTree(tmp_path / f"{n}.tmk")
+        assert tree.root == root
+        for rel, sha in digests.items():
+            p = tree.proof(rel)
+            assert p["file_sha256"] == sha
+            assert len(p["proof"]) <= max(1, (n - 1).bit_length())
+            assert verify_proof(rel, sha, p["proof"], root)
+            assert not verify_proof(rel, hashlib.sha256(b"tampered").hexdigest(), p["proof"], root)
+
+
+def test_cli_and_proof_endpoint(tmp_path, monkeypatch):
+    dist = tmp_path / "dist"
+    (dist / "css").mkdir(parents=True)
+    (dist / "index.html").write_text("<html>hi</html>")
+    (dist / "css" / "site.css").write_text("body{}")
+    (dist / "robots.txt").write_text("User-agent: *")
+    mdir = tmp_path / "merkle"
+    script = Path(__file__).resolve().parents[1] / "scripts" / "hash_directory.py"
+    root = subprocess.check_output(
+        [sys.executable, str(script), str(dist), "--merkle", "--no-cache"],
+        text=True, env={"MERKLE_DIR": str(mdir), "PATH": ""},
+    ).strip()
+    assert (mdir / f"{root}.tmk").exists()
+
+    reg = tmp_path / "reg.ndjson"
+    reg.write_text(json.dumps({"cid": "QmSite", "merkle": root}) + "\n")
+    monkeypatch.setenv("REGISTRY_PATH", str(reg))
+    monkeypatch.setenv("MERKLE_DIR", str(mdir))
+    client = TestClient(ops)
+    r = client.get("/registry/proof", params={"cid": "QmSite", "path": "css/site.css"})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["root"] == root and body["cid"] == "QmSite"
+    assert body["file_sha256"] == hashlib.sha256(b"body{}").hexdigest()
+    assert verify_proof("css/site.css", body["file_sha256"], body["proof"], root)
+    assert client.get("/registry/proof", params={"path": "missing.txt"}).status_code == 404
+
+    # a prefixed root still resolves; anything that is not a hex digest never reaches the filesystem
+    reg.write_text(json.dumps({"cid": "QmSite", "merkle": "0x" + root}) + "\n"
+                   + json.dumps({"cid": "QmBad", "merkle": "../" * 21 + "x"}) + "\n")
+    assert client.get("/registry/proof", params={"cid": "QmSite", "path": "css/site.css"}).status_code == 200
+    assert client.get("/registry/proof", params={"cid": "QmBad", "path": "css/site.css"}).status_code == 404
+
+    empty = tmp_path / "empty"
+    empty.mkdir()
+    res = subprocess.run([sys.executable, str(script), str(empty), "--merkle", "--no-cache"],
+                         capture_output=True, text=True, env={"MERKLE_DIR": str(mdir), "PATH": ""})
+    assert res.returncode == 2 and "Traceback" not in res.stderr and "empty directory" in res.stderr
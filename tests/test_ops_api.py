@@ -1,7 +1,22 @@
 from fastapi.testclient import TestClient
+import pytest
 import types
 
 from services.api.main import app as ops
+from services.api.pool import http_pool
+from services.api.verify_cache import verify_cache
+
+
+@pytest.fixture(autouse=True)
+def _fresh_verify_cache():
+    verify_cache.clear()
+    yield
+    verify_cache.clear()
+
+
+def _use_client(monkeypatch, client):
+    # Route the shared Ops API pool through a dummy client
+    monkeypatch.setattr(http_pool, "client", lambda: client)
 
 
 def test_registry_empty_ok(tmp_path, monkeypatch):
@@ -13,9 +28,7 @@ def test_registry_empty_ok(tmp_path, monkeypatch):
 
 
 def test_verify_cid_mocks_head(monkeypatch):
-    # monkeypatch httpx AsyncClient.head to return a fake 200
-    import httpx
-
+    # monkeypatch the pooled client's head to return a fake 200
     class DummyResp:
         def __init__(self, status_code=200):
             self.status_code = status_code
@@ -27,10 +40,10 @@ def test_verify_cid_mocks_head(monkeypatch):
             return self
         async def __aexit__(self, *exc):
             return False
-        async def head(self, url):
+        async def head(self, url, **kw):
             return DummyResp(200)
 
-    monkeypatch.setattr(httpx, "AsyncClient", DummyClient)
+    _use_client(monkeypatch, DummyClient())
     client = TestClient(ops)
     r = client.get("/verify/cid/QmTest")
     assert r.status_code == 200
@@ -40,8 +53,6 @@ def test_verify_cid_mocks_head(monkeypatch):
 
 
 def test_verify_polygon_offline(monkeypatch):
-    import httpx
-
     class DummyResp:
         def __init__(self, status_code=200):
             self.status_code = status_code
@@ -55,10 +66,10 @@ def test_verify_polygon_offline(monkeypatch):
             return self
         async def __aexit__(self, *exc):
             return False
-        async def post(self, url, json):
+        async def post(self, url, json, **kw):
             return DummyResp(200)
 
-    monkeypatch.setattr(httpx, "AsyncClient", DummyClient)
+    _use_client(monkeypatch, DummyClient())
     client = TestClient(ops)
     r = client.get("/verify/polygon/0xabc")
     assert r.status_code == 200
@@ -82,8 +93,7 @@ def test_registry_resolve_latest(monkeypatch, tmp_path):
     p.write_text(json.dumps(entry) + "\n")
     monkeypatch.setenv("REGISTRY_PATH", str(p))
 
-    # Mock httpx head to succeed
-    import httpx
+    # Mock the pooled client's head to succeed
     class DummyResp:
         def __init__(self, status_code=200):
             self.status_code = status_code
@@ -91,9 +101,9 @@ def test_registry_resolve_latest(monkeypatch, tmp_path):
         def __init__(self, *a, **k): pass
         async def __aenter__(self): return self
         async def __aexit__(self, *exc): return False
-        async def head(self, url): return DummyResp(200)
-        async def post(self, url, json): return DummyResp(200)
-    monkeypatch.setattr(httpx, "AsyncClient", DummyClient)
+        async def head(self, url, **kw): return DummyResp(200)
+        async def post(self, url, json, **kw): return DummyResp(200)
+    _use_client(monkeypatch, DummyClient())
 
     client = TestClient(ops)
     r = client.get("/registry/resolve")
@@ -104,21 +114,15 @@ def test_registry_resolve_latest(monkeypatch, tmp_path):
 
 
 def test_verify_xrpl_live_mock(monkeypatch):
-    # Mock asyncio.create_subprocess_exec to simulate Node script output
-    import asyncio as _asyncio
+    # Mock the shared XRPL client to simulate a validated tx
+    from services.api.xrpl_client import xrpl_client
+    calls = []
 
-    class DummyProc:
-        def __init__(self, rc=0, out=b'{"validated":true,"tx":"T123"}', err=b''):
-            self.returncode = rc
-            self._out = out
-            self._err = err
-        async def communicate(self):
-            return self._out, self._err
+    async def fake_verify(tx, wait=False):
+        calls.append(tx)
+        return {"validated": True, "ledger_index": 7, "result": "tesSUCCESS", "tx": tx}
 
-    async def fake_create_subprocess_exec(*a, **k):
-        return DummyProc()
-
-    monkeypatch.setattr(_asyncio, "create_subprocess_exec", fake_create_subprocess_exec)
+    monkeypatch.setattr(xrpl_client, "verify", fake_verify)
 
     client = TestClient(ops)
     r = client.get("/verify/xrpl/live/T123")
@@ -126,6 +130,31 @@ def test_verify_xrpl_live_mock(monkeypatch):
     body = r.json()
     assert body["validated"] is True
     assert body["tx"] == "T123"
+    # validated txs are final: the second call is served from the verify cache
+    client.get("/verify/xrpl/live/T123")
+    assert calls == ["T123"]
+
+
+def test_xrpl_wait_failures_return_error_shape():
+    import asyncio
+    from services.api.xrpl_client import XRPLClient, XRPLError
+
+    client = XRPLClient(url="ws://unused")
+
+    async def not_found(tx):
+        raise XRPLError("txnNotFound")
+
+    async def no_connect(again=False):
+        if not again:
+            client._subscribers += 1
+        raise ConnectionError("XRPL connect failed")
+
+    client.tx = not_found
+    client._subscribe = no_connect
+    out = asyncio.run(client.verify("T1", wait=True, timeout=1))
+    assert out == {"validated": False, "error": "XRPL connect failed", "tx": "T1"}
+    # the failed subscribe is still released, so the next waiter subscribes again
+    assert client._subscribers == 0
 
 
 def test_audit_pubkey_env(monkeypatch):
@@ -154,3 +183,217 @@ def test_post_aliases_and_swarm_attest(monkeypatch):
     assert r3.status_code == 200
     body = r3.json()
     assert "quorum" in body
+
+
+def test_http_pool_lifespan_and_per_host_limit(monkeypatch):
+    import asyncio
+    from services.api.pool import HttpPool
+
+    with TestClient(ops) as client:
+        assert http_pool._client is not None
+        assert client.get("/healthz").status_code == 200
+    assert http_pool._client is None
+
+    monkeypatch.setenv("OPS_HTTP_PER_HOST", "2")
+    pool = HttpPool()
+    active = peak = 0
+
+    class SlowClient:
+        async def head(self, url, **kw):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return url
+
+    async def run():
+        monkeypatch.setattr(pool, "client", lambda: SlowClient())
+        await asyncio.gather(*[pool.head(f"http://gw.local/ipfs/{i}") for i in range(6)])
+
+    asyncio.run(run())
+    assert peak == 2
+
+
+def test_http_pool_closes_the_client_of_a_previous_loop(monkeypatch):
+    import asyncio
+    from services.api.pool import HttpPool
+
+    monkeypatch.setenv("OPS_HTTP2", "false")
+    pool = HttpPool()
+
+    async def make():
+        return pool.client()
+
+    first = asyncio.run(make())
+
+    async def again():
+        client = pool.client()
+        await asyncio.sleep(0.01)  # let the retired client close
+        await pool.aclose()
+        return client
+
+    assert asyncio.run(again()) is not first and first.is_closed
+
+    monkeypatch.setenv("OPS_HTTP2", "true")
+    assert HttpPool().http2 is True
+
+
+def test_embedded_swarm_calls_resolver_in_process(monkeypatch, tmp_path):
+    import json
+    from services.api.xrpl_client import xrpl_client
+
+    p = tmp_path / "reg.ndjson"
+    p.write_text(json.dumps({"cid": "QmS", "url": "http://gw/ipfs/QmS/", "sha256": "ab" * 32}) + "\n")
+    monkeypatch.setenv("REGISTRY_PATH", str(p))
+    monkeypatch.setenv("OPS_API_URL", "http://127.0.0.1:9")  # nothing listens: loopback HTTP would fail
+
+    class DummyClient:
+        async def head(self, url, **kw):
+            return types.SimpleNamespace(status_code=200)
+
+    _use_client(monkeypatch, DummyClient())
+
+    async def no_remote(*a, **k):
+        raise AssertionError("no XRPL tx in this entry")
+
+    monkeypatch.setattr(xrpl_client, "verify", no_remote)
+    body = TestClient(ops).post("/swarm/attest", json={"root": "0x01", "cid": "QmS"}).json()
+    votes = {v["name"]: v for v in body["votes"]}
+    assert votes["ProofAgent"]["confidence"] == 0.9
+    assert votes["XRPLAgent"]["details"] == {"note": "no-xrpl-tx"}
+
+
+def test_registry_resolve_checks_run_concurrently(monkeypatch, tmp_path):
+    import asyncio, json, time
+    import services.api.main as main
+
+    p = tmp_path / "reg.ndjson"
+    entry = {"cid": "QmC", "url": "http://gw/ipfs/QmC/", "polygon": "0xslow", "xrpl": "ABC"}
+    p.write_text(json.dumps(entry) + "\n")
+    monkeypatch.setenv("REGISTRY_PATH", str(p))
+    monkeypatch.setenv("RESOLVE_POLYGON_TIMEOUT", "0.2")
+
+    class DummyResp:
+        status_code = 200
+
+    class DummyClient:
+        async def head(self, url, **kw):
+            await asyncio.sleep(0.15)
+            return DummyResp()
+
+    async def slow_polygon(tx):
+        await asyncio.sleep(5)
+
+    _use_client(monkeypatch, DummyClient())
+    monkeypatch.setattr(main, "verify_polygon", slow_polygon)
+
+    client = TestClient(ops)
+    t0 = time.perf_counter()
+    r = client.get("/registry/resolve", params={"cid": "QmC"})
+    elapsed = time.perf_counter() - t0
+    assert r.status_code == 200
+    body = r.json()
+    assert elapsed < 1.0
+    assert body["gateway"]["ok"] is True
+    assert body["checks"]["gateway"]["status"] == "ok"
+    assert body["checks"]["polygon"]["status"] == "timeout"
+    assert body["polygon"] == {"tx": "0xslow"}
+    assert body["checks"]["xrpl"]["status"] == "ok"
+    assert "explorer" in body["xrpl"]
+
+
+def test_registry_resolve_batch_dedupes_remote_checks(monkeypatch, tmp_path):
+    import json
+    import services.api.main as main
+
+    p = tmp_path / "reg.ndjson"
+    entries = [
+        {"cid": "QmA", "url": "http://gw/ipfs/QmA/", "polygon": "0xshared"},
+        {"cid": "QmB", "url": "http://gw/ipfs/QmB/", "polygon": "0xshared"},
+        {"cid": "QmC", "url": "http://gw/ipfs/QmA/"},
+    ]
+    p.write_text("".join(json.dumps(e) + "\n" for e in entries))
+    monkeypatch.setenv("REGISTRY_PATH", str(p))
+
+    heads, polys = [], []
+
+    class DummyResp:
+        status_code = 200
+
+    class DummyClient:
+        async def head(self, url, **kw):
+            heads.append(url)
+            return DummyResp()
+
+    async def fake_polygon(tx):
+        polys.append(tx)
+        return {"tx": tx, "result": {"status": "0x1"}}
+
+    _use_client(monkeypatch, DummyClient())
+    monkeypatch.setattr(main, "verify_polygon", fake_polygon)
+
+    client = TestClient(ops)
+    r = client.post("/registry/resolve/batch", json={"cids": ["QmA", "QmB", "QmC", "QmA", "QmMissing"]})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(ln) for ln in r.text.splitlines()]
+    by_cid = {b["cid"]: b for b in lines}
+    assert set(by_cid) == {"QmA", "QmB", "QmC", "QmMissing"}
+    assert by_cid["QmMissing"]["error"]
+    assert by_cid["QmB"]["polygon"]["result"]["status"] == "0x1"
+    assert set(by_cid["QmA"]) == set(main._bundle(entries[0], {}))
+    assert sorted(heads) == ["http://gw/ipfs/QmA/", "http://gw/ipfs/QmB/"]
+    assert polys == ["0xshared"]
+
+
+def test_swarm_attest_batch_streams_per_root(monkeypatch, tmp_path):
+    import json
+
+    p = tmp_path / "reg.ndjson"
+    p.write_text("".join(json.dumps({"cid": c, "url": f"http://gw/ipfs/{c}/", "sha256": "ab" * 32}) + "\n"
+                         for c in ("QmA", "QmB")))
+    monkeypatch.setenv("REGISTRY_PATH", str(p))
+    heads = []
+
+    class DummyClient:
+        async def head(self, url, **kw):
+            heads.append(url)
+            return types.SimpleNamespace(status_code=200)
+
+    _use_client(monkeypatch, DummyClient())
+    items = [{"root": f"0x{i}", "cid": c} for i, c in enumerate(["QmA", "QmB", "QmA", "QmX"])]
+    r = TestClient(ops).post("/swarm/attest/batch", json={"items": items})
+    results = {res["index"]: res for res in map(json.loads, r.text.splitlines())}
+
+    assert sorted(results) == [0, 1, 2, 3] and sorted(heads) == ["http://gw/ipfs/QmA/", "http://gw/ipfs/QmB/"]
+    proof = {i: next(v for v in res["votes"] if v["name"] == "ProofAgent") for i, res in results.items()}
+    assert proof[2]["confidence"] == 0.9 and proof[3]["confidence"] == 0.0
+
+
+def test_swarm_attest_batch_relays_without_ai_swarm(monkeypatch):
+    import json, sys
+    import httpx
+
+    monkeypatch.setitem(sys.modules, "ai_swarm.orchestrator", None)  # as in the Ops API image
+    monkeypatch.setenv("SWARM_API_URL", "http://swarm:9100/")
+    seen = []
+
+    def handler(request):
+        seen.append((str(request.url), json.loads(request.content)))
+        body = "".join(json.dumps({"index": i, "root": it["root"], "passed": True}) + "\n"
+                       for i, it in enumerate(json.loads(request.content)["items"]))
+        return httpx.Response(200, content=body.encode(), headers={"Content-Type": "application/x-ndjson"})
+
+    _use_client(monkeypatch, httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    r = TestClient(ops).post("/swarm/attest/batch", json={"items": [{"root": "0xa"}, {"root": "0xb", "cid": "Qm"}]})
+    assert r.status_code == 200 and r.headers["content-type"].startswith("application/x-ndjson")
+    assert [res["root"] for res in map(json.loads, r.text.splitlines())] == ["0xa", "0xb"]
+    assert seen == [("http://swarm:9100/swarm/attest/batch",
+                     {"items": [{"root": "0xa", "cid": None}, {"root": "0xb", "cid": "Qm"}]})]
+
+    def down(request):
+        raise httpx.ConnectError("refused")
+
+    _use_client(monkeypatch, httpx.AsyncClient(transport=httpx.MockTransport(down)))
+    assert TestClient(ops).post("/swarm/attest/batch", json={"items": [{"root": "0xa"}]}).status_code == 502
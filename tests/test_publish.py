@@ -0,0 +1,330 @@
+import asyncio, json, threading
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import httpx
+import pytest
+
+from services import ipfs_publisher as pub
+
+
+class FakeIPFS(BaseHTTPRequestHandler):
+    """Minimal stand-in for Kubo's /api/v0/add."""
+
+    received = []
+    headers_seen = []
+
+    def log_message(self, *a):
+        pass
+
+    def _read_chunked(self) -> bytes:
+        body = b""
+        while True:
+            size = int(self.rfile.readline().strip(), 16)
+            if size == 0:
+                self.rfile.readline()
+                return body
+            body += self.rfile.read(size)
+            self.rfile.readline()
+
+    def do_POST(self):
+        FakeIPFS.headers_seen.append({k.lower(): v for k, v in self.headers.items()})
+        if self.headers.get("Transfer-Encoding") == "chunked":
+            body = self._read_chunked()
+        else:
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+        msg = BytesParser(policy=HTTP).parsebytes(
+            b"Content-Type: " + self.headers["Content-Type"].encode() + b"\r\n\r\n" + body
+        )
+        lines = []
+        for i, part in enumerate(msg.iter_parts()):
+            name = part.get_filename()
+            FakeIPFS.received.append((name, part.get_payload(decode=True)))
+            lines.append({"Name": name, "Hash": f"QmFile{i}"})
+        lines.append({"Name": "", "Hash": "QmRoot"})
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        self.wfile.write("".join(json.dumps(x) + "\n" for x in lines).encode())
+
+
+@pytest.fixture
+def fake_ipfs(monkeypatch):
+    FakeIPFS.received, FakeIPFS.headers_seen = [], []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeIPFS)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("IPFS_API", f"http://127.0.0.1:{server.server_address[1]}")
+    yield FakeIPFS
+    server.shutdown()
+
+
+def test_http_upload_streams_files_lazily(tmp_path, fake_ipfs, monkeypatch):
+    monkeypatch.setattr(pub, "CHUNK_BYTES", 1024)
+    dist = tmp_path / "dist"
+    (dist / "assets").mkdir(parents=True)
+    (dist / "index.html").write_text("<html>hi</html>")
+    (dist / "assets" / "big file.bin").write_bytes(b"x" * 10_000)
+
+    # at most one file is open at a time while the body is produced
+    opened, real_open = [], Path.open
+
+    def tracking_open(self, *a, **k):
+        fh = real_open(self, *a, **k)
+        opened.append(fh)
+        assert sum(not f.closed for f in opened) <= 1
+        return fh
+
+    async def run():
+        async with httpx.AsyncClient() as client:
+            return await pub.HttpIpfs(client).add_path(str(dist), progress)
+
+    events = []
+    progress = pub.Progress(str(dist), events.append, interval=0)
+    monkeypatch.setattr(Path, "open", tracking_open)
+    cid = asyncio.run(run())
+    monkeypatch.undo()
+
+    assert cid == "QmRoot"
+    assert fake_ipfs.headers_seen[0].get("transfer-encoding") == "chunked"
+    assert dict(fake_ipfs.received) == {
+        "assets/big%20file.bin": b"x" * 10_000,
+        "index.html": b"<html>hi</html>",
+    }
+    stats = progress.stats()
+    assert stats["files"] == 2 and stats["bytes"] == 10_000 + len("<html>hi</html>")
+    assert events[0]["phase"] == "uploading" and events[-1]["bytes"] == stats["bytes"]
+
+
+class FakeMfs:
+    """In-memory IPFS node: content-addressed blobs/dirs plus an MFS namespace."""
+
+    def __init__(self):
+        import hashlib
+        self._h = lambda b: "Qm" + hashlib.sha256(b).hexdigest()[:20]
+        self.objects = {}
+        self.mfs = {}
+        self.uploaded = []
+        self.pins = []
+
+    def _put(self, obj):
+        cid = self._h(json.dumps(obj, sort_keys=True).encode())
+        self.objects[cid] = obj
+        return cid
+
+    def _dir_cid(self, tree):
+        return self._put({k: (self._dir_cid(v) if isinstance(v, dict) else v) for k, v in tree.items()})
+
+    def _tree(self, cid):
+        obj = self.objects[cid]
+        if isinstance(obj, dict):
+            return {k: self._tree(v) if isinstance(self.objects[v], dict) else v for k, v in obj.items()}
+        return cid
+
+    def _walk(self, path, create=False):
+        node, parts = self.mfs, [p for p in path.split("/") if p]
+        for p in parts[:-1]:
+            node = node.setdefault(p, {}) if create else node[p]
+        return node, parts[-1]
+
+    async def add_blobs(self, files, progress=None):
+        self.uploaded += [rel for rel, _ in files]
+        return {rel: self._put(fp.read_bytes().decode()) for rel, fp in files}
+
+    async def add_tree(self, root, progress=None):
+        tree, cids = {}, {}
+        for fp in sorted(root.rglob("*")):
+            if fp.is_file():
+                rel = fp.relative_to(root).as_posix()
+                self.uploaded.append(rel)
+                cids[rel] = self._put(fp.read_bytes().decode())
+                node = tree
+                for part in rel.split("/")[:-1]:
+                    node = node.setdefault(part, {})
+                node[rel.split("/")[-1]] = cids[rel]
+        return self._dir_cid(tree), cids
+
+    async def files_cp(self, src, dst):
+        node, name = self._walk(dst, create=True)
+        node[name] = self._tree(src.split("/ipfs/")[1])
+
+    async def files_rm(self, path):
+        node, name = self._walk(path)
+        del node[name]
+
+    async def files_stat_hash(self, path):
+        node, name = self._walk(path)
+        return self._dir_cid(node[name])
+
+    async def pin(self, cid):
+        self.pins.append(cid)
+
+
+def test_delta_publish_uploads_only_changes(tmp_path, monkeypatch):
+    monkeypatch.setenv("IPFS_MANIFEST", str(tmp_path / "manifest.json"))
+    monkeypatch.setenv("HASH_CACHE_PATH", str(tmp_path / "hash-cache.json"))
+    dist = tmp_path / "dist"
+    (dist / "docs" / "old").mkdir(parents=True)
+    (dist / "index.html").write_text("v1")
+    (dist / "docs" / "a.md").write_text("a")
+    (dist / "docs" / "old" / "gone.md").write_text("bye")
+    (dist / "logo.svg").write_text("logo")
+
+    node = FakeMfs()
+    first, summary = asyncio.run(pub.publish_delta(str(dist), node, pub.Progress(str(dist))))
+    assert summary["mode"] == "full" and len(node.uploaded) == 4
+
+    (dist / "index.html").write_text("v2")
+    (dist / "docs" / "old" / "gone.md").unlink()
+    (dist / "docs" / "old").rmdir()
+    (dist / "copy.svg").write_text("logo")  # same content as logo.svg: reused, not uploaded
+    node.uploaded = []
+    second, summary = asyncio.run(pub.publish_delta(str(dist), node, pub.Progress(str(dist))))
+    assert node.uploaded == ["index.html"]
+    assert summary == {"mode": "delta", "uploaded": 1, "reused": 1, "removed": 1}
+    assert node.pins[-1] == second and node.mfs[".trustiva-publish"] == {}
+
+    # the rebuilt root equals what a full add of the same tree produces
+    full, _ = asyncio.run(FakeMfs().add_tree(dist.resolve()))
+    assert second == full != first
+
+    # a failed delta falls back to a full add, which is noted but not an error
+    async def broken(*a):
+        raise RuntimeError("mfs unavailable")
+
+    node.files_cp = broken
+    events = []
+    progress = pub.Progress(str(dist), callback=events.append)
+    third, summary = asyncio.run(pub.publish_delta(str(dist), node, progress))
+    progress.set_phase("done")
+    assert third == second and summary["mode"] == "full"
+    assert "error" not in events[-1] and "mfs unavailable" in events[-1]["note"]
+
+
+def test_cli_full_add_includes_dotfiles(tmp_path, monkeypatch):
+    monkeypatch.setenv("IPFS_MANIFEST", str(tmp_path / "manifest.json"))
+    monkeypatch.setenv("HASH_CACHE_PATH", str(tmp_path / "hash-cache.json"))
+    dist = tmp_path / "dist"
+    (dist / ".well-known").mkdir(parents=True)
+    (dist / "index.html").write_text("hi")
+    (dist / ".nojekyll").write_text("")
+    (dist / ".well-known" / "security.txt").write_text("Contact: x")
+
+    class FakeCli(pub.CliIpfs):
+        async def _run(self, *args):
+            # like `ipfs add -r`: hidden entries are skipped unless --hidden is given
+            root = Path(args[-1])
+            lines = [f"added Qm{i} {root.name}/{fp.relative_to(root).as_posix()}"
+                     for i, fp in enumerate(sorted(root.rglob("*")))
+                     if fp.is_file() and ("--hidden" in args or not any(
+                         part.startswith(".") for part in fp.relative_to(root).parts))]
+            return "\n".join(lines + [f"added QmRoot {root.name}"])
+
+    cid, summary = asyncio.run(pub.publish_delta(str(dist), FakeCli(), pub.Progress(str(dist))))
+    assert cid == "QmRoot" and summary["uploaded"] == 3
+    files = json.loads((tmp_path / "manifest.json").read_text())["trees"][str(dist.resolve())]["files"]
+    assert set(files) == {"index.html", ".nojekyll", ".well-known/security.txt"}
+
+    with pytest.raises(RuntimeError, match="no CID for 1 file"):
+        pub._record(dist, "QmRoot", {"a": "1", "b": "2"}, {"a": "Qm1"})
+
+
+def test_delta_fallback_does_not_double_count_progress(tmp_path, monkeypatch):
+    monkeypatch.setenv("IPFS_MANIFEST", str(tmp_path / "manifest.json"))
+    monkeypatch.setenv("HASH_CACHE_PATH", str(tmp_path / "hash-cache.json"))
+    dist = tmp_path / "dist"
+    dist.mkdir()
+    (dist / "a.txt").write_text("a")
+    (dist / "b.txt").write_text("b")
+
+    class CountingMfs(FakeMfs):
+        async def add_blobs(self, files, progress=None):
+            progress.begin_upload(files)
+            return await super().add_blobs(files, progress)
+
+        async def add_tree(self, root, progress=None):
+            progress.begin_upload(pub.collect(str(root)))
+            return await super().add_tree(root, progress)
+
+    node = CountingMfs()
+    asyncio.run(pub.publish_delta(str(dist), node, pub.Progress(str(dist))))
+
+    async def broken(*a):
+        raise RuntimeError("mfs unavailable")
+
+    (dist / "a.txt").write_text("a2")
+    node.files_cp = broken
+    progress = pub.Progress(str(dist))
+    asyncio.run(pub.publish_delta(str(dist), node, progress))
+    assert progress.files == 2 and progress.total == 3
+
+
+def test_publishes_are_bounded_and_report_progress(tmp_path, monkeypatch):
+    monkeypatch.setenv("IPFS_MANIFEST", str(tmp_path / "manifest.json"))
+    monkeypatch.setenv("HASH_CACHE_PATH", str(tmp_path / "hash-cache.json"))
+    running, peak = 0, 0
+
+    class SlowIpfs(FakeMfs):
+        async def add_tree(self, root, progress=None):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.05)
+            running -= 1
+            return await super().add_tree(root, progress)
+
+    dirs = []
+    for i in range(5):
+        d = tmp_path / f"site{i}"
+        d.mkdir()
+        (d / "index.html").write_text(f"site {i}")
+        dirs.append(d)
+
+    events = []
+    publisher = pub.IpfsPublisher(max_concurrency=2)
+
+    async def run():
+        node = SlowIpfs()
+        return await asyncio.gather(*[publisher.publish(str(d), on_progress=events.append, ipfs=node) for d in dirs])
+
+    outs = asyncio.run(run())
+    assert peak == 2 and not publisher.active()
+    assert [o["path"] for o in outs] == [str(d) for d in dirs]
+    assert all(o["delta"]["mode"] == "full" and o["cid"].startswith("Qm") for o in outs)
+    assert json.loads((dirs[0] / "publish.json").read_text())["cid"] == outs[0]["cid"]
+    phases = [e["phase"] for e in events if e["path"] == str(dirs[0])]
+    assert phases[0] == "queued" and phases[-1] == "done" and "hashing" in phases
+
+
+def test_orchestrator_publishes_in_process(monkeypatch):
+    from services.orchestrator import main as orch
+
+    async def fake_publish(path, on_progress=None, **kw):
+        on_progress({"id": "x", "phase": "done", "done_files": 1, "files": 1, "bytes": 1, "total_bytes": 1})
+        if path == "missing":
+            raise FileNotFoundError(path)
+        return {"cid": "QmRoot", "gateway": "http://gw", "path": path, "time": 0, "delta": {"mode": "full"}}
+
+    monkeypatch.setattr(orch.publisher, "publish", fake_publish)
+    assert asyncio.run(orch.publish_ipfs("dist")) == {
+        "cid": "QmRoot", "gateway": "http://gw", "path": "dist", "delta": {"mode": "full"}
+    }
+    assert asyncio.run(orch.publish_ipfs("missing")) == {"error": "missing"}
+
+
+def test_publisher_closes_the_client_of_a_previous_loop():
+    publisher = pub.IpfsPublisher()
+
+    async def make():
+        return publisher.client()
+
+    first = asyncio.run(make())
+
+    async def again():
+        client = publisher.client()
+        await asyncio.sleep(0.01)
+        await client.aclose()
+        return client
+
+    assert asyncio.run(again()) is not first and first.is_closed
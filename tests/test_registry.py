@@ -0,0 +1,125 @@
+import json, os
+
+from services.api.registry import RegistryIndex
+
+
+def _write(p, entries, mode="w"):
+    with p.open(mode) as f:
+        for e in entries:
+            f.write(json.dumps(e) + "\n")
+
+
+def test_tail_reads_last_entries_across_blocks(tmp_path, monkeypatch):
+    import services.api.registry as registry
+    monkeypatch.setattr(registry, "BLOCK", 64)
+    p = tmp_path / "reg.ndjson"
+    _write(p, [{"time": i, "cid": f"Qm{i}"} for i in range(50)])
+    with p.open("a") as f:
+        f.write("not json\n")
+    idx = RegistryIndex(p)
+    assert [e["time"] for e in idx.tail(3)] == [47, 48, 49]
+    assert len(idx.tail(0)) == 50
+    assert len(idx.tail(500)) == 50
+    assert idx.latest()["cid"] == "Qm49"
+
+
+def test_lookup_uses_persistent_index_and_appends(tmp_path):
+    p = tmp_path / "reg.ndjson"
+    _write(p, [{"cid": "QmA", "time": 1}, {"cid": "QmB", "time": 2}, {"cid": "QmA", "time": 3}])
+    idx = RegistryIndex(p)
+    assert idx.lookup("QmA")["time"] == 3
+    assert idx.lookup("QmMissing") is None
+    assert idx.index_path.exists()
+
+    _write(p, [{"cid": "QmC", "time": 4}], mode="a")
+    assert idx.lookup("QmC")["time"] == 4
+
+    # A fresh process reloads the sidecar instead of rescanning
+    again = RegistryIndex(p)
+    again._load()
+    assert again._offsets == idx._offsets
+    assert again.lookup("QmB")["time"] == 2
+
+
+def test_small_registry_appends_extend_the_index(tmp_path):
+    p = tmp_path / "reg.ndjson"
+    _write(p, [{"cid": "Qm0", "time": 0}])
+    idx = RegistryIndex(p)
+    assert idx.lookup("Qm0")["time"] == 0
+    resets = []
+    real = idx._reset
+    idx._reset = lambda: resets.append(1) or real()
+    for i in range(1, 6):  # still well under HEAD_BYTES
+        _write(p, [{"cid": f"Qm{i}", "time": i}], mode="a")
+        assert idx.lookup(f"Qm{i}")["time"] == i
+    assert resets == []
+
+
+def test_lookup_survives_rotation(tmp_path):
+    p = tmp_path / "reg.ndjson"
+    _write(p, [{"cid": "QmOld", "time": 1}, {"cid": "QmKeep", "time": 2}])
+    idx = RegistryIndex(p)
+    assert idx.lookup("QmOld")["time"] == 1
+
+    rotated = tmp_path / "reg.ndjson.new"
+    _write(rotated, [{"cid": "QmKeep", "time": 9}])
+    os.replace(rotated, p)
+    assert idx.lookup("QmOld") is None
+    assert idx.lookup("QmKeep")["time"] == 9
+
+    # truncate-and-rewrite in place (same inode, different head)
+    _write(p, [{"cid": "QmNew", "time": 10}, {"cid": "QmNew2", "time": 11}])
+    assert idx.lookup("QmKeep") is None
+    assert idx.lookup("QmNew2")["time"] == 11
+
+
+def test_cache_serves_unchanged_file_from_memory(tmp_path):
+    from services.api.registry import RegistryCache
+    p = tmp_path / "reg.ndjson"
+    _write(p, [{"cid": f"Qm{i}", "time": i} for i in range(10)])
+    cache = RegistryCache(p, max_entries=4)
+    assert [e["time"] for e in cache.tail(3)] == [7, 8, 9]
+    assert cache.lookup("Qm9")["time"] == 9
+    assert cache.stats()["hits"] == 2
+
+    # larger than the budget: falls back to the index reader
+    assert len(cache.tail(8)) == 8
+    assert cache.stats()["misses"] == 1
+
+    # cold CID goes through the index once, then stays cached
+    assert cache.lookup("Qm1")["time"] == 1
+    assert cache.lookup("Qm1")["time"] == 1
+    assert cache.lookup("QmNope") is None
+    assert cache.lookup("QmNope") is None
+    stats = cache.stats()
+    assert stats["misses"] == 3 and stats["hits"] == 4
+    assert stats["entries"] <= 4 and stats["evictions"] >= 1
+
+    # unknown CIDs are remembered within the same budget
+    for i in range(20):
+        assert cache.lookup(f"QmMissing{i}") is None
+    assert len(cache._absent) == 4 and "QmMissing19" in cache._absent
+
+
+def test_cache_parses_only_appended_tail(tmp_path):
+    from services.api.registry import RegistryCache
+    p = tmp_path / "reg.ndjson"
+    _write(p, [{"cid": "QmA", "time": 1}])
+    cache = RegistryCache(p, max_entries=8)
+    assert cache.latest()["cid"] == "QmA"
+    assert cache.lookup("QmB") is None
+
+    _write(p, [{"cid": "QmB", "time": 2}, {"cid": "QmA", "time": 3}], mode="a")
+    assert cache.lookup("QmB")["time"] == 2
+    assert cache.lookup("QmA")["time"] == 3
+    assert [e["time"] for e in cache.tail(10)] == [1, 2, 3]
+    stats = cache.stats()
+    assert stats["reloads"] == 1 and stats["appends"] == 2
+
+    # a rotated file drops the cache
+    rotated = tmp_path / "new.ndjson"
+    _write(rotated, [{"cid": "QmZ", "time": 9}])
+    os.replace(rotated, p)
+    assert cache.lookup("QmA") is None
+    assert cache.latest()["cid"] == "QmZ"
+    assert cache.stats()["reloads"] == 2
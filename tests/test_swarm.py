@@ -0,0 +1,259 @@
+import asyncio, json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from ai_swarm import orchestrator as swarm
+
+
+class FakeTransport:
+    def __init__(self):
+        self.calls = []
+
+    async def resolve(self, cid):
+        self.calls.append(("resolve", cid))
+        await asyncio.sleep(0.01)
+        return 200, {"sha256": "ab" * 32, "xrpl": {"tx": "T1"}}
+
+    async def xrpl_live(self, tx):
+        self.calls.append(("xrpl_live", tx))
+        return 200, {"validated": True}
+
+
+def test_attest_round_resolves_the_bundle_once(monkeypatch):
+    fake = FakeTransport()
+    monkeypatch.setattr(swarm, "transport", fake)
+    body = TestClient(swarm.app).post("/swarm/attest", json={"root": "0x01", "cid": "bafy"}).json()
+
+    assert fake.calls == [("resolve", "bafy"), ("xrpl_live", "T1")]
+    votes = {v["name"]: v["confidence"] for v in body["votes"]}
+    assert votes["ProofAgent"] == 0.9 and votes["XRPLAgent"] == 0.9
+
+
+def test_http_transport_reuses_one_client(monkeypatch):
+    seen = []
+
+    def handler(request):
+        seen.append(str(request.url))
+        return httpx.Response(200, json={"validated": True})
+
+    real = httpx.AsyncClient
+    clients = []
+    monkeypatch.setattr(swarm.httpx, "AsyncClient",
+                        lambda **kw: clients.append(1) or real(transport=httpx.MockTransport(handler), **kw))
+
+    async def run():
+        t = swarm.HttpTransport("http://ops:9000")
+        out = [await t.resolve("bafy"), await t.xrpl_live("T1"), await t.resolve(None)]
+        await t.aclose()
+        return out
+
+    assert [s for s, _ in asyncio.run(run())] == [200, 200, 200]
+    assert len(clients) == 1 and seen == [
+        "http://ops:9000/registry/resolve?cid=bafy", "http://ops:9000/verify/xrpl/live/T1",
+        "http://ops:9000/registry/resolve"]
+
+
+def test_http_transport_closes_the_client_of_a_previous_loop():
+    t = swarm.HttpTransport("http://ops:9000")
+
+    async def make():
+        return t._http()
+
+    first = asyncio.run(make())
+
+    async def again():
+        client = t._http()
+        await asyncio.sleep(0.01)
+        await t.aclose()
+        return client
+
+    assert asyncio.run(again()) is not first and first.is_closed
+
+
+def test_context_single_flight_shares_failures():
+    runs = []
+
+    @swarm.fact("flaky")
+    async def flaky(ctx):
+        runs.append(ctx.root)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("down")
+
+    @swarm.needs("flaky")
+    async def agent(root, cid, ctx=None):
+        try:
+            await ctx.get("flaky")
+        except RuntimeError as e:
+            return swarm.AgentResult(name="A", confidence=0.0, details={"error": str(e)})
+
+    try:
+        results = asyncio.run(swarm.run_agents("r", None, [agent] * 5))
+    finally:
+        del swarm.FACTS["flaky"]
+    assert runs == ["r"] and {r.details["error"] for r in results} == {"down"}
+
+
+def _voter(name, confidence, delay=0.0, weight=1.0, timeout=None):
+    @swarm.agent(name, weight=weight, timeout=timeout)
+    async def vote(root, cid, ctx=None):
+        await asyncio.sleep(delay)
+        return swarm.AgentResult(name=name, confidence=confidence)
+    return vote
+
+
+def test_quorum_stops_once_the_outcome_is_decided():
+    import time
+
+    agents = [_voter("Fast", 1.0, weight=2), _voter("Slow", 1.0, delay=5)]
+    t0 = time.perf_counter()
+    res = asyncio.run(swarm.evaluate("r", None, agents, threshold=0.6))
+    assert time.perf_counter() - t0 < 1
+    assert res["passed"] and res["early"] and res["quorum"] == 2 / 3 and res["quorum_max"] == 1.0
+    assert [v["status"] for v in res["votes"]] == ["ok", "skipped"]
+
+    agents = [_voter("No", 0.0, weight=2), _voter("Slow", 1.0, delay=5)]
+    res = asyncio.run(swarm.evaluate("r", None, agents, threshold=0.6))
+    assert not res["passed"] and res["early"] and res["quorum_max"] == 1 / 3
+
+
+def test_quorum_times_out_slow_agents_and_reports_latency():
+    agents = [_voter("A", 0.9, delay=0.02), _voter("Stuck", 1.0, delay=5, timeout=0.1), _voter("B", 0.6)]
+    res = asyncio.run(swarm.evaluate("r", None, agents, threshold=0.7))  # only Stuck can decide it
+    votes = {v["name"]: v for v in res["votes"]}
+    assert not res["early"] and not res["passed"] and res["quorum"] == pytest.approx(0.5)
+    assert votes["Stuck"]["status"] == "timeout" and votes["Stuck"]["confidence"] == 0.0
+    assert 90 <= votes["Stuck"]["latency_ms"] < 1000 and votes["A"]["latency_ms"] >= 15
+
+
+def test_cancelling_a_round_cancels_its_agents():
+    finished = []
+
+    def slow(name):
+        @swarm.agent(name)
+        async def vote(root, cid, ctx):
+            await asyncio.sleep(0.3)
+            finished.append(name)
+            return swarm.AgentResult(name=name, confidence=1.0)
+        return vote
+
+    async def run():
+        task = asyncio.create_task(swarm.evaluate("r", None, [slow("A"), slow("B")], threshold=0.6))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(0.4)
+
+    asyncio.run(run())
+    assert finished == []
+
+
+def test_batch_shares_lookups_bounds_concurrency_and_streams(monkeypatch):
+    fake = FakeTransport()
+    monkeypatch.setattr(swarm, "transport", fake)
+    monkeypatch.setenv("SWARM_BATCH_CONCURRENCY", "3")
+    running, peak = 0, 0
+    real_timed = swarm._timed
+
+    async def counting(fn, root, cid, ctx, limit):
+        async def tracked(*a):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            try:
+                await asyncio.sleep(0.01)
+                return await fn(*a)
+            finally:
+                running -= 1
+        return await real_timed(tracked, root, cid, ctx, limit)
+
+    monkeypatch.setattr(swarm, "_timed", counting)
+    items = [{"root": f"0x{i:02x}", "cid": f"cid{i % 2}"} for i in range(8)]
+    r = TestClient(swarm.app).post("/swarm/attest/batch", json={"items": items})
+    lines = [json.loads(line) for line in r.text.splitlines()]
+
+    assert r.headers["content-type"] == "application/x-ndjson"
+    assert sorted(res["index"] for res in lines) == list(range(8))
+    assert all(res["root"] == items[res["index"]]["root"] and "passed" in res for res in lines)
+    assert sorted(c for c in fake.calls if c[0] == "resolve") == [("resolve", "cid0"), ("resolve", "cid1")]
+    assert fake.calls.count(("xrpl_live", "T1")) <= 1
+    assert peak <= 3
+
+
+def _verify(root, proof, batch_root):
+    from services.merkle import verify_proof
+
+    return verify_proof(root, root[2:], proof, batch_root[2:])
+
+
+def test_submit_scheduler_coalesces_roots_into_one_batch():
+    submitted = []
+
+    async def fake_submit(root, cid):
+        submitted.append((root, cid))
+        await asyncio.sleep(0.01)
+        return {"tx": "0xfeed"}
+
+    roots = [f"0x{i:064x}" for i in range(5)]
+
+    async def run():
+        sched = swarm.SubmitScheduler(window=0.05, submit=fake_submit)
+        first = [sched.enqueue(r, f"cid{i % 2}") for i, r in enumerate(roots)]
+        again = sched.enqueue(roots[0], "cid0")
+        await asyncio.sleep(0.2)
+        return sched, first, again
+
+    sched, first, again = asyncio.run(run())
+    assert {s["state"] for s in first} == {"submitted"} and again is first[0]
+    ((batch_root, cids),) = submitted
+    assert cids == "cid0,cid1" and batch_root == swarm.roots_merkle(roots)[0]
+    for r in roots:
+        status = sched.status(r)
+        assert status["batch_root"] == batch_root and _verify(r, status["proof"], batch_root)
+    assert sched.status()["batches"][0]["result"] == {"tx": "0xfeed"}
+
+
+def test_autosubmit_returns_before_the_submission_runs(monkeypatch):
+    import time
+
+    started = []
+
+    async def slow_submit(root, cid):
+        started.append(root)
+        await asyncio.sleep(5)
+
+    monkeypatch.setenv("SWARM_AUTOSUBMIT", "true")
+    monkeypatch.setattr(swarm, "transport", FakeTransport())
+    monkeypatch.setattr(swarm, "scheduler", swarm.SubmitScheduler(window=60, submit=slow_submit))
+    client = TestClient(swarm.app)
+    t0 = time.perf_counter()
+    body = client.post("/swarm/attest", json={"root": "0x" + "11" * 32, "cid": "bafy"}).json()
+    assert time.perf_counter() - t0 < 1 and started == []
+    assert body["passed"] and body["submitted"] is False and body["submission"]["state"] == "queued"
+    assert client.get("/swarm/submit/status", params={"root": "0x" + "11" * 32}).json()["state"] == "queued"
+    assert client.get("/swarm/submit/status", params={"root": "0x00"}).status_code == 404
+
+
+def test_submit_scheduler_flushes_on_close_and_forgets_old_batches():
+    submitted = []
+
+    async def fake_submit(root, cid):
+        submitted.append(root)
+        return {"tx": "0xfeed"}
+
+    async def run():
+        sched = swarm.SubmitScheduler(window=60, submit=fake_submit, keep=2)
+        for i in range(3):
+            sched.enqueue(f"0x{i:064x}", None)
+            sched._flush()
+            await asyncio.sleep(0)
+        sched.enqueue("0x" + "ff" * 32, None)  # still inside its window at shutdown
+        await sched.aclose()
+        return sched
+
+    sched = asyncio.run(run())
+    assert submitted[-1] == "0x" + "ff" * 32 and len(submitted) == 4
+    assert len(sched.batches) == 2 and sched.status(f"0x{0:064x}") is None
+    assert sched.status("0x" + "ff" * 32)["state"] == "submitted"
@@ -0,0 +1,60 @@
+import time
+
+from fastapi.testclient import TestClient
+
+from services.api.main import app as ops
+from services.api.pool import http_pool
+from services.api.verify_cache import VerifyCache, verify_cache
+
+
+def test_ttl_lru_and_sqlite_persistence(tmp_path):
+    db = tmp_path / "verify.db"
+    cache = VerifyCache(max_entries=2, path=str(db))
+    cache.put("final", {"validated": True})
+    cache.put("pending", {"validated": False}, ttl=0.05)
+    assert cache.get("final") == (True, {"validated": True})
+    time.sleep(0.06)
+    assert cache.get("pending") == (False, None)
+
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert len(cache._mem) == 2 and cache.stats()["evictions"] >= 1
+
+    # evicted from memory but still on disk, and across a restart
+    reopened = VerifyCache(max_entries=2, path=str(db))
+    assert reopened.get("final") == (True, {"validated": True})
+    assert reopened.get("pending") == (False, None)
+
+
+def test_polygon_receipts_cached_by_finality(monkeypatch):
+    verify_cache.clear()
+    monkeypatch.setenv("POLYGON_RPC", "http://rpc.test")
+    calls = []
+
+    class DummyResp:
+        status_code = 200
+
+        def __init__(self, result):
+            self._result = result
+
+        def json(self):
+            return {"result": self._result}
+
+    class DummyClient:
+        async def post(self, url, json, **kw):
+            tx = json["params"][0]
+            calls.append(tx)
+            if tx == "0xdown":
+                raise OSError("connection refused")
+            return DummyResp({"status": "0x1"} if tx == "0xmined" else None)
+
+    monkeypatch.setattr(http_pool, "client", lambda: DummyClient())
+    client = TestClient(ops)
+    for _ in range(3):
+        assert client.get("/verify/polygon/0xmined").json()["result"]["status"] == "0x1"
+        assert client.get("/verify/polygon/0xpending").json()["result"] is None
+        assert client.get("/verify/polygon/0xdown").status_code == 502
+    # finalized, pending (short TTL) and failed (negative cache) lookups each hit the RPC once
+    assert calls == ["0xmined", "0xpending", "0xdown"]
+
+    verify_cache.clear()
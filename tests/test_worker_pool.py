@@ -0,0 +1,80 @@
+import asyncio, threading, time
+
+import requests
+
+from services.jobs import open_queue
+from services.workers.ratelimit import TokenBucket, backoff, retry_after
+from services.workers.zoho_worker import WorkerPool, retry_hint
+
+
+def _http_error(status, headers=None):
+    resp = requests.Response()
+    resp.status_code = status
+    resp.headers.update(headers or {})
+    return requests.HTTPError(f"{status} error", response=resp)
+
+
+def test_token_bucket_limits_rate_and_pauses():
+    async def run():
+        bucket = TokenBucket(rate=50, burst=2)
+        t0 = time.monotonic()
+        for _ in range(7):
+            await bucket.acquire()
+        spent = time.monotonic() - t0
+        bucket.pause(0.1)
+        t1 = time.monotonic()
+        await bucket.acquire()
+        return spent, time.monotonic() - t1
+
+    spent, paused = asyncio.run(run())
+    assert 0.08 <= spent < 0.5  # 2 from the burst, 5 more at 50/s
+    assert paused >= 0.1
+
+
+def test_retry_after_and_backoff():
+    assert retry_after({"Retry-After": "3"}) == 3.0
+    assert retry_after({"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}) == 0.0
+    assert retry_after({}) is None
+    assert retry_hint(_http_error(429, {"Retry-After": "2"})) == (True, 2.0)
+    assert retry_hint(_http_error(503)) == (True, None)
+    assert retry_hint(_http_error(400)) == (False, None)
+    assert retry_hint(ValueError("unknown job type")) == (False, None)
+    assert all(0.5 <= backoff(n) <= min(60, 2 ** (n - 1)) for n in range(1, 10))
+
+
+def test_pool_runs_jobs_concurrently_and_retries_throttled_calls(tmp_path):
+    q = open_queue(f"sqlite:///{tmp_path}/jobs.db")
+    for i in range(8):
+        q.enqueue({"type": "send_mail", "job_id": f"mail-{i}", "data": {}})
+    q.enqueue({"type": "upsert_contact", "job_id": "bigin-429", "data": {}})
+    q.enqueue({"type": "upsert_contact", "job_id": "bigin-400", "data": {}})
+
+    lock, active, peak, calls = threading.Lock(), [0], [0], {}
+
+    def handler(payload):
+        job_id = payload["job_id"]
+        with lock:
+            calls[job_id] = calls.get(job_id, 0) + 1
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        try:
+            if job_id == "bigin-429" and calls[job_id] == 1:
+                raise _http_error(429, {"Retry-After": "0.2"})
+            if job_id == "bigin-400":
+                raise _http_error(400)
+            time.sleep(0.1)
+            return {"status": "ok"}
+        finally:
+            with lock:
+                active[0] -= 1
+
+    buckets = {"mail": TokenBucket(0), "bigin": TokenBucket(0)}
+    pool = WorkerPool(q, concurrency=4, buckets=buckets, handler=handler)
+    t0 = time.monotonic()
+    stats = asyncio.run(pool.run(until_idle=True))
+    elapsed = time.monotonic() - t0
+
+    assert stats == {"done": 9, "failed": 1, "retried": 1, "merged": 0}
+    assert calls["bigin-429"] == 2 and peak[0] == 4
+    assert elapsed < 0.8 * 0.1 * 9  # well under one-at-a-time
+    assert q.counts() == {"pending": 0, "leased": 0, "done": 9, "failed": 1}
@@ -0,0 +1,95 @@
+import asyncio, json
+
+from websockets.asyncio.server import serve
+
+from services.api.xrpl_client import XRPLClient
+
+
+class FakeRippled:
+    """Local stand-in for a rippled WebSocket endpoint."""
+
+    def __init__(self, validate_after: int = 2):
+        self.validate_after = validate_after
+        self.closes = 0
+        self.connections = 0
+        self.requests = []
+        self.drop_next = False
+
+    async def handler(self, ws):
+        self.connections += 1
+        ticker = None
+        try:
+            async for raw in ws:
+                msg = json.loads(raw)
+                self.requests.append(msg["command"])
+                if self.drop_next:
+                    self.drop_next = False
+                    await ws.close()
+                    return
+                if msg["command"] == "subscribe":
+                    ticker = asyncio.create_task(self._tick(ws))
+                    await ws.send(json.dumps({"id": msg["id"], "status": "success", "result": {}}))
+                elif msg["command"] == "unsubscribe":
+                    if ticker:
+                        ticker.cancel()
+                    await ws.send(json.dumps({"id": msg["id"], "status": "success", "result": {}}))
+                elif msg["transaction"] == "MISSING":
+                    await ws.send(json.dumps({"id": msg["id"], "status": "error", "error": "txnNotFound"}))
+                else:
+                    validated = msg["transaction"] == "DONE" or self.closes >= self.validate_after
+                    await ws.send(json.dumps({
+                        "id": msg["id"], "status": "success", "type": "response",
+                        "result": {"validated": validated, "ledger_index": 100 + self.closes,
+                                   "meta": {"TransactionResult": "tesSUCCESS"}},
+                    }))
+        finally:
+            if ticker:
+                ticker.cancel()
+
+    async def _tick(self, ws):
+        while True:
+            await asyncio.sleep(0.02)
+            self.closes += 1
+            await ws.send(json.dumps({"type": "ledgerClosed", "ledger_index": 100 + self.closes}))
+
+
+async def _with_server(fake, fn):
+    async with serve(fake.handler, "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        client = XRPLClient(url=f"ws://127.0.0.1:{port}", request_timeout=2)
+        try:
+            return await fn(client)
+        finally:
+            await client.aclose()
+
+
+def test_multiplexes_lookups_over_one_connection():
+    fake = FakeRippled()
+
+    async def run(client):
+        return await asyncio.gather(*[client.verify("DONE") for _ in range(20)], client.verify("MISSING"))
+
+    results = asyncio.run(_with_server(fake, run))
+    assert all(r["validated"] and r["result"] == "tesSUCCESS" for r in results[:-1])
+    assert results[-1] == {"validated": False, "error": "txnNotFound", "tx": "MISSING"}
+    assert fake.connections == 1
+
+
+def test_wait_rechecks_on_ledger_close_and_reconnects():
+    fake = FakeRippled(validate_after=3)
+
+    async def run(client):
+        first = await client.verify("PENDING")
+        waited = await client.verify("PENDING", wait=True, timeout=2)
+        # one re-check per ledger close rather than timer polling
+        assert fake.requests.count("tx") == 2 + fake.validate_after
+        fake.drop_next = True
+        after_drop = await client.verify("DONE")
+        return first, waited, after_drop
+
+    first, waited, after_drop = asyncio.run(_with_server(fake, run))
+    assert first["validated"] is False
+    assert waited["validated"] is True and waited["ledger_index"] >= 103
+    assert "subscribe" in fake.requests and "unsubscribe" in fake.requests
+    assert after_drop["validated"] is True
+    assert fake.connections == 2
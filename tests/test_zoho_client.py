@@ -0,0 +1,146 @@
+import asyncio, json, re, time
+
+import httpx
+
+from services.zoho_client import AsyncZohoClient, ZohoClient
+from services.zoho_contacts import ContactCache
+from services.zoho_tokens import FileTokenStore, MemoryTokenStore
+
+
+class FakeZoho:
+    def __init__(self, expires_in=3600):
+        self.expires_in = expires_in
+        self.token_calls = 0
+        self.revoked = set()
+        self.seen_tokens = []
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/oauth/v2/token":
+            self.token_calls += 1
+            await asyncio.sleep(0.05)
+            return httpx.Response(200, json={"access_token": f"tok{self.token_calls}", "expires_in": self.expires_in})
+        tok = request.headers["Authorization"].split()[-1]
+        self.seen_tokens.append(tok)
+        if tok in self.revoked:
+            return httpx.Response(401, json={"code": "INVALID_OAUTHTOKEN"})
+        return httpx.Response(200, json={"status": {"code": 200}, "data": json.loads(request.content or b"{}")})
+
+
+def _client(fake, store=None, **kw):
+    return AsyncZohoClient("id", "secret", "refresh", mail_account="acc", store=store or MemoryTokenStore(),
+                           transport=httpx.MockTransport(fake), **kw)
+
+
+def test_concurrent_callers_share_one_refresh():
+    fake = FakeZoho()
+
+    async def run():
+        zc = _client(fake)
+        await asyncio.gather(*[zc.mail_send(f"u{i}@example.com", "hi", text="x") for i in range(20)])
+        await zc.aclose()
+
+    asyncio.run(run())
+    assert fake.token_calls == 1 and set(fake.seen_tokens) == {"tok1"}
+
+
+def test_token_is_shared_across_processes_through_the_file_store(tmp_path):
+    fake = FakeZoho()
+    store = tmp_path / "token.json"
+
+    async def run():
+        a, b = _client(fake, FileTokenStore(store)), _client(fake, FileTokenStore(store))
+        await a.mail_send("u@example.com", "hi", text="x")
+        await b.mail_send("u@example.com", "hi", text="x")
+        return a.refreshes, b.refreshes
+
+    assert asyncio.run(run()) == (1, 0)
+    assert fake.token_calls == 1 and store.stat().st_mode & 0o777 == 0o600
+
+
+def test_refreshes_ahead_of_expiry_in_the_background():
+    fake = FakeZoho(expires_in=120)  # inside the 300s refresh-ahead window
+
+    async def run():
+        zc = _client(fake)
+        await zc.mail_send("u@example.com", "hi", text="x")
+        t0 = time.monotonic()
+        await zc.mail_send("u@example.com", "hi", text="x")  # not blocked by the refresh
+        fast = time.monotonic() - t0 < 0.04
+        await zc._refreshing
+        await zc.mail_send("u@example.com", "hi", text="x")
+        return fast
+
+    assert asyncio.run(run())
+    assert fake.seen_tokens == ["tok1", "tok1", "tok2"]
+
+
+def test_unauthorized_forces_one_refresh_and_retry():
+    fake = FakeZoho()
+
+    async def run():
+        zc = _client(fake)
+        await zc.mail_send("u@example.com", "hi", text="x")
+        fake.revoked.add("tok1")
+        return await zc.mail_send("u@example.com", "hi", text="x")
+
+    assert asyncio.run(run())["data"]["toAddress"] == "u@example.com"
+    assert fake.token_calls == 2 and fake.seen_tokens == ["tok1", "tok1", "tok2"]
+
+
+def test_sync_wrapper_runs_on_the_background_loop():
+    fake = FakeZoho()
+    zc = ZohoClient("id", "secret", "refresh", mail_account="acc")
+    zc.aio = _client(fake)
+    assert zc.mail_send("u@example.com", "hi", html="<p>x</p>")["data"]["content"] == "<p>x</p>"
+    assert zc._token() == "tok1" and zc.MAIL_API.endswith("/api")
+
+
+class FakeBigin(FakeZoho):
+    def __init__(self, existing=()):
+        super().__init__()
+        self.existing = {e: f"c{i}" for i, e in enumerate(existing)}
+        self.searches = []
+        self.creates = []
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/oauth/v2/token":
+            return await super().__call__(request)
+        if request.url.path.endswith("/Contacts/search"):
+            crit = request.url.params["criteria"]
+            emails = re.findall(r"Email:equals:([^)]+)\)", crit)
+            self.searches.append(emails)
+            hits = [{"id": self.existing[e], "Email": e} for e in emails if e in self.existing]
+            return httpx.Response(200, json={"data": hits}) if hits else httpx.Response(204)
+        records = json.loads(request.content)["data"]
+        self.creates.append(len(records))
+        out = []
+        for rec in records:
+            if rec["Email"].startswith("bad"):
+                out.append({"status": "error", "code": "INVALID_DATA", "message": "invalid email"})
+            else:
+                self.existing[rec["Email"]] = f"n{len(self.existing)}"
+                out.append({"status": "success", "code": "SUCCESS", "details": {"id": self.existing[rec["Email"]]}})
+        return httpx.Response(201, json={"data": out})
+
+
+def test_bulk_upsert_batches_searches_and_creates(tmp_path):
+    fake = FakeBigin(existing=[f"old{i}@example.com" for i in range(5)])
+    contacts = [{"email": f"old{i}@example.com"} for i in range(5)]
+    contacts += [{"email": f"new{i}@example.com", "first_name": "N"} for i in range(150)]
+    contacts += [{"email": "NEW0@example.com"}, {"email": "bad@example.com"}]
+
+    async def run():
+        zc = _client(fake, contacts=ContactCache(tmp_path / "c.db"))
+        first = await zc.bigin_bulk_upsert(contacts)
+        calls = (len(fake.searches), fake.creates[:])
+        fake.searches.clear()
+        second = await zc.bigin_bulk_upsert(contacts)
+        return first, second, calls
+
+    first, second, calls = asyncio.run(run())
+    assert [r["status"] for r in first[:5]] == ["existing"] * 5
+    assert first[5]["status"] == "created" and first[155]["id"] == first[5]["id"]
+    assert first[-1] == {"email": "bad@example.com", "status": "error", "id": None, "error": "invalid email"}
+    assert calls == (16, [100, 51])  # 156 unique emails searched 10 at a time
+    assert all(r.get("cached") for r in second[:-1])
+    assert fake.searches == [["bad@example.com"]]  # only the uncached one is searched again